@@ -8,7 +8,7 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant, HomeAssistantError
 
-from .config_flow import EvLoadBalancingConfigFlow
+from .backends import async_load_backends
 from .const import (
     CONF_CHARGER,
     CONF_CHARGER_EXPIRES,
@@ -16,9 +16,12 @@ from .const import (
     CONF_DEVICE_ID,
     CONF_MAINS,
     CONF_MAINS_LIMIT,
+    CONFIG_MINOR_VERSION,
+    CONFIG_VERSION,
     DOMAIN,
 )
 from .coordinator import EvLoadBalancingCoordinator
+from .helpers.history_store import PhaseHistoryStore
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -33,12 +36,16 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
         hass.data[DOMAIN] = {}
 
     if config_entry.entry_id not in hass.data[DOMAIN]:
+        await async_load_backends(hass, config_entry.data)
         coordinator = EvLoadBalancingCoordinator(hass, config_entry)
-        await coordinator.async_config_entry_first_refresh()
-
-        config_entry.async_on_unload(
-            config_entry.add_update_listener(coordinator.update_listener)
-        )
+        try:
+            await coordinator.async_setup_backends()
+            await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            # Listeners and shared helpers are registered already, release them
+            # so each retry starts from scratch
+            await coordinator.async_shutdown()
+            raise
 
         hass.data[DOMAIN][config_entry.entry_id] = coordinator
 
@@ -49,18 +56,21 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unloading a config_flow entry."""
-    # unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
-    unload_ok = True
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
         coordinator: EvLoadBalancingCoordinator = hass.data[DOMAIN].pop(entry.entry_id)
-        coordinator.cleanup()
+        await coordinator.async_shutdown()
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove data stored for a config_flow entry."""
+    await PhaseHistoryStore(hass, entry.entry_id).async_remove()
+
+
 async def async_reload_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
     """Reload the config entry."""
-    await async_unload_entry(hass, config_entry)
-    await async_setup_entry(hass, config_entry)
+    await hass.config_entries.async_reload(config_entry.entry_id)
 
 
 async def async_migrate_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
@@ -74,8 +84,8 @@ async def async_migrate_entry(hass: HomeAssistant, config_entry: ConfigEntry) ->
     class MigrateError(HomeAssistantError):
         """Error to indicate there is was an error in version migration."""
 
-    installed_version = EvLoadBalancingConfigFlow.VERSION
-    installed_minor_version = EvLoadBalancingConfigFlow.MINOR_VERSION
+    installed_version = CONFIG_VERSION
+    installed_minor_version = CONFIG_MINOR_VERSION
 
     new_data = {**config_entry.data}
     new_options = {**config_entry.options}
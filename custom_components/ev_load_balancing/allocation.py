@@ -0,0 +1,189 @@
+"""Allocation of mains capacity between several chargers."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.debounce import Debouncer
+
+from .const import DOMAIN, MIN_CHARGING_CURRENT, Phases
+from .limits import calculate_limits
+
+if TYPE_CHECKING:
+    from .coordinator import EvLoadBalancingCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_ALLOCATION_GROUPS = f"{DOMAIN}_allocation_groups"
+
+
+def _fair_share(budget: float, caps: list[float]) -> list[float]:
+    """Split budget equally, redistributing what capped members cannot use."""
+    shares = [0.0] * len(caps)
+    left = max(budget, 0.0)
+    order = sorted(range(len(caps)), key=caps.__getitem__)
+    for n, i in enumerate(order):
+        shares[i] = min(caps[i], left / (len(order) - n))
+        left -= shares[i]
+    return shares
+
+
+def allocate_current(
+    budget: list[float],
+    demands: list[tuple[int, float]],
+    minimum: float = MIN_CHARGING_CURRENT,
+) -> list[list[float]]:
+    """Split a current budget per phase between chargers.
+
+    Each demand is a tuple of (priority, max current per phase), the result
+    is the current per phase of each charger. Higher priority chargers are
+    served first and chargers with equal priority share fairly. A charger
+    that cannot be given at least `minimum` on every phase gets 0 on all of
+    them, leaving its share to others.
+    """
+    result = [[0.0] * len(budget) for _ in demands]
+    remaining = list(budget)
+    for priority in sorted({p for p, _ in demands}, reverse=True):
+        members = [i for i, (p, _) in enumerate(demands) if p == priority]
+        if minimum > 0:
+            # No more members than can get minimum, but the rest is checked below
+            members = members[: max(int(min(remaining) // minimum), 0)]
+        shares: list[list[float]] = []
+        while members:
+            caps = [demands[i][1] for i in members]
+            shares = [_fair_share(left, caps) for left in remaining]
+            short = [
+                n
+                for n in range(len(members))
+                if any(phase[n] < minimum for phase in shares)
+            ]
+            if not short:
+                break
+            # Drop the last member that cannot reach minimum, others get its share
+            members.pop(short[-1])
+        for n, i in enumerate(members):
+            for phase, phase_shares in enumerate(shares):
+                result[i][phase] = phase_shares[n]
+                remaining[phase] -= phase_shares[n]
+    return result
+
+
+def get_allocation_group(hass: HomeAssistant, mains_id: str) -> AllocationGroup:
+    """Get or create the allocation group of a mains device."""
+    groups: dict[str, AllocationGroup] = hass.data.setdefault(
+        DATA_ALLOCATION_GROUPS, {}
+    )
+    if mains_id not in groups:
+        groups[mains_id] = AllocationGroup(hass, mains_id)
+    return groups[mains_id]
+
+
+class AllocationGroup:
+    """Chargers sharing one mains, limits of all allocated in one pass."""
+
+    def __init__(self, hass: HomeAssistant, mains_id: str) -> None:
+        """Initialize object."""
+        self._hass = hass
+        self._mains_id = mains_id
+        self._members: list[EvLoadBalancingCoordinator] = []
+        self._debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=1,
+            immediate=False,
+            function=self._async_allocate,
+        )
+
+    @property
+    def members(self) -> list[EvLoadBalancingCoordinator]:
+        """Coordinators in group."""
+        return self._members
+
+    def add(self, coordinator: EvLoadBalancingCoordinator) -> None:
+        """Add coordinator to group."""
+        if coordinator not in self._members:
+            self._members.append(coordinator)
+
+    def remove(self, coordinator: EvLoadBalancingCoordinator) -> None:
+        """Remove coordinator from group, and the group itself if empty."""
+        if coordinator in self._members:
+            self._members.remove(coordinator)
+        if not self._members:
+            self._debouncer.async_shutdown()
+            self._hass.data.get(DATA_ALLOCATION_GROUPS, {}).pop(self._mains_id, None)
+
+    def _overloaded(self) -> bool:
+        """Check if any phase of the shared mains is above its limit."""
+        return any(
+            (actual := pair.mains_phase.actual_current()) is not None
+            and actual > pair.mains_limit
+            for member in self._members
+            for pair in member.pairs
+        )
+
+    async def async_request_allocation(self) -> None:
+        """Request an allocation, requests within cooldown are merged.
+
+        When mains is overloaded the allocation runs at once, as the members
+        already skipped their own cooldown for it.
+        """
+        if self._overloaded():
+            self._debouncer.async_cancel()
+            await self._async_allocate()
+            return
+        await self._debouncer.async_call()
+
+    async def _async_allocate(self) -> None:
+        """Allocate mains capacity to all charging members and send limits."""
+        active = [m for m in self._members if m.charging_active and m.pairs]
+        if not active:
+            _LOGGER.debug("Skipping allocation since no charging active or pending")
+            return
+
+        # Matrix of members and mains phases, all members have one pair per phase
+        rows = [{pair.mains_phase_id: pair for pair in m.pairs} for m in active]
+        mains_phases = [rows[0][phase].mains_phase for phase in Phases]
+        horizon = max(m.response_time for m in active)
+        mains_actual = [rows[0][phase].expected_current(horizon) for phase in Phases]
+        charger_set = [
+            row[phase].charger_phase.current_limit() for row in rows for phase in Phases
+        ]
+        if None in mains_actual or None in charger_set:
+            _LOGGER.warning("Skipping allocation since None value found")
+            return
+
+        mains_limit = rows[0][Phases.PHASE1].mains_limit
+        budget, _ = calculate_limits(
+            mains_actual,
+            [phase.stddev_current() for phase in mains_phases],
+            mains_limit,
+            charger_set,
+            [row[Phases.PHASE1].charger_limit for row in rows],
+        )
+
+        # Each charger gets the minimum on all its phases or none, a car
+        # cannot charge on only some of them
+        shares = allocate_current(
+            budget,
+            [
+                (member.priority, min(row[Phases.PHASE1].charger_limit, mains_limit))
+                for member, row in zip(active, rows, strict=True)
+            ],
+        )
+        _LOGGER.debug("Allocated %s of %s", shares, budget)
+        new_limits = {member: [0.0, 0.0, 0.0] for member in active}
+        for member, row, member_shares in zip(active, rows, shares, strict=True):
+            for phase in Phases:
+                new_limits[member][row[phase].charger_phase_id.value] = member_shares[
+                    phase.value
+                ]
+
+        await asyncio.gather(
+            *(member.async_set_limits(limits) for member, limits in new_limits.items())
+        )
+        # Members refreshed before the allocation, publish its results as well
+        for member in active:
+            member.async_update_listeners()
@@ -0,0 +1,117 @@
+"""Registry of mains and charger backends, imported when first used."""
+
+from __future__ import annotations
+
+import importlib
+import sys
+from typing import TYPE_CHECKING
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ConfigEntryError
+
+from .const import (
+    CONF_CHARGER,
+    CONF_CHARGER_TYPE,
+    CONF_MAINS,
+    CONF_MAINS_TYPE,
+    NAME_DSMR,
+    NAME_EASEE,
+    NAME_MODBUS,
+    NAME_OCPP,
+    NAME_SLIMMELEZER,
+    NAME_TEMPLATE,
+    NAME_VIRTUAL,
+)
+
+if TYPE_CHECKING:
+    from .chargers import Charger
+    from .mains import Mains
+
+# Module and class name per backend type, relative to this package
+CHARGER_BACKENDS = {
+    NAME_EASEE: ("chargers.easee", "ChargerEasee"),
+    NAME_OCPP: ("chargers.ocpp", "ChargerOcpp"),
+    NAME_TEMPLATE: ("chargers.template", "ChargerTemplate"),
+    NAME_VIRTUAL: ("chargers.virtual", "ChargerVirtual"),
+}
+MAINS_BACKENDS = {
+    NAME_DSMR: ("mains.dsmr", "MainsDsmr"),
+    NAME_MODBUS: ("mains.modbus", "MainsModbus"),
+    NAME_SLIMMELEZER: ("mains.slimmelezer", "MainsSlimmelezer"),
+    NAME_TEMPLATE: ("mains.template", "MainsTemplate"),
+    NAME_VIRTUAL: ("mains.virtual", "MainsVirtual"),
+}
+# Simulated backends, only offered in developer mode
+DEVELOPER_BACKENDS = (NAME_VIRTUAL,)
+
+
+def _import_class(backend: tuple[str, str]) -> type:
+    """Import module of backend and get its class."""
+    module, name = backend
+    return getattr(importlib.import_module(f".{module}", __package__), name)
+
+
+def _backend(backends: dict[str, tuple[str, str]], kind: str, name: str):
+    """Get module and class name of backend, or raise if not supported."""
+    if name not in backends:
+        raise ConfigEntryError(f"The provided {kind} type ({name}) is not supported")
+    return backends[name]
+
+
+async def _async_import_class(hass: HomeAssistant, backend: tuple[str, str]) -> type:
+    """Import backend class in the executor, unless imported before."""
+    if f"{__package__}.{backend[0]}" in sys.modules:
+        return _import_class(backend)
+    return await hass.async_add_import_executor_job(_import_class, backend)
+
+
+async def async_get_charger_class(hass: HomeAssistant, name: str) -> type[Charger]:
+    """Get charger class of type, importing it if needed."""
+    return await _async_import_class(hass, _backend(CHARGER_BACKENDS, "charger", name))
+
+
+async def async_get_mains_class(hass: HomeAssistant, name: str) -> type[Mains]:
+    """Get mains class of type, importing it if needed."""
+    return await _async_import_class(hass, _backend(MAINS_BACKENDS, "mains", name))
+
+
+async def async_load_backends(hass: HomeAssistant, data) -> None:
+    """Import backends of config entry, so they can be created in the loop."""
+    if CONF_MAINS_TYPE in data:
+        await async_get_mains_class(hass, data[CONF_MAINS_TYPE])
+    if CONF_CHARGER_TYPE in data:
+        await async_get_charger_class(hass, data[CONF_CHARGER_TYPE])
+
+
+def get_charger(
+    hass: HomeAssistant,
+    data,
+    options,
+    update_callback,
+) -> Charger:
+    """Get the charger object from config entry.
+
+    The backend should be imported with `async_load_backends` beforehand,
+    otherwise it is imported here, blocking the event loop.
+    """
+    if CONF_CHARGER_TYPE not in data:
+        raise ConfigEntryError("No charger type defined in config")
+    charger_class = _import_class(
+        _backend(CHARGER_BACKENDS, "charger", data[CONF_CHARGER_TYPE])
+    )
+    return charger_class(hass, update_callback, options[CONF_CHARGER])
+
+
+def get_mains(
+    hass: HomeAssistant,
+    data,
+    options,
+    update_callback,
+) -> Mains:
+    """Get the mains object from config entry, see `get_charger`."""
+    if CONF_MAINS_TYPE not in data:
+        raise ConfigEntryError("No mains type defined in config")
+    mains_class = _import_class(
+        _backend(MAINS_BACKENDS, "mains", data[CONF_MAINS_TYPE])
+    )
+    return mains_class(hass, update_callback, options[CONF_MAINS])
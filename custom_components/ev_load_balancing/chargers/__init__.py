@@ -6,7 +6,8 @@ from typing import Any
 
 import voluptuous as vol
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, State
+from homeassistant.helpers.device_registry import DeviceEntry
 
 from ..const import Phases
 
@@ -22,6 +23,8 @@ class ChargingState(Enum):
 class ChargerPhase(ABC):
     """A data class for a charger phase."""
 
+    __slots__ = ()
+
     # def __init__(self) -> None:
     #     """Initialize object."""
 
@@ -38,10 +41,14 @@ class ChargerPhase(ABC):
 class Charger(ABC):
     """Base class for Charger robot."""
 
+    # Integration that provides the devices, None if not selected by device
+    device_domain: str | None = None
+
     def __init__(self, hass: HomeAssistant, update_callback) -> None:
         """Initialize base class."""
         self._hass = hass
         self._update_callback = update_callback
+        self._state_change_listeners = []
 
     @abstractmethod
     async def async_set_limits(
@@ -49,14 +56,25 @@ class Charger(ABC):
     ) -> bool:
         """Set charger limits."""
 
+    def replace_limits(self, phase1: float, phase2: float, phase3: float) -> bool:
+        """Replace limits of a command in flight not sent yet, False if not able."""
+        return False
+
     @abstractmethod
     def update(self) -> None:
         """Update measurements."""
 
+    async def async_setup(self) -> None:
+        """Start what has to run before the first update."""
+
     @abstractmethod
     def cleanup(self) -> None:
         """Cleanup event listeners etc."""
 
+    async def async_cleanup(self) -> None:
+        """Cleanup, returning once shared resources are released."""
+        self.cleanup()
+
     @property
     @abstractmethod
     def charging_state(self) -> ChargingState:
@@ -75,6 +93,11 @@ class Charger(ABC):
     def device_id(self) -> str:
         """Device id."""
 
+    @property
+    def time_to_live(self) -> float | None:
+        """Seconds until set limits expire on charger, None if they never do."""
+        return None
+
     @staticmethod
     @abstractmethod
     def get_schema(selections: dict[str, Any]) -> vol.Schema:
@@ -85,8 +108,19 @@ class Charger(ABC):
     def validate_user_input(hass: HomeAssistant, user_input: dict[str, Any]) -> bool:
         """Validate the result from config flow step."""
 
+    @staticmethod
+    def match_device(hass: HomeAssistant, device: DeviceEntry) -> bool:
+        """Check if device of `device_domain` can be selected in config flow."""
+        return False
+
+    def _push_state(self, entity_id: str, state: State | None) -> None:
+        """Update from a changed input entity state, by default re-reads all."""
+        self.update()
+
     async def _async_input_changed(self, event):
         """Input entity change callback from state change event."""
         # _LOGGER.debug("Sensor change event from HASS: %s", event)
+        if event is not None and "new_state" in event.data:
+            self._push_state(event.data["entity_id"], event.data["new_state"])
         if self._update_callback is not None:
             await self._update_callback()
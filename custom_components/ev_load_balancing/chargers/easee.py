@@ -1,25 +1,42 @@
 """Handling Easee Charger."""
 
+from collections.abc import Sequence
 import logging
 from typing import Any
 
 import voluptuous as vol
 
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers import selector
+from homeassistant.core import HomeAssistant, State
+from homeassistant.helpers import device_registry as dr, selector
+from homeassistant.helpers.device_registry import DeviceEntry
 from homeassistant.helpers.event import async_track_state_change_event
-from homeassistant.helpers.template import device_entities
 
 from ..const import CONF_CHARGER_EXPIRES, CONF_DEVICE_ID, Phases
-from ..helpers.entity_value import get_sensor_entity_attribute_value
+from ..helpers.command_scheduler import get_command_scheduler
+from ..helpers.entity_roles import (
+    ROLE_DYNAMIC_CIRCUIT_LIMIT,
+    ROLE_STATUS,
+    get_entity_roles,
+)
+from ..helpers.entity_value import (
+    get_sensor_entity_attribute_value,
+    get_state_attribute_value,
+)
 from . import Charger, ChargerPhase, ChargingState
 
 _LOGGER = logging.getLogger(__name__)
 
+# Commands per second and burst allowed per Easee account, kept well below the
+# cloud API limits so commands of all chargers of an account get through
+COMMAND_RATE = 0.2
+COMMAND_BURST = 10
+
 
 class ChargerPhaseEasee(ChargerPhase):
     """A data class for a charger phase."""
 
+    __slots__ = ("_attribute", "_entity", "_hass", "_value")
+
     def __init__(self, hass: HomeAssistant, entity_id: str, attribute: str) -> None:
         """Initialize object."""
         self._hass = hass
@@ -30,11 +47,12 @@ class ChargerPhaseEasee(ChargerPhase):
 
     def update(self) -> None:
         """Update measurements."""
-        self._value = get_sensor_entity_attribute_value(
-            self._hass,
-            _LOGGER,
-            self._entity,
-            self._attribute,
+        self.set_state(self._hass.states.get(self._entity))
+
+    def set_state(self, state: State | None) -> None:
+        """Update measurements from entity state."""
+        self._value = get_state_attribute_value(
+            _LOGGER, self._entity, state, self._attribute
         )
 
     def current_limit(self) -> float:
@@ -50,7 +68,7 @@ class ChargerPhaseEasee(ChargerPhase):
 class ChargerEasee(Charger):
     """Slimmelezer mains extractor."""
 
-    _state_change_listeners = []
+    device_domain = "easee"
 
     def __init__(
         self, hass: HomeAssistant, update_callback, options: dict[str, str]
@@ -59,16 +77,22 @@ class ChargerEasee(Charger):
         super().__init__(hass, update_callback)
         self._id = options[CONF_DEVICE_ID]
         self._ttl = options[CONF_CHARGER_EXPIRES]
+        self._status = None
+        self._scheduler = None
+
+        # Only share the account rate limit when running, not while in config flow
+        if update_callback is not None:
+            self._scheduler = get_command_scheduler(
+                hass, self._get_account(hass, self._id), COMMAND_RATE, COMMAND_BURST
+            )
 
-        entities = device_entities(hass, self._id)
+        roles = get_entity_roles(hass)
         used_entities = []
 
-        self._ent_status = [e for e in entities if e.endswith("_status")][0]
+        self._ent_status = roles.require(self._id, ROLE_STATUS)
         used_entities.append(self._ent_status)
 
-        self._ent_circuit_limit = [
-            e for e in entities if e.endswith("_dynamic_circuit_limit")
-        ][0]
+        self._ent_circuit_limit = roles.require(self._id, ROLE_DYNAMIC_CIRCUIT_LIMIT)
         used_entities.append(self._ent_circuit_limit)
 
         self._state_change_listeners.append(
@@ -89,44 +113,81 @@ class ChargerEasee(Charger):
             self._hass, self._ent_circuit_limit, "state_dynamicCircuitCurrentP3"
         )
 
+    @staticmethod
+    def _get_account(hass: HomeAssistant, device_id: str) -> str:
+        """Get Easee config entry, that is the account, of device."""
+        device = dr.async_get(hass).async_get(device_id)
+        if device is not None:
+            for entry_id in device.config_entries:
+                entry = hass.config_entries.async_get_entry(entry_id)
+                if entry is not None and entry.domain == "easee":
+                    return entry.entry_id
+        return device_id
+
     async def async_set_limits(
         self, phase1: float, phase2: float, phase3: float
     ) -> bool:
-        """Set charger limits."""
-        _LOGGER.debug(
-            "Setting limits: phase-1 %f, phase-2 %f, phase-3 %f", phase1, phase2, phase3
+        """Set charger limits, when the account rate limit allows."""
+        if self._scheduler is None:
+            # Config flow, the few commands of phase matching are not throttled
+            await self._async_send_limits((phase1, phase2, phase3))
+            return True
+        return await self._scheduler.async_send(
+            self._id, (phase1, phase2, phase3), self._async_send_limits
         )
+
+    def replace_limits(self, phase1: float, phase2: float, phase3: float) -> bool:
+        """Replace limits still waiting for the account rate limit."""
+        if self._scheduler is None:
+            return False
+        return self._scheduler.replace(self._id, (phase1, phase2, phase3))
+
+    async def _async_send_limits(self, limits: Sequence[float]) -> None:
+        """Call service to set charger limits."""
+        _LOGGER.debug("Setting limits: phase-1 %f, phase-2 %f, phase-3 %f", *limits)
         domain = "easee"
         service = "set_circuit_dynamic_limit"
         service_data = {
             "device_id": self._id,
-            "current_p1": phase1,
-            "current_p2": phase2,
-            "current_p3": phase3,
+            "current_p1": limits[0],
+            "current_p2": limits[1],
+            "current_p3": limits[2],
             "time_to_live": self._ttl,
         }
         await self._hass.services.async_call(domain, service, service_data)
 
-        return True
-
     def update(self) -> None:
         """Update measurements."""
+        self._push_state(self._ent_status, self._hass.states.get(self._ent_status))
         self._phase1.update()
         self._phase2.update()
         self._phase3.update()
 
+    def _push_state(self, entity_id: str, state: State | None) -> None:
+        """Update only from the changed entity."""
+        if entity_id == self._ent_status:
+            self._status = state.state if state is not None else None
+        elif entity_id == self._ent_circuit_limit:
+            self._phase1.set_state(state)
+            self._phase2.set_state(state)
+            self._phase3.set_state(state)
+
     def cleanup(self):
-        """Cleanup by removing event listeners."""
-        # for listener in self._state_change_listeners:
-        #     listener()
+        """Cleanup by removing event listeners and releasing the scheduler."""
+        if self._scheduler is not None:
+            self._scheduler.cancel(self._id)
+            self._scheduler.release()
+            self._scheduler = None
+        for listener in self._state_change_listeners:
+            listener()
+        self._state_change_listeners.clear()
 
     @property
     def charging_state(self) -> ChargingState:
         """Return if charging state."""
-        state = self._hass.states.get(self._ent_status).state
-        if state in ["charging"]:
+        if self._status in ["charging"]:
             return ChargingState.CHARGING
-        if state in ["awaiting_start"]:
+        if self._status in ["awaiting_start"]:
             return ChargingState.PENDING
         return ChargingState.OFF
 
@@ -155,6 +216,11 @@ class ChargerEasee(Charger):
         """Device id."""
         return self._id
 
+    @property
+    def time_to_live(self) -> float | None:
+        """Seconds until set limits expire on charger."""
+        return self._ttl * 60
+
     @staticmethod
     def get_schema(selections: dict[str, Any]) -> vol.Schema:
         """Device config schema."""
@@ -176,3 +242,12 @@ class ChargerEasee(Charger):
     def validate_user_input(hass: HomeAssistant, user_input: dict[str, Any]) -> bool:
         """Validate the result from config flow step."""
         return True
+
+    @staticmethod
+    def match_device(hass: HomeAssistant, device: DeviceEntry) -> bool:
+        """Check if Easee device has the entities of a charger."""
+        roles = get_entity_roles(hass)
+        return all(
+            roles.get(device.id, role) is not None
+            for role in (ROLE_STATUS, ROLE_DYNAMIC_CIRCUIT_LIMIT)
+        )
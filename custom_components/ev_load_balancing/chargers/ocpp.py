@@ -0,0 +1,317 @@
+"""Handling charge points connected over OCPP 1.6J."""
+
+from __future__ import annotations
+
+from datetime import datetime
+import logging
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import selector
+from homeassistant.helpers.event import async_call_later
+
+from ..const import (
+    CONF_CHARGER_HOST,
+    CONF_CHARGER_ID,
+    CONF_CHARGER_PORT,
+    CONF_CHARGER_RATED_CURRENT,
+    CONF_DEVICE_ID,
+    DEFAULT_CHARGER_HOST,
+    DEFAULT_CHARGER_PORT,
+    Phases,
+)
+from ..helpers.ocpp import OcppError, get_central_system
+from . import Charger, ChargerPhase, ChargingState
+
+_LOGGER = logging.getLogger(__name__)
+
+# Profile replaced by each new limit, on the lowest stack level
+PROFILE_ID = 1
+PROFILE_STACK_LEVEL = 0
+
+MEASURAND_CURRENT = "Current.Import"
+PHASE_NAMES = {"L1": Phases.PHASE1, "L2": Phases.PHASE2, "L3": Phases.PHASE3}
+
+STATUS_CHARGING = ("Charging",)
+STATUS_PENDING = ("Preparing", "SuspendedEV", "SuspendedEVSE")
+
+# Seconds until limits the charge point did not accept are sent again
+RETRY_DELAY = 10
+
+
+class ChargerPhaseOcpp(ChargerPhase):
+    """A data class for a charger phase."""
+
+    __slots__ = ("_limit", "_name", "measured")
+
+    def __init__(self, name: str, limit: float) -> None:
+        """Initialize object."""
+        self._name = name
+        self._limit = limit
+        self.measured: float | None = None
+
+    def set_limit(self, limit: float) -> None:
+        """Update limit accepted by the charge point."""
+        self._limit = limit
+
+    def current_limit(self) -> float:
+        """Get set current limit on phase."""
+        return self._limit
+
+    @property
+    def name(self) -> str:
+        """Get friendly name of phase."""
+        return self._name
+
+
+class ChargerOcpp(Charger):
+    """OCPP 1.6J charge point, connecting to a local central system.
+
+    Limits are sent as charging profile straight to the charge point, a
+    TxProfile while a transaction runs and a ChargePointMaxProfile otherwise.
+    OCPP 1.6 profiles limit all phases alike, so the lowest phase limit is
+    sent. Limits that fail are sent again after a while, or when the charge
+    point boots if it is not connected. Charging state and measured currents
+    come from its notifications.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, update_callback, options: dict[str, Any]
+    ) -> None:
+        """Initialize OCPP charger."""
+        super().__init__(hass, update_callback)
+        self._charge_point_id = options[CONF_CHARGER_ID]
+        self._rated_limit = int(options[CONF_CHARGER_RATED_CURRENT])
+        self._host = options.get(CONF_CHARGER_HOST, DEFAULT_CHARGER_HOST)
+        self._port = int(options.get(CONF_CHARGER_PORT, DEFAULT_CHARGER_PORT))
+        self._phases = {
+            phase: ChargerPhaseOcpp(f"Phase {phase.value + 1}", self._rated_limit)
+            for phase in Phases
+        }
+        self._status: str | None = None
+        self._transaction_id: int | None = None
+        self._pending: tuple[float, float, float] | None = None
+        self._unsub_retry: CALLBACK_TYPE | None = None
+        self._system = None
+
+        # Only accept the charge point when running, not while in config flow
+        if update_callback is not None:
+            self._system = get_central_system(hass, self._host, self._port)
+            self._state_change_listeners.append(
+                self._system.register(self._charge_point_id, self)
+            )
+
+    async def async_set_limits(
+        self, phase1: float, phase2: float, phase3: float
+    ) -> bool:
+        """Set charger limits with a charging profile."""
+        if self._system is None:
+            return False
+        self._cancel_retry()
+        limits = self._pending = (phase1, phase2, phase3)
+        connection = self._system.connection(self._charge_point_id)
+        if connection is None:
+            _LOGGER.debug(
+                "Charge point %s not connected, sending limits on boot",
+                self._charge_point_id,
+            )
+            return False
+        limit = min(phase1, phase2, phase3)
+        profile: dict[str, Any] = {
+            "chargingProfileId": PROFILE_ID,
+            "stackLevel": PROFILE_STACK_LEVEL,
+            "chargingProfileKind": "Absolute",
+            "chargingSchedule": {
+                "chargingRateUnit": "A",
+                "chargingSchedulePeriod": [
+                    {"startPeriod": 0, "limit": limit, "numberPhases": 3}
+                ],
+            },
+        }
+        if self._transaction_id is not None:
+            connector = 1
+            profile["chargingProfilePurpose"] = "TxProfile"
+            profile["transactionId"] = self._transaction_id
+        else:
+            connector = 0
+            profile["chargingProfilePurpose"] = "ChargePointMaxProfile"
+        _LOGGER.debug("Setting limit %f with %s", limit, profile)
+        try:
+            result = await connection.async_call(
+                "SetChargingProfile",
+                {"connectorId": connector, "csChargingProfiles": profile},
+            )
+        except OcppError as err:
+            _LOGGER.warning("Setting limits failed: %s", err)
+            self._schedule_retry()
+            return False
+        if result.get("status") != "Accepted":
+            _LOGGER.warning("Charge point rejected limits: %s", result)
+            self._schedule_retry()
+            return False
+        if self._pending == limits:
+            self._pending = None
+        for phase in Phases:
+            self._phases[phase].set_limit(limit)
+        return True
+
+    def _schedule_retry(self) -> None:
+        """Send pending limits again after a while."""
+        if self._system is not None and self._unsub_retry is None:
+            self._unsub_retry = async_call_later(
+                self._hass, RETRY_DELAY, self._async_retry
+            )
+
+    def _cancel_retry(self) -> None:
+        """Cancel scheduled retry."""
+        if self._unsub_retry is not None:
+            self._unsub_retry()
+            self._unsub_retry = None
+
+    async def _async_retry(self, _now: datetime) -> None:
+        """Send pending limits again."""
+        self._unsub_retry = None
+        if self._pending is not None:
+            await self.async_set_limits(*self._pending)
+
+    def booted(self) -> None:
+        """Send limits that could not be sent while the charge point was away."""
+        if self._pending is not None and self._system is not None:
+            self._cancel_retry()
+            # In the background, its result arrives on the connection calling this
+            self._hass.async_create_background_task(
+                self.async_set_limits(*self._pending),
+                f"OCPP {self._charge_point_id} pending limits",
+            )
+
+    def status_changed(self, payload: dict[str, Any]) -> None:
+        """Update charging state, from the status of the connector."""
+        if payload.get("connectorId", 0) != 0:
+            self._status = payload.get("status")
+
+    def meter_values(self, payload: dict[str, Any]) -> None:
+        """Update measured current per phase."""
+        if "transactionId" in payload:
+            self._transaction_id = payload["transactionId"]
+        for meter_value in payload.get("meterValue", []):
+            for sample in meter_value.get("sampledValue", []):
+                phase = PHASE_NAMES.get(sample.get("phase", "")[:2])
+                if sample.get("measurand") != MEASURAND_CURRENT or phase is None:
+                    continue
+                try:
+                    self._phases[phase].measured = float(sample["value"])
+                except (KeyError, ValueError):
+                    _LOGGER.debug("Invalid sampled value %s", sample)
+
+    def transaction_started(self, transaction_id: int) -> None:
+        """Keep id of started transaction, for its charging profile."""
+        self._transaction_id = transaction_id
+
+    def transaction_stopped(self) -> None:
+        """Forget stopped transaction."""
+        self._transaction_id = None
+
+    async def async_updated(self) -> None:
+        """Notify coordinator of changed state."""
+        await self._update_callback()
+
+    def measured_current(self, phase: Phases) -> float | None:
+        """Get current drawn on phase, as last reported by the charge point."""
+        return self._phases[phase].measured
+
+    async def async_setup(self) -> None:
+        """Wait for the central system to listen, so a taken port fails setup."""
+        if self._system is None:
+            return
+        try:
+            await self._system.async_wait_started()
+        except OSError as err:
+            raise ConfigEntryNotReady(
+                f"OCPP central system can not listen on {self._host}:{self._port}: {err}"
+            ) from err
+
+    def update(self) -> None:
+        """Nothing to do, notifications are pushed as received."""
+
+    def cleanup(self):
+        """Cleanup by stopping to accept the charge point."""
+        for listener in self._state_change_listeners:
+            listener()
+        self._state_change_listeners.clear()
+        self._cancel_retry()
+        self._pending = None
+        if self._system is not None:
+            system, self._system = self._system, None
+            self._hass.async_create_background_task(
+                system.async_release(), f"OCPP central system {self._port} release"
+            )
+
+    async def async_cleanup(self) -> None:
+        """Cleanup, returning once the central system stopped listening."""
+        system, self._system = self._system, None
+        self.cleanup()
+        if system is not None:
+            await system.async_release()
+
+    @property
+    def charging_state(self) -> ChargingState:
+        """Return charging state."""
+        if self._status in STATUS_CHARGING:
+            return ChargingState.CHARGING
+        if self._status in STATUS_PENDING:
+            return ChargingState.PENDING
+        return ChargingState.OFF
+
+    def get_phase(self, phase: Phases) -> ChargerPhase:
+        """Return phase X data."""
+        return self._phases.get(phase)
+
+    def get_rated_limit(self) -> int:
+        """Return charger limit per phase."""
+        return self._rated_limit
+
+    @property
+    def device_id(self) -> str:
+        """Device id."""
+        return f"ocpp_{self._charge_point_id}"
+
+    @staticmethod
+    def get_schema(selections: dict[str, Any]) -> vol.Schema:
+        """Device config schema."""
+        return vol.Schema(
+            {
+                vol.Required(CONF_CHARGER_ID): str,
+                vol.Required(CONF_CHARGER_HOST, default=DEFAULT_CHARGER_HOST): str,
+                vol.Required(
+                    CONF_CHARGER_PORT, default=DEFAULT_CHARGER_PORT
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=1, max=65535, step=1, mode=selector.NumberSelectorMode.BOX
+                    )
+                ),
+                vol.Required(
+                    CONF_CHARGER_RATED_CURRENT, default=16
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=6,
+                        max=63,
+                        step=1,
+                        unit_of_measurement="ampere",
+                    )
+                ),
+            }
+        )
+
+    @staticmethod
+    def validate_user_input(hass: HomeAssistant, user_input: dict[str, Any]) -> bool:
+        """Validate the result from config flow step."""
+        charge_point_id = user_input[CONF_CHARGER_ID].strip().strip("/")
+        if not charge_point_id or "/" in charge_point_id:
+            return False
+        user_input[CONF_CHARGER_ID] = charge_point_id
+        # The charge point id identifies the charger, as there is no device
+        user_input[CONF_DEVICE_ID] = f"ocpp_{charge_point_id}"
+        return True
@@ -1,14 +1,19 @@
 """Handling Template Charger."""
 
+from collections.abc import Callable
 import logging
 import re
 from typing import Any
 
 import voluptuous as vol
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, State
 from homeassistant.exceptions import TemplateError
-from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.helpers.event import (
+    TrackTemplate,
+    TrackTemplateResult,
+    async_track_template_result,
+)
 from homeassistant.helpers.template import Template
 
 from ..const import (
@@ -28,20 +33,42 @@ _LOGGER = logging.getLogger(__name__)
 class ChargerPhaseTemplate(ChargerPhase):
     """A data class for a charger phase."""
 
+    __slots__ = ("_hass", "_name", "_template", "_tracked", "_value")
+
     def __init__(self, hass: HomeAssistant, template: str, name: str) -> None:
         """Initialize object."""
         self._hass = hass
-        self._template = template
+        self._template = Template(template, hass)
         self._name = name
+        self._tracked = False
 
         self._value = None
 
+    @property
+    def template(self) -> Template:
+        """Get the compiled template of phase."""
+        return self._template
+
+    def track(self) -> TrackTemplate:
+        """Get template tracker, results will be pushed by `set_result`."""
+        self._tracked = True
+        return TrackTemplate(self._template, None)
+
     def update(self) -> None:
-        """Update measurements."""
-        self._value = Template(self._template, self._hass).async_render() or None
+        """Update measurements, if not tracked for changes."""
+        if not self._tracked:
+            self.set_result(self._template.async_render())
+
+    def set_result(self, result: Any) -> None:
+        """Update measurements from a rendered result."""
+        if isinstance(result, TemplateError):
+            _LOGGER.warning("Template %s failed: %s", self._template.template, result)
+            result = None
+        self._value = result or None
 
         if not isinstance(self._value, float):
             _LOGGER.warning("Template did not return a numeric value")
+            self._value = None
 
     def current_limit(self) -> float:
         """Get set current limit on phase."""
@@ -56,19 +83,18 @@ class ChargerPhaseTemplate(ChargerPhase):
 class ChargerTemplate(Charger):
     """Slimmelezer mains extractor."""
 
-    _state_change_listeners = []
-
     def __init__(
         self, hass: HomeAssistant, update_callback, options: dict[str, str]
     ) -> None:
         """Initialize Slimmelezer extractor."""
         super().__init__(hass, update_callback)
 
-        # used_entities = []
-
-        self._active = options[CONF_CHARGER_ACTIVE]
-
-        self._limit = options[CONF_CHARGER_LIMIT]
+        self._active = Template(options[CONF_CHARGER_ACTIVE], hass)
+        self._limit = Template(options[CONF_CHARGER_LIMIT], hass)
+        self._command = Template(options[CONF_CHARGER_COMMAND], hass)
+        self._tracked = False
+        self._active_value = None
+        self._limit_value = None
 
         self._phase1 = ChargerPhaseTemplate(
             self._hass, options[CONF_CHARGER_PHASE1], "Phase 1"
@@ -80,13 +106,53 @@ class ChargerTemplate(Charger):
             self._hass, options[CONF_CHARGER_PHASE3], "Phase 3"
         )
 
-        # self._state_change_listeners.append(
-        #     async_track_state_change_event(
-        #         self._hass,
-        #         used_entities,
-        #         self._async_input_changed,
-        #     )
-        # )
+        # Only re-render on changes when running, not while in config flow
+        if update_callback is not None:
+            self._tracked = True
+            trackers: dict[Template, TrackTemplate] = {}
+            self._tracked_results: dict[Template, list[Callable[[Any], None]]] = {}
+            for tracker, set_result in (
+                (TrackTemplate(self._active, None), self._set_active_result),
+                (TrackTemplate(self._limit, None), self._set_limit_result),
+                *(
+                    (phase.track(), phase.set_result)
+                    for phase in (self._phase1, self._phase2, self._phase3)
+                ),
+            ):
+                # Equal templates are tracked once, the result goes to each user
+                trackers.setdefault(tracker.template, tracker)
+                self._tracked_results.setdefault(tracker.template, []).append(
+                    set_result
+                )
+            info = async_track_template_result(
+                self._hass,
+                list(trackers.values()),
+                self._async_templates_changed,
+            )
+            self._state_change_listeners.append(info.async_remove)
+            info.async_refresh()
+
+    def _push_state(self, entity_id: str, state: State | None) -> None:
+        """Nothing to do, results are pushed by template tracking."""
+
+    async def _async_templates_changed(
+        self, event, updates: list[TrackTemplateResult]
+    ) -> None:
+        """Template result change callback from template tracking."""
+        for update in updates:
+            for set_result in self._tracked_results[update.template]:
+                set_result(update.result)
+        # Initial results are pushed without event, no need to refresh then
+        if event is not None:
+            await self._async_input_changed(event)
+
+    def _set_active_result(self, result: Any) -> None:
+        """Update charging active from a rendered result."""
+        self._active_value = result
+
+    def _set_limit_result(self, result: Any) -> None:
+        """Update overall limit from a rendered result."""
+        self._limit_value = result
 
     async def async_set_limits(
         self, phase1: float, phase2: float, phase3: float
@@ -95,10 +161,8 @@ class ChargerTemplate(Charger):
         _LOGGER.debug(
             "Setting limits: phase-1 %f, phase-2 %f, phase-3 %f", phase1, phase2, phase3
         )
-        await Template(self._active, self._hass).async_render(
-            phase1=phase1,
-            phase2=phase2,
-            phase3=phase3,
+        self._command.async_render(
+            {"phase1": phase1, "phase2": phase2, "phase3": phase3},
             parse_result=False,
         )
 
@@ -112,16 +176,19 @@ class ChargerTemplate(Charger):
 
     def cleanup(self):
         """Cleanup by removing event listeners."""
-        # for listener in self._state_change_listeners:
-        #     listener()
+        for listener in self._state_change_listeners:
+            listener()
+        self._state_change_listeners.clear()
 
     @property
     def charging_state(self) -> ChargingState:
         """Return if charging state."""
-        value = Template(self._active, self._hass).async_render()
+        value = self._active_value if self._tracked else self._active.async_render()
 
         if not isinstance(value, bool):
-            _LOGGER.warning("Template %s did not return a boolean value", self._active)
+            _LOGGER.warning(
+                "Template %s did not return a boolean value", self._active.template
+            )
             value = False
 
         if value:
@@ -140,10 +207,12 @@ class ChargerTemplate(Charger):
 
     def get_rated_limit(self) -> int:
         """Return overall limit per phase on charger circuit."""
-        value = Template(self._limit, self._hass).async_render()
+        value = self._limit_value if self._tracked else self._limit.async_render()
 
         if not isinstance(value, float):
-            _LOGGER.warning("Template %s did not return a numeric value", self._active)
+            _LOGGER.warning(
+                "Template %s did not return a numeric value", self._limit.template
+            )
             value = None
 
         if value is not None:
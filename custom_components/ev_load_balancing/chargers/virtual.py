@@ -1,13 +1,17 @@
-"""Handling Virtual Charger."""
+"""Handling a simulated charger and car."""
+
+from __future__ import annotations
 
 import logging
+from typing import Any
+
+import voluptuous as vol
 
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.event import async_track_state_change_event
-from homeassistant.helpers.template import device_entities
+from homeassistant.helpers import selector
 
-from ..const import Phases
-from ..helpers.entity_value import get_sensor_entity_attribute_value
+from ..const import CONF_CHARGER_RATED_CURRENT, CONF_DEVICE_ID, Phases
+from ..helpers.simulation import Simulation, get_simulation
 from . import Charger, ChargerPhase, ChargingState
 
 _LOGGER = logging.getLogger(__name__)
@@ -16,72 +20,51 @@ _LOGGER = logging.getLogger(__name__)
 class ChargerPhaseVirtual(ChargerPhase):
     """A data class for a charger phase."""
 
-    def __init__(self, hass: HomeAssistant, entity_id: str, attribute: str) -> None:
-        """Initialize object."""
-        self._hass = hass
-        self._entity = entity_id
-        self._attribute = attribute
-        self._value = None
-
-    def set_expected(self, value: float) -> None:
-        """Fake update mathod."""
-        self._value = value
+    __slots__ = ("_charger", "_index", "_name")
 
-    def update(self) -> None:
-        """Do nothing, but exists to conform to standard."""
+    def __init__(self, charger: ChargerVirtual, index: int, name: str) -> None:
+        """Initialize object."""
+        self._charger = charger
+        self._index = index
+        self._name = name
 
     def current_limit(self) -> float:
-        """Get set current limit on phase."""
-        return self._value
+        """Get limit in effect on phase, after the response delay."""
+        simulation = self._charger.simulation
+        if simulation is None:
+            return self._charger.get_rated_limit()
+        return simulation.limits[self._index]
+
+    @property
+    def name(self) -> str:
+        """Get friendly name of phase."""
+        return self._name
 
 
 class ChargerVirtual(Charger):
-    """Slimmelezer mains extractor."""
+    """Virtual charger, controlling a simulation.
 
-    _state_change_listeners = []
+    Set limits take effect after the response delay of the simulated charger,
+    and change what the virtual mains of the same id measure.
+    """
 
     def __init__(
-        self, hass: HomeAssistant, update_callback, device_id: str, ttl: int
+        self, hass: HomeAssistant, update_callback, options: dict[str, Any]
     ) -> None:
-        """Initilalize Slimmelezer extractor."""
+        """Initialize Virtual charger."""
         super().__init__(hass, update_callback)
-        self._id = device_id
-        self._ttl = ttl
-
-        # entities = device_entities(hass, device_id)
-
-        # self._ent_status = [e for e in entities if e.endswith("_status")][0]
-        # self._state_change_listeners.append(
-        #     async_track_state_change_event(
-        #         self._hass,
-        #         [self._ent_status],
-        #         self._async_input_changed,
-        #     )
-        # )
-
-        # self._ent_circuit_limit = [
-        #     e for e in entities if e.endswith("_dynamic_circuit_limit")
-        # ][0]
-        # self._state_change_listeners.append(
-        #     async_track_state_change_event(
-        #         self._hass,
-        #         [self._ent_circuit_limit],
-        #         self._async_input_changed,
-        #     )
-        # )
-
-        # self._phase1 = ChargerPhaseVirtual(
-        #     self._hass, self._ent_circuit_limit, "state_dynamicCircuitCurrentP1"
-        # )
-        # self._phase2 = ChargerPhaseVirtual(
-        #     self._hass, self._ent_circuit_limit, "state_dynamicCircuitCurrentP2"
-        # )
-        # self._phase3 = ChargerPhaseVirtual(
-        #     self._hass, self._ent_circuit_limit, "state_dynamicCircuitCurrentP3"
-        # )
-
-    def set_expected(self, current_limits, set_limits) -> None:
-        """Set expected values."""
+        self._id = options[CONF_DEVICE_ID]
+        self._rated_limit = int(options[CONF_CHARGER_RATED_CURRENT])
+        self._phases = {
+            phase: ChargerPhaseVirtual(self, phase.value, f"Phase {phase.value + 1}")
+            for phase in Phases
+        }
+        self.simulation: Simulation | None = None
+
+        # Only simulate when running, not while in config flow
+        if update_callback is not None:
+            self.simulation = get_simulation(hass, self._id)
+            self.simulation.rated_current = self._rated_limit
 
     async def async_set_limits(
         self, phase1: float, phase2: float, phase3: float
@@ -90,55 +73,64 @@ class ChargerVirtual(Charger):
         _LOGGER.debug(
             "Setting limits: phase 1 %f, phase 2 %f, phase 3 %f", phase1, phase2, phase3
         )
-        domain = "easee"
-        service = "set_circuit_dynamic_limit"
-        service_data = {
-            "device_id": self._id,
-            "current_p1": phase1,
-            "current_p2": phase2,
-            "current_p3": phase3,
-            "time_to_live": self._ttl,
-        }
-        # await self._hass.services.async_call(domain, service, service_data)
-
+        if self.simulation is None:
+            return False
+        self.simulation.set_limits([phase1, phase2, phase3])
         return True
 
     def update(self) -> None:
-        """Update measuremetns."""
-        self._phase1.update()
-        self._phase2.update()
-        self._phase3.update()
+        """Update state from the simulation."""
+        if self.simulation is not None:
+            self.simulation.advance()
 
     def cleanup(self):
-        """Cleanup by removing event listeners."""
-        # for listner in self._state_change_listeners:
-        #     listner()
+        """Cleanup by releasing the simulation."""
+        if self.simulation is not None:
+            self.simulation.release()
+            self.simulation = None
 
     @property
     def charging_state(self) -> ChargingState:
-        """Return if charging state."""
-        if self._hass.states.get(self._ent_status).state in ["charging"]:
-            return ChargingState.CHARGING
-        if self._hass.states.get(self._ent_status).state in ["awaiting_start"]:
-            return ChargingState.PENDING
-        return ChargingState.OFF
+        """Return charging state."""
+        if self.simulation is None:
+            return ChargingState.OFF
+        return self.simulation.charging_state
 
     def get_phase(self, phase: Phases) -> ChargerPhase:
         """Return phase X data."""
-        if phase == Phases.PHASE1:
-            return self._phase1
-        if phase == Phases.PHASE2:
-            return self._phase2
-        if phase == Phases.PHASE3:
-            return self._phase3
-        return None
+        return self._phases.get(phase)
 
     def get_rated_limit(self) -> int:
-        """Return overall limit per phase on charger circuit."""
-        limit = get_sensor_entity_attribute_value(
-            self._hass, _LOGGER, self._ent_circuit_limit, "circuit_ratedCurrent"
+        """Return charger limit per phase."""
+        return self._rated_limit
+
+    @property
+    def device_id(self) -> str:
+        """Device id."""
+        return self._id
+
+    @staticmethod
+    def get_schema(selections: dict[str, Any]) -> vol.Schema:
+        """Device config schema."""
+        return vol.Schema(
+            {
+                vol.Required(CONF_DEVICE_ID, default="virtual"): str,
+                vol.Required(
+                    CONF_CHARGER_RATED_CURRENT, default=16
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=6,
+                        max=63,
+                        step=1,
+                        unit_of_measurement="ampere",
+                    )
+                ),
+            }
         )
-        if limit is not None:
-            limit = int(limit)
-            _LOGGER.debug("Returning rated limit %d for charger circuit", limit)
-        return limit
+
+    @staticmethod
+    def validate_user_input(hass: HomeAssistant, user_input: dict[str, Any]) -> bool:
+        """Validate the result from config flow step."""
+        simulation_id = user_input[CONF_DEVICE_ID].strip()
+        user_input[CONF_DEVICE_ID] = simulation_id
+        return bool(simulation_id)
@@ -2,7 +2,6 @@
 
 from __future__ import annotations
 
-import asyncio
 import logging
 from typing import Any
 
@@ -10,19 +9,29 @@ import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.const import CONF_NAME
-from homeassistant.core import HomeAssistant
 from homeassistant.data_entry_flow import FlowResult
-from homeassistant.exceptions import ConfigEntryError
-from homeassistant.helpers import device_registry as dr, selector
-
+from homeassistant.helpers import selector
+
+from .backends import (
+    CHARGER_BACKENDS,
+    DEVELOPER_BACKENDS,
+    MAINS_BACKENDS,
+    async_get_charger_class,
+    async_get_mains_class,
+    get_charger,
+    get_mains,
+)
 from .chargers import Charger
-from .chargers.easee import ChargerEasee
-from .chargers.template import ChargerTemplate
 from .const import (
     CONF_CHARGER,
+    CONF_CHARGER_DEADBAND,
     CONF_CHARGER_PHASE1,
     CONF_CHARGER_PHASE2,
     CONF_CHARGER_PHASE3,
+    CONF_CHARGER_FORECAST,
+    CONF_CHARGER_PRIORITY,
+    CONF_CHARGER_RESPONSE_TIME,
+    CONF_CHARGER_STEP,
     CONF_CHARGER_TYPE,
     CONF_DEVELOPER_MODE,
     CONF_DEVICE_ID,
@@ -30,124 +39,136 @@ from .const import (
     CONF_MAINS_PHASE1,
     CONF_MAINS_PHASE2,
     CONF_MAINS_PHASE3,
+    CONF_MAINS_SHARED,
     CONF_MAINS_TYPE,
     CONF_PHASE_AUTO_MATCHING,
     CONF_PHASES,
+    CONF_PUBLISH_INTERVAL,
+    CONFIG_MINOR_VERSION,
+    CONFIG_VERSION,
+    DEFAULT_CHARGER_DEADBAND,
+    DEFAULT_CHARGER_PRIORITY,
+    DEFAULT_CHARGER_RESPONSE_TIME,
+    DEFAULT_CHARGER_STEP,
+    DEFAULT_PUBLISH_INTERVAL,
     DOMAIN,
-    NAME_EASEE,
-    NAME_SLIMMELEZER,
-    NAME_TEMPLATE,
     Phases,
 )
+from .helpers.device_index import get_device_index
 from .mains import Mains
-from .mains.slimmelezer import MainsSlimmelezer
-from .mains.template import MainsTemplate
+from .phase_matching import PhaseCommandFailed, PhaseLearningFailed, PhaseMatcher
 
 _LOGGER = logging.getLogger(__name__)
 
-_CHARGER_CLASS_FROM_NAME = {
-    NAME_EASEE: ChargerEasee,
-    NAME_TEMPLATE: ChargerTemplate,
-}
-_MAINS_CLASS_FROM_NAME = {
-    NAME_SLIMMELEZER: MainsSlimmelezer,
-    NAME_TEMPLATE: MainsTemplate,
-}
-
-USER_SCHEMA = vol.Schema(
-    {
-        vol.Required(CONF_NAME): str,
-        vol.Required(CONF_MAINS_TYPE): vol.In(
-            _MAINS_CLASS_FROM_NAME.keys(),
-        ),
-        vol.Required(CONF_CHARGER_TYPE): vol.In(
-            _CHARGER_CLASS_FROM_NAME.keys(),
-        ),
-        vol.Required(CONF_DEVELOPER_MODE, default=False): bool,
-    }
-)
 
+def _user_schema(developer_mode: bool) -> vol.Schema:
+    """Get schema of user step, simulated backends only in developer mode."""
 
-def get_charger(
-    hass: HomeAssistant,
-    data,
-    options,
-    update_callback,
-) -> Charger:
-    """Get the charger object from config entry."""
-    if CONF_CHARGER_TYPE not in data:
-        raise ConfigEntryError("No charger type defined in config")
-    if data[CONF_CHARGER_TYPE] in _CHARGER_CLASS_FROM_NAME:
-        charger_class = _CHARGER_CLASS_FROM_NAME[data[CONF_CHARGER_TYPE]]
-        return charger_class(
-            hass,
-            update_callback,
-            options[CONF_CHARGER],
-        )
-    raise ConfigEntryError(
-        f"The provided charger type ({data[CONF_CHARGER_TYPE]}) is not supported"
-    )
-
+    def types(backends: dict[str, tuple[str, str]]) -> list[str]:
+        return [
+            name
+            for name in backends
+            if developer_mode or name not in DEVELOPER_BACKENDS
+        ]
 
-def get_mains(
-    hass: HomeAssistant,
-    data,
-    options,
-    update_callback,
-) -> Mains:
-    """Get the mains object from config entry."""
-    if CONF_MAINS_TYPE not in data:
-        raise ConfigEntryError("No mains type defined in config")
-    if data[CONF_MAINS_TYPE] in _MAINS_CLASS_FROM_NAME:
-        mains_class = _MAINS_CLASS_FROM_NAME[data[CONF_MAINS_TYPE]]
-        return mains_class(
-            hass,
-            update_callback,
-            options[CONF_MAINS],
-        )
-    raise ConfigEntryError(
-        f"The provided mains type ({data[CONF_MAINS_TYPE]}) is not supported"
+    return vol.Schema(
+        {
+            vol.Required(CONF_NAME): str,
+            vol.Required(CONF_MAINS_TYPE): vol.In(
+                types(MAINS_BACKENDS),
+            ),
+            vol.Required(CONF_CHARGER_TYPE): vol.In(
+                types(CHARGER_BACKENDS),
+            ),
+            vol.Required(CONF_DEVELOPER_MODE, default=developer_mode): bool,
+            vol.Required(
+                CONF_PUBLISH_INTERVAL, default=DEFAULT_PUBLISH_INTERVAL
+            ): selector.NumberSelector(
+                selector.NumberSelectorConfig(
+                    min=0,
+                    max=300,
+                    step=1,
+                    unit_of_measurement="seconds",
+                )
+            ),
+        }
     )
 
 
-class PhaseLearningFailed(ConfigEntryError):
-    """Special error if phase learning fails."""
+USER_SCHEMA = _user_schema(developer_mode=False)
+DEVELOPER_USER_SCHEMA = _user_schema(developer_mode=True)
 
 
 class EvLoadBalancingConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """EvLoadBalancing config flow."""
 
-    VERSION = 0
-    MINOR_VERSION = 3
-    data = {}
-    options = {}
+    VERSION = CONFIG_VERSION
+    MINOR_VERSION = CONFIG_MINOR_VERSION
 
-    async def _async_get_devices(self, search_str: str):
-        devices = {}
-        for device_entry in dr.async_get(self.hass).devices.values():
-            if (
-                device_entry.manufacturer
-                and search_str.lower() in device_entry.manufacturer.strip().lower()
-            ) or (
-                device_entry.name
-                and search_str.lower() in device_entry.name.strip().lower()
-            ):
-                devices[device_entry.id] = device_entry.name
-        return devices
+    def __init__(self) -> None:
+        """Initialize flow."""
+        self.data = {}
+        self.options = {}
+        self._developer_types = False
+
+    async def _async_get_devices(self, device_class: type[Mains | Charger]):
+        return dict(get_device_index(self.hass).devices(device_class))
+
+    def _suggested_values(self, key: str, type_key: str) -> dict[str, Any]:
+        """Get options of the reconfigured entry, if keeping the same backend."""
+        if self.source != config_entries.SOURCE_RECONFIGURE:
+            return {}
+        entry = self._get_reconfigure_entry()
+        if entry.data.get(type_key) != self.data[type_key]:
+            return {}
+        return entry.options.get(key, {})
 
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Handle initial user step."""
+        return await self._async_step_types("user", USER_SCHEMA, user_input)
+
+    async def async_step_reconfigure(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Handle reconfiguring an entry, through the same steps as the setup."""
+        schema = USER_SCHEMA
+        if user_input is None:
+            entry = self._get_reconfigure_entry()
+            self._developer_types = bool(entry.data.get(CONF_DEVELOPER_MODE))
+            if self._developer_types:
+                schema = DEVELOPER_USER_SCHEMA
+            schema = self.add_suggested_values_to_schema(schema, entry.data)
+            if CONF_PHASES in entry.options:
+                self.options[CONF_PHASES] = dict(entry.options[CONF_PHASES])
+        return await self._async_step_types("reconfigure", schema, user_input)
+
+    async def _async_step_types(
+        self, step_id: str, schema: vol.Schema, user_input: dict[str, Any] | None
+    ) -> FlowResult:
+        """Handle selecting backends, simulated ones only in developer mode."""
         errors: dict[str, str] = {}
 
         if user_input is not None:
-            self.data = user_input
-            return await self.async_step_mains()
+            types = (user_input[CONF_MAINS_TYPE], user_input[CONF_CHARGER_TYPE])
+            if user_input[CONF_DEVELOPER_MODE] and not self._developer_types:
+                # Ask again, now offering the simulated backends
+                self._developer_types = True
+            elif user_input[CONF_DEVELOPER_MODE] or not any(
+                name in DEVELOPER_BACKENDS for name in types
+            ):
+                self.data = user_input
+                return await self.async_step_mains()
+            else:
+                errors["base"] = "developer_mode_required"
+            schema = self.add_suggested_values_to_schema(
+                DEVELOPER_USER_SCHEMA, user_input
+            )
 
         return self.async_show_form(
-            step_id="user",
-            data_schema=USER_SCHEMA,
+            step_id=step_id,
+            data_schema=schema,
             errors=errors,
         )
 
@@ -155,7 +176,7 @@ class EvLoadBalancingConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Handle device selection step."""
-        mains_class: Mains = _MAINS_CLASS_FROM_NAME[self.data[CONF_MAINS_TYPE]]
+        mains_class = await async_get_mains_class(self.hass, self.data[CONF_MAINS_TYPE])
         errors: dict[str, str] = {}
 
         if user_input is not None:
@@ -164,9 +185,16 @@ class EvLoadBalancingConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 return await self.async_step_charger()
             errors["base"] = "Invalid_input"
 
-        mains = await self._async_get_devices(self.data[CONF_MAINS_TYPE])
+        mains = await self._async_get_devices(mains_class)
 
-        schema = mains_class.get_schema({CONF_DEVICE_ID: mains})
+        schema = mains_class.get_schema({CONF_DEVICE_ID: mains}).extend(
+            {
+                vol.Required(CONF_MAINS_SHARED, default=False): bool,
+            }
+        )
+        schema = self.add_suggested_values_to_schema(
+            schema, self._suggested_values(CONF_MAINS, CONF_MAINS_TYPE)
+        )
 
         return self.async_show_form(
             step_id="mains",
@@ -178,7 +206,9 @@ class EvLoadBalancingConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Handle device selection step."""
-        charger_class: Charger = _CHARGER_CLASS_FROM_NAME[self.data[CONF_CHARGER_TYPE]]
+        charger_class = await async_get_charger_class(
+            self.hass, self.data[CONF_CHARGER_TYPE]
+        )
         errors: dict[str, str] = {}
 
         if user_input is not None:
@@ -190,11 +220,18 @@ class EvLoadBalancingConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     + "_"
                     + self.options[CONF_CHARGER][CONF_DEVICE_ID]
                 )
-                self._abort_if_unique_id_configured()
+                if (
+                    self.source != config_entries.SOURCE_RECONFIGURE
+                    or self.unique_id != self._get_reconfigure_entry().unique_id
+                ):
+                    self._abort_if_unique_id_configured()
 
                 if self.options[CONF_CHARGER][CONF_PHASE_AUTO_MATCHING]:
                     try:
                         return await self.async_step_auto_phases()
+                    except PhaseCommandFailed as err:
+                        _LOGGER.warning("Phase matching aborted: %s", err)
+                        errors["base"] = "auto_phase_matching_command_failed"
                     except PhaseLearningFailed:
                         errors["base"] = "auto_phase_matching_failed"
                 else:
@@ -203,13 +240,57 @@ class EvLoadBalancingConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             else:
                 errors["base"] = "Invalid_input"
 
-        chargers = await self._async_get_devices(self.data[CONF_CHARGER_TYPE])
+        chargers = await self._async_get_devices(charger_class)
 
         schema = charger_class.get_schema({CONF_DEVICE_ID: chargers}).extend(
             {
+                vol.Required(
+                    CONF_CHARGER_DEADBAND, default=DEFAULT_CHARGER_DEADBAND
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0,
+                        max=5,
+                        step=0.1,
+                        unit_of_measurement="ampere",
+                    )
+                ),
+                vol.Required(
+                    CONF_CHARGER_STEP, default=DEFAULT_CHARGER_STEP
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0,
+                        max=5,
+                        step=0.1,
+                        unit_of_measurement="ampere",
+                    )
+                ),
+                vol.Required(
+                    CONF_CHARGER_PRIORITY, default=DEFAULT_CHARGER_PRIORITY
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0,
+                        max=10,
+                        step=1,
+                        mode=selector.NumberSelectorMode.BOX,
+                    )
+                ),
+                vol.Required(CONF_CHARGER_FORECAST, default=False): bool,
+                vol.Required(
+                    CONF_CHARGER_RESPONSE_TIME, default=DEFAULT_CHARGER_RESPONSE_TIME
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0,
+                        max=60,
+                        step=0.5,
+                        unit_of_measurement="seconds",
+                    )
+                ),
                 vol.Required(CONF_PHASE_AUTO_MATCHING, default=False): bool,
             }
         )
+        schema = self.add_suggested_values_to_schema(
+            schema, self._suggested_values(CONF_CHARGER, CONF_CHARGER_TYPE)
+        )
 
         return self.async_show_form(
             step_id="charger",
@@ -223,77 +304,26 @@ class EvLoadBalancingConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Handle auto-phase matching."""
         # errors: dict[str, str] = {}
 
-        mains = get_mains(
+        charger = get_charger(
             self.hass,
             self.data,
             self.options,
             None,
         )
-        mains.update()
 
-        charger = get_charger(
+        # Mains state changes are pushed to the matcher as samples
+        matcher = PhaseMatcher(charger)
+        mains = get_mains(
             self.hass,
             self.data,
             self.options,
-            None,
+            matcher.async_mains_changed,
         )
-
-        phase_matches: dict[Phases, Phases] = {
-            Phases.PHASE1: None,
-            Phases.PHASE2: None,
-            Phases.PHASE3: None,
-        }
-        for c_phase in Phases:
-            # Deactivate all phases on charger
-            await charger.async_set_limits(0.0, 0.0, 0.0)
-            await asyncio.sleep(10)
-            base_values = {
-                Phases.PHASE1: mains.get_phase(Phases.PHASE1).actual_current(),
-                Phases.PHASE2: mains.get_phase(Phases.PHASE2).actual_current(),
-                Phases.PHASE3: mains.get_phase(Phases.PHASE3).actual_current(),
-            }
-
-            # Activate one phase
-            await charger.async_set_limits(
-                (10.0 if c_phase == Phases.PHASE1 else 0.0),
-                (10.0 if c_phase == Phases.PHASE2 else 0.0),
-                (10.0 if c_phase == Phases.PHASE3 else 0.0),
-            )
-            await asyncio.sleep(10)
-
-            #  Try to find one phase that has increased significantly in load
-            for attempt in range(120):
-                found = False
-                for m_phase in Phases:
-                    if (
-                        base_values[m_phase] + 6
-                        < mains.get_phase(m_phase).actual_current()
-                    ):
-                        phase_matches[c_phase] = m_phase
-                        _LOGGER.debug(
-                            "Found match for charger %s in mains %s after %u attempts",
-                            c_phase.name,
-                            m_phase.name,
-                            attempt,
-                        )
-                        found = True
-
-                # Break if found or wait a second and try again
-                if found:
-                    break
-                await asyncio.sleep(1)
-
-            else:
-                raise PhaseLearningFailed(
-                    f"Could not find a matching mains phase for charger phase {c_phase.name}"
-                )
-
-        if (
-            any(m is None for m in phase_matches.values())  # A phase was not detected
-            or len(set(phase_matches.values())) < 3  # Unique phases was not detected
-        ):
-            # _LOGGER.warning("Failed to match phases, will continue to manual setup")
-            raise PhaseLearningFailed("Failed to match phases")
+        try:
+            phase_matches = await matcher.async_match(mains)
+        finally:
+            mains.cleanup()
+            await charger.async_cleanup()
 
         _LOGGER.info("Matching found, will continue to manual step to confirm")
         self.options[CONF_PHASES] = {
@@ -336,6 +366,14 @@ class EvLoadBalancingConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             ):
                 errors["base"] = "duplicate_phase_matching"
 
+            elif self.source == config_entries.SOURCE_RECONFIGURE:
+                return self.async_update_reload_and_abort(
+                    self._get_reconfigure_entry(),
+                    unique_id=self.unique_id,
+                    title=self.data[CONF_NAME],
+                    data=self.data,
+                    options=self.options,
+                )
             else:
                 _LOGGER.debug(
                     'Creating entry "%s" with data "%s" and options %s',
@@ -17,26 +17,62 @@ CONF_CHARGER = "charger"
 CONF_MAINS = "mains"
 CONF_PHASES = "phases"
 
+CONFIG_VERSION = 0
+CONFIG_MINOR_VERSION = 3
+
 CONF_DEVELOPER_MODE = "developer_mode"
 CONF_PHASE_AUTO_MATCHING = "phase_auto_matching"
+CONF_PUBLISH_INTERVAL = "publish_interval"
 
 CONF_DEVICE_ID = "device_id"
 
+CONF_MAINS_BAUDRATE = "mains_baudrate"
+CONF_MAINS_HOST = "mains_host"
 CONF_MAINS_LIMIT = "mains_limit"
+CONF_MAINS_METER = "mains_meter"
 CONF_MAINS_PHASE1 = "mains_phase1"
 CONF_MAINS_PHASE2 = "mains_phase2"
 CONF_MAINS_PHASE3 = "mains_phase3"
+CONF_MAINS_POLL_INTERVAL = "mains_poll_interval"
+CONF_MAINS_PORT = "mains_port"
+CONF_MAINS_SHARED = "mains_shared"
 CONF_MAINS_TYPE = "mains_type"
+CONF_MAINS_UNIT = "mains_unit"
 
 CONF_CHARGER_ACTIVE = "charger_active"
 CONF_CHARGER_COMMAND = "charger_command"
+CONF_CHARGER_DEADBAND = "charger_deadband"
 CONF_CHARGER_EXPIRES = "charger_expires"
+CONF_CHARGER_FORECAST = "charger_forecast"
+CONF_CHARGER_HOST = "charger_host"
+CONF_CHARGER_ID = "charger_id"
 CONF_CHARGER_PHASE1 = "charger_phase1"
 CONF_CHARGER_PHASE2 = "charger_phase2"
 CONF_CHARGER_PHASE3 = "charger_phase3"
+CONF_CHARGER_PORT = "charger_port"
+CONF_CHARGER_PRIORITY = "charger_priority"
 CONF_CHARGER_LIMIT = "charger_limit"
+CONF_CHARGER_RATED_CURRENT = "charger_rated_current"
+CONF_CHARGER_RESPONSE_TIME = "charger_response_time"
+CONF_CHARGER_STEP = "charger_step"
 CONF_CHARGER_TYPE = "charger_type"
 
+DEFAULT_CHARGER_DEADBAND = 1.0
+DEFAULT_CHARGER_HOST = "0.0.0.0"
+DEFAULT_CHARGER_PORT = 9000
+DEFAULT_CHARGER_PRIORITY = 0
+DEFAULT_CHARGER_RESPONSE_TIME = 5.0
+DEFAULT_CHARGER_STEP = 0.5
+DEFAULT_MAINS_BAUDRATE = 115200
+DEFAULT_MAINS_POLL_INTERVAL = 1.0
+DEFAULT_PUBLISH_INTERVAL = 10
+
+MIN_CHARGING_CURRENT = 6
+
+NAME_DSMR = "dsmr"
 NAME_SLIMMELEZER = "slimmelezer"
 NAME_EASEE = "easee"
+NAME_MODBUS = "modbus"
+NAME_OCPP = "ocpp"
 NAME_TEMPLATE = "template"
+NAME_VIRTUAL = "virtual"
@@ -4,67 +4,131 @@ from __future__ import annotations
 
 from datetime import UTC, datetime
 import logging
+import time
 
 from homeassistant.config_entries import ConfigEntry, Debouncer
 from homeassistant.const import CONF_NAME
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
+from .allocation import AllocationGroup, get_allocation_group
+from .backends import get_charger, get_mains
 from .chargers import Charger, ChargerPhase, ChargingState
-from .config_flow import get_charger, get_mains
 from .const import (
+    CONF_CHARGER,
+    CONF_CHARGER_DEADBAND,
+    CONF_CHARGER_FORECAST,
     CONF_CHARGER_PHASE1,
     CONF_CHARGER_PHASE2,
     CONF_CHARGER_PHASE3,
+    CONF_CHARGER_PRIORITY,
+    CONF_CHARGER_RESPONSE_TIME,
+    CONF_CHARGER_STEP,
     CONF_DEVELOPER_MODE,
+    CONF_MAINS,
     CONF_MAINS_PHASE1,
     CONF_MAINS_PHASE2,
     CONF_MAINS_PHASE3,
+    CONF_MAINS_SHARED,
     CONF_PHASES,
+    CONF_PUBLISH_INTERVAL,
+    DEFAULT_CHARGER_DEADBAND,
+    DEFAULT_CHARGER_PRIORITY,
+    DEFAULT_CHARGER_RESPONSE_TIME,
+    DEFAULT_CHARGER_STEP,
+    DEFAULT_PUBLISH_INTERVAL,
     Phases,
 )
+from .helpers.command_channel import CommandChannel
+from .helpers.deadband import CommandDeadband
+from .helpers.forecast import LoadForecast
+from .helpers.history_store import PhaseHistoryStore
+from .helpers.rate_scheduler import RateScheduler
+from .helpers.timing import (
+    STAGE_CALCULATE,
+    STAGE_COMMAND,
+    STAGE_READ,
+    STAGE_STATISTICS,
+    StageTimings,
+)
+from .limits import calculate_limits
 from .mains import Mains, MainsPhase
 
 _LOGGER = logging.getLogger(__name__)
 
 
 class PhasePair:
-    """Data analyzer per one phase."""
+    """Mapping of one mains phase to one charger phase."""
+
+    __slots__ = (
+        "_charger_limit",
+        "_charger_phase",
+        "_forecast",
+        "_mains_limit",
+        "_mains_phase",
+        "charger_phase_id",
+        "mains_phase_id",
+    )
 
     def __init__(
         self,
+        mains_phase_id: Phases,
         mains_phase: MainsPhase,
         mains_limit: int,
+        charger_phase_id: Phases,
         charger_phase: ChargerPhase,
         charger_limit: int,
+        forecast: LoadForecast | None = None,
     ) -> None:
         """Pair of Charger and Mains phases."""
+        self.mains_phase_id = mains_phase_id
         self._mains_phase = mains_phase
         self._mains_limit = mains_limit
+        self.charger_phase_id = charger_phase_id
         self._charger_phase = charger_phase
         self._charger_limit = charger_limit
+        self._forecast = forecast
 
-    def get_new_limit(self) -> float | None:
-        """Calculate and return the proposed new limit for phase."""
-        main_actual = self._mains_phase.actual_current()
-        main_stddev = self._mains_phase.stddev_current()
-        charger_set_limit = self._charger_phase.current_limit()
-        if main_actual is None or charger_set_limit is None:
-            return None
-        spare = self._mains_limit - main_actual
-        charger_new_limit = min(
-            charger_set_limit + spare - main_stddev,
-            self._charger_limit,
-            self._mains_limit,
-        )
-        _LOGGER.debug(
-            "Calculated new circuit limit %f (actual: %f, old limit: %f)",
-            charger_new_limit,
-            main_actual,
-            charger_set_limit,
-        )
-        return charger_new_limit
+    def add_sample(self) -> None:
+        """Feed actual mains current to forecast, if any."""
+        if self._forecast is not None:
+            actual = self._mains_phase.actual_current()
+            if actual is not None:
+                self._forecast.add(actual)
+
+    def expected_current(self, horizon: float) -> float | None:
+        """Get mains current expected in `horizon` seconds, or actual current.
+
+        The forecast lags behind load steps, so it only ever raises the actual
+        current, making the controller more conservative.
+        """
+        actual = self._mains_phase.actual_current()
+        if self._forecast is None or actual is None:
+            return actual
+        predicted = self._forecast.predict(horizon)
+        return actual if predicted is None else max(actual, predicted)
+
+    @property
+    def mains_phase(self) -> MainsPhase:
+        """Get mains phase of pair."""
+        return self._mains_phase
+
+    @property
+    def mains_limit(self) -> int:
+        """Get rated mains limit."""
+        return self._mains_limit
+
+    @property
+    def charger_phase(self) -> ChargerPhase:
+        """Get charger phase of pair."""
+        return self._charger_phase
+
+    @property
+    def charger_limit(self) -> int:
+        """Get rated charger limit."""
+        return self._charger_limit
 
 
 class EvLoadBalancingCoordinator(DataUpdateCoordinator):
@@ -72,13 +136,38 @@ class EvLoadBalancingCoordinator(DataUpdateCoordinator):
 
     _mains: Mains
     _charger: Charger
-    _pairs = [PhasePair]
-    _update_callbacks = []
-    _last_update = None
 
     def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry) -> None:
         """Initialize my coordinator."""
         self._hass = hass
+        self._pairs: list[PhasePair] = []
+        self._publish_interval = config_entry.data.get(
+            CONF_PUBLISH_INTERVAL, DEFAULT_PUBLISH_INTERVAL
+        )
+        self._last_publish: float | None = None
+        self._unsub_publish: CALLBACK_TYPE | None = None
+        self._last_update = None
+        self._timings: StageTimings | None = None
+        self._timings_users = 0
+
+        # Backends first, so a backend that is not ready leaves nothing to shut down
+        self._mains = get_mains(
+            hass,
+            config_entry.data,
+            config_entry.options,
+            self._async_request_input_refresh,
+        )
+        try:
+            self._charger = get_charger(
+                hass,
+                config_entry.data,
+                config_entry.options,
+                self._async_request_input_refresh,
+            )
+        except Exception:
+            self._mains.cleanup()
+            raise
+
         super().__init__(
             hass,
             _LOGGER,
@@ -94,13 +183,38 @@ class EvLoadBalancingCoordinator(DataUpdateCoordinator):
         )
 
         self._developer_mode = config_entry.data[CONF_DEVELOPER_MODE]
+        self._priority = config_entry.options[CONF_CHARGER].get(
+            CONF_CHARGER_PRIORITY, DEFAULT_CHARGER_PRIORITY
+        )
+        self._shared = config_entry.options[CONF_MAINS].get(CONF_MAINS_SHARED, False)
+        self._forecast = config_entry.options[CONF_CHARGER].get(
+            CONF_CHARGER_FORECAST, False
+        )
+        self._response_time = config_entry.options[CONF_CHARGER].get(
+            CONF_CHARGER_RESPONSE_TIME, DEFAULT_CHARGER_RESPONSE_TIME
+        )
+        self._group: AllocationGroup | None = None
+        self._history_store = PhaseHistoryStore(hass, config_entry.entry_id)
 
-        self._mains = get_mains(
-            hass, config_entry.data, config_entry.options, self.async_request_refresh
+        self._rate = RateScheduler(self._mains.get_rated_limit())
+        self._last_refresh = 0.0
+
+        self._deadband = CommandDeadband(
+            config_entry.options[CONF_CHARGER].get(
+                CONF_CHARGER_DEADBAND, DEFAULT_CHARGER_DEADBAND
+            ),
+            config_entry.options[CONF_CHARGER].get(
+                CONF_CHARGER_STEP, DEFAULT_CHARGER_STEP
+            ),
+            self._charger.time_to_live,
         )
 
-        self._charger = get_charger(
-            hass, config_entry.data, config_entry.options, self.async_request_refresh
+        self._commands = CommandChannel(
+            hass,
+            self.name,
+            self._async_send_limits,
+            self._deadband,
+            lambda limits: self._charger.replace_limits(*limits),
         )
 
         self._mapping = {
@@ -120,28 +234,139 @@ class EvLoadBalancingCoordinator(DataUpdateCoordinator):
         """Get last update timestamp."""
         return self._last_update
 
-    def register_output_listener_entity(self, callback_func) -> None:
-        """Register output entity."""
-        self._update_callbacks.append(callback_func)
+    @property
+    def pairs(self) -> list[PhasePair]:
+        """Get phase pairs."""
+        return self._pairs
 
-    async def update_listener(self, config_entry):
-        """Handle options update."""
-        raise NotImplementedError(
-            f"Coordinator has not function for handling new config_entry ({config_entry})"
-        )
+    @property
+    def priority(self) -> int:
+        """Get priority of charger when sharing mains."""
+        return self._priority
+
+    @property
+    def response_time(self) -> float:
+        """Get seconds from limit command until charger draws the new current."""
+        return self._response_time
+
+    @property
+    def charging_active(self) -> bool:
+        """Get if charging is active or pending, always true in developer mode."""
+        return self._developer_mode or self._charger.charging_state in [
+            ChargingState.CHARGING,
+            ChargingState.PENDING,
+        ]
+
+    @property
+    def update_rate(self) -> float:
+        """Get effective rate of control updates in Hz."""
+        return self._rate.rate
+
+    @property
+    def commands_sent(self) -> int:
+        """Get number of limit commands accepted by charger."""
+        return self._commands.sent_count
+
+    @property
+    def commands_skipped(self) -> int:
+        """Get number of limit commands skipped due to deadband."""
+        return self._deadband.skipped_count
+
+    @property
+    def command_queue_depth(self) -> int:
+        """Get number of limit commands pending or in flight."""
+        return self._commands.depth
+
+    @property
+    def commands_superseded(self) -> int:
+        """Get number of limit commands replaced by newer ones before sending."""
+        return self._commands.superseded_count
+
+    @property
+    def command_latency(self) -> float | None:
+        """Get seconds from submitting last sent limit command until done."""
+        return self._commands.latency
+
+    @property
+    def timings(self) -> StageTimings | None:
+        """Get timings of update stages, None if not enabled."""
+        return self._timings
+
+    def enable_timings(self) -> None:
+        """Start timing update stages, for as long as a user needs them."""
+        if self._timings is None:
+            self._timings = StageTimings()
+        self._timings_users += 1
+
+    def disable_timings(self) -> None:
+        """Stop timing update stages when the last user is gone."""
+        self._timings_users -= 1
+        if self._timings_users <= 0:
+            self._timings_users = 0
+            self._timings = None
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update entities, at most once per publish interval.
+
+        Updates within the interval are merged into one, published when the
+        interval has passed.
+        """
+        if self._unsub_publish is not None:
+            return
+        now = time.monotonic()
+        if self._last_publish is not None:
+            wait = self._last_publish + self._publish_interval - now
+            if wait > 0:
+                self._unsub_publish = async_call_later(
+                    self.hass, wait, self._async_publish
+                )
+                return
+        self._last_publish = now
+        super().async_update_listeners()
+
+    @callback
+    def _async_publish(self, _now: datetime) -> None:
+        """Publish merged updates to entities."""
+        self._unsub_publish = None
+        self._last_publish = time.monotonic()
+        super().async_update_listeners()
+
+    async def async_setup_backends(self) -> None:
+        """Start backends, raising ConfigEntryNotReady if not possible yet."""
+        await self._charger.async_setup()
+
+    async def async_config_entry_first_refresh(self) -> None:
+        """Refresh first time, leaving the allocation group if it fails."""
+        try:
+            await super().async_config_entry_first_refresh()
+        except Exception:
+            if self._group is not None:
+                self._group.remove(self)
+                self._group = None
+            raise
 
     def cleanup(self) -> None:
         """Cleanup any pending event listers etc."""
+        if self._unsub_publish is not None:
+            self._unsub_publish()
+            self._unsub_publish = None
+        if self._group is not None:
+            self._group.remove(self)
+            self._group = None
         self._mains.cleanup()
         self._charger.cleanup()
 
     async def async_shutdown(self) -> None:
         """Cancel any scheduled call, and ignore new runs."""
+        # Charger cleanup drops commands it still waits to send
+        self._commands.clear()
+        # Wait for servers to close, so a reload can listen on their ports again
+        await self._charger.async_cleanup()
         self.cleanup()
-        # self._shutdown_requested = True
-        # self._async_unsub_refresh()
-        # self._async_unsub_shutdown()
-        # self._debounced_refresh.async_shutdown()
+        await self._commands.async_join()
+        await self._history_store.async_save()
+        await super().async_shutdown()
 
     def get_device_info(self) -> DeviceInfo:
         """Get device info to group entities."""
@@ -157,9 +382,11 @@ class EvLoadBalancingCoordinator(DataUpdateCoordinator):
     async def _async_setup_method(self) -> bool:
         """Setups call method."""
         self._pairs.clear()
+        self._charger.update()
+        self._mains.update()
         mains_limit = self._mains.get_rated_limit()
         charger_limit = self._charger.get_rated_limit()
-        for ch, ma in self._mapping.items():
+        for ma, ch in self._mapping.items():
             mains_phase = self._mains.get_phase(ma)
             charger_phase = self._charger.get_phase(ch)
             if (
@@ -180,48 +407,146 @@ class EvLoadBalancingCoordinator(DataUpdateCoordinator):
             )
             self._pairs.append(
                 PhasePair(
+                    ma,
                     mains_phase,
                     mains_limit,
+                    ch,
                     charger_phase,
                     charger_limit,
+                    LoadForecast() if self._forecast else None,
                 )
             )
+        # Warm start statistics, so first limits keep a margin for variance
+        await self._history_store.async_restore(
+            (pair.mains_phase_id, pair.mains_phase) for pair in self._pairs
+        )
+        if self._shared:
+            self._group = get_allocation_group(self._hass, self._mains.device_id)
+            self._group.add(self)
         self._shutdown_requested = False
         _LOGGER.info("Setup successful")
         return True
 
+    async def _async_request_input_refresh(self) -> None:
+        """Request refresh on input change, right away if mains is overloaded."""
+        for pair in self._pairs:
+            pair.add_sample()
+        if (
+            any(
+                (actual := pair.mains_phase.actual_current()) is not None
+                and actual > pair.mains_limit
+                for pair in self._pairs
+            )
+            and time.monotonic() - self._last_refresh >= self._rate.fast_cooldown
+        ):
+            _LOGGER.debug("Mains overloaded, refreshing without cooldown")
+            self._debounced_refresh.async_cancel()
+            await self.async_refresh()
+        else:
+            await self.async_request_refresh()
+
+    def _schedule_next_update(self) -> None:
+        """Adapt cooldown of refresh requests to headroom and variance on mains."""
+        spare = []
+        stddev = []
+        if self.charging_active:
+            for pair in self._pairs:
+                actual = pair.mains_phase.actual_current()
+                if actual is not None:
+                    spare.append(pair.mains_limit - actual)
+                    stddev.append(pair.mains_phase.stddev_current())
+        if spare:
+            self._rate.update(min(spare), max(stddev))
+        else:
+            self._rate.reset()
+        self._debounced_refresh.cooldown = self._rate.cooldown
+        self._debounced_refresh.immediate = self._rate.immediate
+
     async def _async_update_method(self):
         """Update call function."""
         _LOGGER.info("Updating service")
+        self._last_refresh = time.monotonic()
+        self._schedule_next_update()
+        self._history_store.async_schedule_save()
 
-        self._charger.update()
-        self._mains.update()
-
+        # Inputs are pushed by the state change events that trigger the refresh
         if self._charger.charging_state not in [
             ChargingState.CHARGING,
             ChargingState.PENDING,
         ]:
             self._last_update = None
+            self._deadband.reset()
             _LOGGER.debug("Skipping update since no charging active or pending")
             if self._developer_mode:
                 _LOGGER.warning(
                     "Abort call due to charging not active disabled during development"
                 )
-            else:
+            elif self._group is None:
                 return
 
-        new_limits = []
-        for pair in self._pairs:
-            new_limit = pair.get_new_limit()
-            if new_limit is None:
-                _LOGGER.warning("Skipping update since None value found")
-                return
-            new_limits.append(new_limit)
+        # Let the group re-allocate, also when this charger stopped charging
+        if self._group is not None:
+            await self._group.async_request_allocation()
+            return
 
-        if len(new_limits) >= 3:
-            await self._charger.async_set_limits(
-                new_limits[0], new_limits[1], new_limits[2]
-            )
+        if len(self._pairs) < 3:
+            return
+
+        timings = self._timings
+        start = timings.start() if timings is not None else 0.0
+
+        # Size limits against the load expected once the charger has responded
+        mains_actual = [
+            pair.expected_current(self._response_time) for pair in self._pairs
+        ]
+        charger_set = [pair.charger_phase.current_limit() for pair in self._pairs]
+        if None in mains_actual or None in charger_set:
+            _LOGGER.warning("Skipping update since None value found")
+            return
+        if timings is not None:
+            start = timings.record(STAGE_READ, start)
+
+        mains_stddev = [pair.mains_phase.stddev_current() for pair in self._pairs]
+        if timings is not None:
+            start = timings.record(STAGE_STATISTICS, start)
+
+        _, limits = calculate_limits(
+            mains_actual,
+            mains_stddev,
+            self._pairs[0].mains_limit,
+            charger_set,
+            [self._pairs[0].charger_limit],
+        )
+        _LOGGER.debug(
+            "Calculated new limits %s (actual: %s, old limits: %s)",
+            limits,
+            mains_actual,
+            charger_set,
+        )
+
+        new_limits = [0.0, 0.0, 0.0]
+        for pair, limit in zip(self._pairs, limits, strict=True):
+            new_limits[pair.charger_phase_id.value] = limit
+        if timings is not None:
+            timings.record(STAGE_CALCULATE, start)
+        await self.async_set_limits(new_limits)
+
+    async def async_set_limits(self, new_limits: list[float]) -> None:
+        """Submit limits per charger phase, unless within deadband."""
+        now = time.monotonic()
+        limits = self._deadband.check(new_limits, now)
+        if limits is None:
+            _LOGGER.debug("Skipping charger command since limits within deadband")
+        else:
+            self._commands.submit(limits)
+
+    async def _async_send_limits(self, limits: tuple[float, ...]) -> bool:
+        """Send limits to charger, called by command channel one at a time."""
+        timings = self._timings
+        start = timings.start() if timings is not None else 0.0
+        sent = await self._charger.async_set_limits(limits[0], limits[1], limits[2])
+        if timings is not None:
+            timings.record(STAGE_COMMAND, start)
+        if sent:
             self._last_update = datetime.now(UTC)
-            for callback_func in self._update_callbacks:
-                callback_func()
+        return bool(sent)
@@ -0,0 +1,120 @@
+"""Channel of limit commands to a charger, keeping only the latest."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import logging
+import time
+
+from homeassistant.core import HomeAssistant
+
+from .deadband import CommandDeadband
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CommandChannel:
+    """Send commands one at a time, newer submissions replace pending ones.
+
+    Submitting does not wait for the charger. While a command is in flight
+    later submissions are held, and only the latest of them is sent next, so
+    a slow charger never receives a backlog of stale limits. When the charger
+    can still `replace` the limits in flight, as while they wait for a rate
+    limit, newer submissions replace them instead of waiting. The deadband
+    only learns of limits as sent once the charger accepted them, and is
+    reset when it did not or sending failed in any way, so the next update
+    sends them again.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        name: str,
+        send: Callable[[tuple[float, ...]], Awaitable[bool]],
+        deadband: CommandDeadband,
+        replace: Callable[[tuple[float, ...]], bool] | None = None,
+    ) -> None:
+        """Initialize object."""
+        self._hass = hass
+        self._name = name
+        self._send = send
+        self._replace = replace
+        self._deadband = deadband
+        self._pending: tuple[float, ...] | None = None
+        self._in_flight: tuple[float, ...] | None = None
+        self._in_flight_submitted = 0.0
+        self._submitted = 0.0
+        self._task: asyncio.Task | None = None
+        self.sent_count = 0
+        self.superseded_count = 0
+        self.failed_count = 0
+        self.latency: float | None = None
+
+    @property
+    def depth(self) -> int:
+        """Number of commands pending or in flight."""
+        return (self._pending is not None) + (self._task is not None)
+
+    def submit(self, limits: tuple[float, ...]) -> None:
+        """Queue limits to send, replacing limits not sent yet."""
+        if self._pending is not None:
+            self.superseded_count += 1
+        self._deadband.submitted(limits)
+        if (
+            self._in_flight is not None
+            and self._replace is not None
+            and self._replace(limits)
+        ):
+            self.superseded_count += 1
+            self._in_flight, self._in_flight_submitted = limits, time.monotonic()
+            self._pending = None
+            return
+        self._pending = limits
+        self._submitted = time.monotonic()
+        if self._task is None:
+            task = self._hass.async_create_background_task(
+                self._async_run(), f"{self._name} commands"
+            )
+            # Eagerly started task may have sent all already
+            if not task.done():
+                self._task = task
+
+    async def _async_run(self) -> None:
+        """Send pending commands until there are none."""
+        try:
+            while self._pending is not None:
+                self._in_flight, self._in_flight_submitted = (
+                    self._pending,
+                    self._submitted,
+                )
+                self._pending = None
+                sent = False
+                try:
+                    sent = await self._send(self._in_flight)
+                except Exception:
+                    _LOGGER.exception(
+                        "Sending %s to %s failed", self._in_flight, self._name
+                    )
+                finally:
+                    # Limits in flight may have been replaced while they waited
+                    limits, self._in_flight = self._in_flight, None
+                    # Also when cancelled, the charger may not have the limits
+                    if sent:
+                        self.sent_count += 1
+                        self.latency = time.monotonic() - self._in_flight_submitted
+                        self._deadband.sent(limits, time.monotonic())
+                    else:
+                        self.failed_count += 1
+                        self._deadband.reset()
+        finally:
+            self._task = None
+
+    async def async_join(self) -> None:
+        """Wait until all commands are sent."""
+        while self._task is not None:
+            await asyncio.shield(self._task)
+
+    def clear(self) -> None:
+        """Drop pending command, the one in flight is not affected."""
+        self._pending = None
@@ -0,0 +1,229 @@
+"""Rate limited scheduling of charger commands shared by an account."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass, field
+import itertools
+import logging
+import time
+
+from homeassistant.core import HomeAssistant
+
+from ..const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_COMMAND_SCHEDULERS = f"{DOMAIN}_command_schedulers"
+
+
+def get_command_scheduler(
+    hass: HomeAssistant, account: str, rate: float, burst: int
+) -> CommandScheduler:
+    """Get or create the command scheduler of an account, shared by its chargers."""
+    schedulers: dict[str, CommandScheduler] = hass.data.setdefault(
+        DATA_COMMAND_SCHEDULERS, {}
+    )
+    scheduler = schedulers.get(account)
+    if scheduler is None:
+        scheduler = schedulers[account] = CommandScheduler(hass, account, rate, burst)
+    scheduler.users += 1
+    return scheduler
+
+
+class TokenBucket:
+    """Allow `burst` commands at once and `rate` commands per second after."""
+
+    __slots__ = ("_burst", "_rate", "_timestamp", "_tokens")
+
+    def __init__(self, rate: float, burst: int) -> None:
+        """Initialize object."""
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._timestamp = time.monotonic()
+
+    def take(self, reserve: int = 0, now: float | None = None) -> float:
+        """Take a token if `reserve` are left, or get seconds until possible."""
+        if now is None:
+            now = time.monotonic()
+        self._tokens = min(
+            self._tokens + (now - self._timestamp) * self._rate, self._burst
+        )
+        self._timestamp = now
+        if self._tokens >= 1 + reserve:
+            self._tokens -= 1
+            return 0.0
+        return (1 + reserve - self._tokens) / self._rate
+
+
+@dataclass
+class _Command:
+    """Latest limits for a circuit, and the callers waiting for them."""
+
+    order: int
+    limits: Sequence[float]
+    send: Callable[[Sequence[float]], Awaitable[None]]
+    waiters: list[asyncio.Future[bool]] = field(default_factory=list)
+
+
+class CommandScheduler:
+    """Send commands of all circuits of an account within its rate limit.
+
+    A circuit has at most one pending command, newer limits replace the older
+    ones. Commands that lower the limit of any phase of their circuit are sent
+    before increases, and increases leave `reserve` tokens for them, so a cut
+    never waits for routine increases. Increases are sent in order of their
+    first submission so none are starved.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        account: str,
+        rate: float,
+        burst: int,
+        reserve: int = 2,
+    ) -> None:
+        """Initialize object."""
+        self._hass = hass
+        self._account = account
+        self._bucket = TokenBucket(rate, burst)
+        self._reserve = min(reserve, burst - 1)
+        self._wakeup = asyncio.Event()
+        self._order = itertools.count()
+        self._pending: dict[str, _Command] = {}
+        self._sent: dict[str, Sequence[float]] = {}
+        self._task: asyncio.Task | None = None
+        self._waiting = False
+        self.users = 0
+        self.sent_count = 0
+        self.merged_count = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of circuits with a command waiting to be sent."""
+        return len(self._pending)
+
+    def is_reduction(self, circuit: str, limits: Sequence[float]) -> bool:
+        """Check if limits lower any phase compared to last sent, or none was."""
+        sent = self._sent.get(circuit)
+        return sent is None or any(
+            new < old for new, old in zip(limits, sent, strict=True)
+        )
+
+    async def async_send(
+        self,
+        circuit: str,
+        limits: Sequence[float],
+        send: Callable[[Sequence[float]], Awaitable[None]],
+    ) -> bool:
+        """Send limits to circuit when allowed, False if dropped before sending."""
+        future: asyncio.Future[bool] = self._hass.loop.create_future()
+        command = self._pending.get(circuit)
+        if command is None:
+            command = self._pending[circuit] = _Command(next(self._order), limits, send)
+        else:
+            self.merged_count += 1
+            command.limits = limits
+            command.send = send
+        command.waiters.append(future)
+        self._wakeup.set()
+        if self._task is None:
+            task = self._hass.async_create_background_task(
+                self._async_run(), f"{self._account} command scheduler"
+            )
+            # Eagerly started task may have sent all already
+            if not task.done():
+                self._task = task
+        return await future
+
+    def replace(self, circuit: str, limits: Sequence[float]) -> bool:
+        """Replace limits of the pending command of circuit, False if none is."""
+        command = self._pending.get(circuit)
+        if command is None:
+            return False
+        self.merged_count += 1
+        command.limits = limits
+        # A reduction may be sent sooner than the limits it replaced
+        self._wakeup.set()
+        return True
+
+    def cancel(self, circuit: str) -> None:
+        """Drop pending command of circuit."""
+        command = self._pending.pop(circuit, None)
+        if command is not None:
+            for waiter in command.waiters:
+                if not waiter.done():
+                    waiter.set_result(False)
+        # Stop waiting for a token that nothing needs anymore
+        if not self._pending and self._waiting:
+            self._task.cancel()
+            self._task = None
+
+    def release(self) -> None:
+        """Stop using scheduler, dropping it when no one else does."""
+        self.users -= 1
+        if self.users > 0:
+            return
+        for circuit in list(self._pending):
+            self.cancel(circuit)
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        schedulers = self._hass.data.get(DATA_COMMAND_SCHEDULERS, {})
+        if schedulers.get(self._account) is self:
+            del schedulers[self._account]
+
+    def _next_circuit(self) -> tuple[str, bool]:
+        """Get circuit to send next and if it is a reduction."""
+        reductions = {
+            circuit: self.is_reduction(circuit, command.limits)
+            for circuit, command in self._pending.items()
+        }
+        circuit = min(
+            self._pending,
+            key=lambda circuit: (not reductions[circuit], self._pending[circuit].order),
+        )
+        return circuit, reductions[circuit]
+
+    async def _async_run(self) -> None:
+        """Send pending commands as tokens allow."""
+        try:
+            while self._pending:
+                circuit, reduction = self._next_circuit()
+                wait = self._bucket.take(0 if reduction else self._reserve)
+                if wait > 0:
+                    _LOGGER.debug(
+                        "Rate limited, %d commands wait %.1f s",
+                        len(self._pending),
+                        wait,
+                    )
+                    # Newer commands may not have to wait as long
+                    self._wakeup.clear()
+                    self._waiting = True
+                    try:
+                        async with asyncio.timeout(wait):
+                            await self._wakeup.wait()
+                    except TimeoutError:
+                        pass
+                    finally:
+                        self._waiting = False
+                    continue
+                command = self._pending.pop(circuit)
+                try:
+                    await command.send(command.limits)
+                except Exception as err:
+                    for waiter in command.waiters:
+                        if not waiter.done():
+                            waiter.set_exception(err)
+                    continue
+                self._sent[circuit] = command.limits
+                self.sent_count += 1
+                for waiter in command.waiters:
+                    if not waiter.done():
+                        waiter.set_result(True)
+        finally:
+            if self._task is asyncio.current_task():
+                self._task = None
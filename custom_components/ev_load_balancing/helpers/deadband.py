@@ -0,0 +1,75 @@
+"""Suppression of charger commands that would not change anything."""
+
+import math
+
+
+class CommandDeadband:
+    """Track last commanded limits and filter out insignificant changes."""
+
+    def __init__(
+        self, deadband: float, step: float, time_to_live: float | None
+    ) -> None:
+        """Initialize object.
+
+        Limits are rounded down to a multiple of `step` and only sent if any
+        phase is lower than last sent value, or higher by at least `deadband`,
+        or if half of `time_to_live` (seconds) has passed so the charger limit
+        never expires. Reductions are never held back, as the mains may need
+        them.
+        """
+        self._deadband = deadband
+        self._step = step
+        self._refresh_interval = time_to_live / 2 if time_to_live is not None else None
+        self._last_limits: tuple[float, ...] | None = None
+        self._last_sent: float | None = None
+        self._submitted: tuple[float, ...] | None = None
+        self.sent_count = 0
+        self.skipped_count = 0
+
+    def quantize(self, limits: list[float]) -> tuple[float, ...]:
+        """Round limits down to the closest step."""
+        if self._step <= 0:
+            return tuple(limits)
+        # Small offset to not round down values that are a step but for float errors
+        return tuple(
+            math.floor(limit / self._step + 1e-9) * self._step for limit in limits
+        )
+
+    def check(self, limits: list[float], now: float) -> tuple[float, ...] | None:
+        """Return quantized limits if they should be sent, otherwise None."""
+        quantized = self.quantize(limits)
+        # Compare with limits on their way to the charger, if any
+        last = self._submitted if self._submitted is not None else self._last_limits
+        if (
+            last is None
+            or (
+                self._refresh_interval is not None
+                and self._last_sent is not None
+                and now - self._last_sent >= self._refresh_interval
+            )
+            or any(
+                new < old or new - old >= self._deadband
+                for new, old in zip(quantized, last, strict=True)
+            )
+        ):
+            return quantized
+        self.skipped_count += 1
+        return None
+
+    def submitted(self, limits: tuple[float, ...]) -> None:
+        """Register limits as on their way to charger, not confirmed yet."""
+        self._submitted = limits
+
+    def sent(self, limits: tuple[float, ...], now: float) -> None:
+        """Register limits as accepted by charger."""
+        self._last_limits = limits
+        self._last_sent = now
+        if self._submitted == limits:
+            self._submitted = None
+        self.sent_count += 1
+
+    def reset(self) -> None:
+        """Forget last sent limits, next check will always pass."""
+        self._last_limits = None
+        self._last_sent = None
+        self._submitted = None
@@ -0,0 +1,98 @@
+"""Index of devices that can be selected per mains and charger type."""
+
+from typing import Any
+
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+
+from ..const import DOMAIN
+from .entity_roles import get_entity_roles
+
+DATA_DEVICE_INDEX = f"{DOMAIN}_device_index"
+
+
+def get_device_index(hass: HomeAssistant) -> "DeviceIndex":
+    """Get the device index shared by all config flows."""
+    if DATA_DEVICE_INDEX not in hass.data:
+        hass.data[DATA_DEVICE_INDEX] = DeviceIndex(hass)
+    return hass.data[DATA_DEVICE_INDEX]
+
+
+class DeviceIndex:
+    """Cache of selectable devices per type, kept current by registry events.
+
+    A type is indexed on first use from the devices of the config entries of
+    its `device_domain` only. After that, a changed device is re-checked
+    against the indexed types instead of scanning again.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize object."""
+        self._hass = hass
+        self._devices: dict[type, dict[str, str]] = {}
+        self.build_count = 0
+        # Roles must be dropped by the registry events before devices are re-checked
+        get_entity_roles(hass)
+        hass.bus.async_listen(
+            dr.EVENT_DEVICE_REGISTRY_UPDATED, self._async_device_registry_updated
+        )
+        hass.bus.async_listen(
+            er.EVENT_ENTITY_REGISTRY_UPDATED, self._async_entity_registry_updated
+        )
+
+    def devices(self, device_type: Any) -> dict[str, str]:
+        """Get name per device id of the selectable devices of type."""
+        if device_type not in self._devices:
+            self._devices[device_type] = self._build(device_type)
+        return self._devices[device_type]
+
+    def _build(self, device_type: Any) -> dict[str, str]:
+        """Find the selectable devices of type."""
+        self.build_count += 1
+        devices: dict[str, str] = {}
+        if device_type.device_domain is None:
+            return devices
+        registry = dr.async_get(self._hass)
+        for entry in self._hass.config_entries.async_entries(
+            device_type.device_domain, include_ignore=False
+        ):
+            for device in dr.async_entries_for_config_entry(registry, entry.entry_id):
+                if device_type.match_device(self._hass, device):
+                    devices[device.id] = device.name
+        return devices
+
+    def _recheck(self, device_id: str) -> None:
+        """Add or remove device in each indexed type."""
+        device = dr.async_get(self._hass).async_get(device_id)
+        for device_type, devices in self._devices.items():
+            devices.pop(device_id, None)
+            if device is None or device_type.device_domain is None:
+                continue
+            domains = {
+                entry.domain
+                for entry_id in device.config_entries
+                if (entry := self._hass.config_entries.async_get_entry(entry_id))
+            }
+            if device_type.device_domain in domains and device_type.match_device(
+                self._hass, device
+            ):
+                devices[device_id] = device.name
+
+    @callback
+    def _async_device_registry_updated(
+        self, event: Event[dr.EventDeviceRegistryUpdatedData]
+    ) -> None:
+        """Re-check created, changed or removed device."""
+        self._recheck(event.data["device_id"])
+
+    @callback
+    def _async_entity_registry_updated(
+        self, event: Event[er.EventEntityRegistryUpdatedData]
+    ) -> None:
+        """Re-check device of entity, or index again if it is not known."""
+        entry = er.async_get(self._hass).async_get(event.data["entity_id"])
+        if entry is None or event.data["action"] == "update":
+            # Removed or moved entities may have left a device we cannot tell
+            self._devices.clear()
+        elif entry.device_id is not None:
+            self._recheck(entry.device_id)
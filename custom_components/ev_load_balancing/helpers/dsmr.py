@@ -0,0 +1,104 @@
+"""Streaming parser of DSMR (P1 port) telegrams."""
+
+from __future__ import annotations
+
+import logging
+import re
+from typing import NamedTuple
+
+_LOGGER = logging.getLogger(__name__)
+
+# Instantaneous current per phase, in whole amperes
+OBIS_CURRENT = (b"1-0:31.7.0", b"1-0:51.7.0", b"1-0:71.7.0")
+OBIS_TIMESTAMP = b"0-0:1.0.0"
+
+# Telegrams are a few hundred bytes, anything longer lost its end marker
+MAX_TELEGRAM = 8192
+
+_LINE = re.compile(rb"^([0-9]+-[0-9]+:[0-9]+\.[0-9]+\.[0-9]+)\(([^)*]*)")
+_FOOTER = re.compile(rb"!([0-9A-Fa-f]{4})?\r\n")
+
+
+def crc16(data: bytes) -> int:
+    """CRC16/ARC of data, as used by DSMR 4 and later."""
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+class Telegram(NamedTuple):
+    """Currents of all phases read from one telegram."""
+
+    timestamp: str | None
+    currents: tuple[float, float, float]
+
+
+class TelegramParser:
+    """Split a byte stream into telegrams, checking their CRC.
+
+    Data may be fed in chunks of any size. Bytes before the start of a
+    telegram are skipped, so reading can start mid-stream. Telegrams of
+    DSMR versions before 4 have no CRC and are accepted as is.
+    """
+
+    __slots__ = ("_buffer", "crc_errors", "telegrams")
+
+    def __init__(self) -> None:
+        """Initialize object."""
+        self._buffer = bytearray()
+        self.telegrams = 0
+        self.crc_errors = 0
+
+    def feed(self, data: bytes) -> list[Telegram]:
+        """Add received data, get the complete telegrams in it."""
+        self._buffer += data
+        telegrams = []
+        while True:
+            start = self._buffer.find(b"/")
+            if start < 0:
+                self._buffer.clear()
+                break
+            del self._buffer[:start]
+            footer = _FOOTER.search(self._buffer)
+            if footer is None:
+                if len(self._buffer) > MAX_TELEGRAM:
+                    _LOGGER.debug("Dropping telegram without end")
+                    del self._buffer[:1]
+                    continue
+                break
+            restart = self._buffer.find(b"/", 1, footer.start())
+            if restart > 0:
+                # Start of telegram that was cut off, resume at the next one
+                del self._buffer[:restart]
+                continue
+            raw = bytes(self._buffer[: footer.start() + 1])
+            crc = footer.group(1)
+            del self._buffer[: footer.end()]
+            if crc is not None and crc16(raw) != int(crc, 16):
+                self.crc_errors += 1
+                _LOGGER.debug("Dropping telegram with invalid CRC")
+                continue
+            telegram = self._parse(raw)
+            if telegram is not None:
+                self.telegrams += 1
+                telegrams.append(telegram)
+        return telegrams
+
+    @staticmethod
+    def _parse(raw: bytes) -> Telegram | None:
+        """Get currents of telegram, None if any phase is missing."""
+        values: dict[bytes, bytes] = {}
+        for line in raw.split(b"\r\n"):
+            match = _LINE.match(line)
+            if match is not None:
+                values[match.group(1)] = match.group(2)
+        try:
+            currents = tuple(float(values[obis]) for obis in OBIS_CURRENT)
+        except (KeyError, ValueError):
+            _LOGGER.debug("Dropping telegram without currents of all phases")
+            return None
+        timestamp = values.get(OBIS_TIMESTAMP)
+        return Telegram(timestamp.decode() if timestamp is not None else None, currents)
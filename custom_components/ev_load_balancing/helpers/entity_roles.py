@@ -0,0 +1,107 @@
+"""Index of the entities that have a role on a device."""
+
+from collections.abc import Callable
+
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.exceptions import ConfigEntryError
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+
+from ..const import DOMAIN
+
+DATA_ENTITY_ROLES = f"{DOMAIN}_entity_roles"
+
+ROLE_CURRENT_PHASE1 = "current_phase1"
+ROLE_CURRENT_PHASE2 = "current_phase2"
+ROLE_CURRENT_PHASE3 = "current_phase3"
+ROLE_STATUS = "status"
+ROLE_DYNAMIC_CIRCUIT_LIMIT = "dynamic_circuit_limit"
+
+# First entity of a device that matches gets the role
+ROLE_MATCHERS: dict[str, Callable[[str], bool]] = {
+    ROLE_CURRENT_PHASE1: lambda e: "_current" in e and e.endswith("1"),
+    ROLE_CURRENT_PHASE2: lambda e: "_current" in e and e.endswith("2"),
+    ROLE_CURRENT_PHASE3: lambda e: "_current" in e and e.endswith("3"),
+    ROLE_STATUS: lambda e: e.endswith("_status"),
+    ROLE_DYNAMIC_CIRCUIT_LIMIT: lambda e: e.endswith("_dynamic_circuit_limit"),
+}
+
+
+def get_entity_roles(hass: HomeAssistant) -> "EntityRoleIndex":
+    """Get the entity role index shared by all entries and flows."""
+    if DATA_ENTITY_ROLES not in hass.data:
+        hass.data[DATA_ENTITY_ROLES] = EntityRoleIndex(hass)
+    return hass.data[DATA_ENTITY_ROLES]
+
+
+class EntityRoleIndex:
+    """Map (device id, role) to entity id, built per device on first lookup.
+
+    Devices are dropped from the index when the registries report a change to
+    the device or any of its entities, and are indexed again on next lookup.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize object."""
+        self._hass = hass
+        self._roles: dict[str, dict[str, str]] = {}
+        self._device_of_entity: dict[str, str] = {}
+        self.build_count = 0
+        hass.bus.async_listen(
+            er.EVENT_ENTITY_REGISTRY_UPDATED, self._async_entity_registry_updated
+        )
+        hass.bus.async_listen(
+            dr.EVENT_DEVICE_REGISTRY_UPDATED, self._async_device_registry_updated
+        )
+
+    def get(self, device_id: str, role: str) -> str | None:
+        """Get entity id with role on device, None if there is none."""
+        roles = self._roles.get(device_id)
+        if roles is None:
+            roles = self._roles[device_id] = self._build(device_id)
+        return roles.get(role)
+
+    def require(self, device_id: str, role: str) -> str:
+        """Get entity id with role on device, raise if there is none."""
+        entity_id = self.get(device_id, role)
+        if entity_id is None:
+            raise ConfigEntryError(f"No {role} entity found on device {device_id}")
+        return entity_id
+
+    def _build(self, device_id: str) -> dict[str, str]:
+        """Find the entities with a role on device."""
+        self.build_count += 1
+        roles: dict[str, str] = {}
+        for entry in er.async_entries_for_device(er.async_get(self._hass), device_id):
+            self._device_of_entity[entry.entity_id] = device_id
+            for role, matcher in ROLE_MATCHERS.items():
+                if role not in roles and matcher(entry.entity_id):
+                    roles[role] = entry.entity_id
+        return roles
+
+    def _invalidate(self, device_id: str | None) -> None:
+        """Drop device from index."""
+        if device_id is not None and self._roles.pop(device_id, None) is not None:
+            for entity_id, owner in list(self._device_of_entity.items()):
+                if owner == device_id:
+                    del self._device_of_entity[entity_id]
+
+    @callback
+    def _async_entity_registry_updated(
+        self, event: Event[er.EventEntityRegistryUpdatedData]
+    ) -> None:
+        """Drop the devices an entity belonged to or belongs to now."""
+        data = event.data
+        for entity_id in (data["entity_id"], data.get("old_entity_id")):
+            self._invalidate(self._device_of_entity.get(entity_id))
+        if data["action"] == "update":
+            self._invalidate(data["changes"].get("device_id"))
+        entry = er.async_get(self._hass).async_get(data["entity_id"])
+        if entry is not None:
+            self._invalidate(entry.device_id)
+
+    @callback
+    def _async_device_registry_updated(
+        self, event: Event[dr.EventDeviceRegistryUpdatedData]
+    ) -> None:
+        """Drop changed or removed device."""
+        self._invalidate(event.data["device_id"])
@@ -2,7 +2,7 @@
 
 from logging import Logger
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, State
 
 
 def get_sensor_entity_attribute_value(
@@ -10,24 +10,10 @@ def get_sensor_entity_attribute_value(
 ) -> float | None:
     """Get value of generic entity parameter."""
     if entity_id:
-        try:
-            entity = hass.states.get(entity_id)
-            # return SensorValue(float(entity.state), entity.last_reported)
-            return float(entity.attributes.get(attribute))
-        except (TypeError, ValueError):
-            logger.warning(
-                'Could not convert value "%s" of entity %s to expected format',
-                entity.attributes.get(attribute),
-                entity_id,
-            )
-        except Exception as e:  # noqa: BLE001
-            logger.error(
-                'Unknown error when reading and converting "%s": %s',
-                entity_id,
-                e,
-            )
-    else:
-        logger.debug("No entity defined")
+        return get_state_attribute_value(
+            logger, entity_id, hass.states.get(entity_id), attribute
+        )
+    logger.debug("No entity defined")
     return None
 
 
@@ -36,21 +22,49 @@ def get_sensor_entity_value(
 ) -> float | None:
     """Get value of generic entity parameter."""
     if entity_id:
-        try:
-            entity = hass.states.get(entity_id)
-            return float(entity.state)
-        except (TypeError, ValueError):
-            logger.warning(
-                'Could not convert value "%s" of entity %s to expected format',
-                entity.state,
-                entity_id,
-            )
-        except Exception as e:  # noqa: BLE001
-            logger.error(
-                'Unknown error when reading and converting "%s": %s',
-                entity_id,
-                e,
-            )
-    else:
-        logger.debug("No entity defined")
+        return get_state_value(logger, entity_id, hass.states.get(entity_id))
+    logger.debug("No entity defined")
+    return None
+
+
+def get_state_attribute_value(
+    logger: Logger, entity_id: str, state: State | None, attribute: str
+) -> float | None:
+    """Get value of entity parameter from a state object."""
+    try:
+        # return SensorValue(float(entity.state), entity.last_reported)
+        return float(state.attributes.get(attribute))
+    except (TypeError, ValueError):
+        logger.warning(
+            'Could not convert value "%s" of entity %s to expected format',
+            state.attributes.get(attribute) if state is not None else None,
+            entity_id,
+        )
+    except Exception as e:  # noqa: BLE001
+        logger.error(
+            'Unknown error when reading and converting "%s": %s',
+            entity_id,
+            e,
+        )
+    return None
+
+
+def get_state_value(
+    logger: Logger, entity_id: str, state: State | None
+) -> float | None:
+    """Get value of entity from a state object."""
+    try:
+        return float(state.state)
+    except (TypeError, ValueError):
+        logger.warning(
+            'Could not convert value "%s" of entity %s to expected format',
+            state.state if state is not None else None,
+            entity_id,
+        )
+    except Exception as e:  # noqa: BLE001
+        logger.error(
+            'Unknown error when reading and converting "%s": %s',
+            entity_id,
+            e,
+        )
     return None
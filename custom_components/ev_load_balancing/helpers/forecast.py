@@ -0,0 +1,56 @@
+"""Short-horizon forecast of mains load."""
+
+import math
+import time
+
+
+class LoadForecast:
+    """Holt's linear trend method on irregularly spaced samples.
+
+    Level and trend are exponentially smoothed with time constants in seconds
+    instead of fixed factors, so bursts of samples weigh the same as a slow
+    steady stream over the same time.
+    """
+
+    def __init__(self, level_time: float = 5.0, trend_time: float = 30.0) -> None:
+        """Initialize object."""
+        self._level_time = level_time
+        self._trend_time = trend_time
+        self._level: float | None = None
+        self._trend = 0.0
+        self._timestamp = 0.0
+
+    def add(self, value: float, timestamp: float | None = None) -> None:
+        """Update level and trend (per second) with a sample."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if self._level is None:
+            self._level = value
+            self._timestamp = timestamp
+            return
+        dt = timestamp - self._timestamp
+        if dt <= 0:
+            return
+        alpha = 1 - math.exp(-dt / self._level_time)
+        beta = 1 - math.exp(-dt / self._trend_time)
+        previous = self._level
+        expected = previous + self._trend * dt
+        self._level = expected + alpha * (value - expected)
+        self._trend += beta * ((self._level - previous) / dt - self._trend)
+        self._timestamp = timestamp
+
+    def predict(self, horizon: float) -> float | None:
+        """Get expected value `horizon` seconds after last sample."""
+        if self._level is None:
+            return None
+        return self._level + self._trend * horizon
+
+    @property
+    def trend(self) -> float:
+        """Change of value per second."""
+        return self._trend
+
+    def reset(self) -> None:
+        """Forget all samples."""
+        self._level = None
+        self._trend = 0.0
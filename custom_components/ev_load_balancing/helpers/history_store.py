@@ -0,0 +1,92 @@
+"""Persistence of mains phase history across restarts."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from ..const import DOMAIN, Phases
+from ..mains import MainsPhase
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 300
+
+
+class PhaseHistoryStore:
+    """Save samples of mains phase history, to restore them on next setup.
+
+    Samples are stored as ages from the time of saving, as monotonic clocks
+    restart with the system, and rounded to keep the file compact.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize object."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.history.{entry_id}"
+        )
+        self._phases: dict[Phases, MainsPhase] = {}
+        self._save_scheduled = False
+        self._restored = False
+
+    def _data(self) -> dict[str, Any]:
+        """Get history of phases to store."""
+        self._save_scheduled = False
+        now = time.monotonic()
+        phases = {}
+        for phase_id, phase in self._phases.items():
+            samples = phase.history.samples(now)
+            phases[phase_id.name] = {
+                "ages": [round(age, 1) for age, _ in samples],
+                "values": [round(value, 2) for _, value in samples],
+            }
+        return {"saved": time.time(), "phases": phases}
+
+    async def async_restore(self, phases: Iterable[tuple[Phases, MainsPhase]]) -> int:
+        """Track phases and merge stored history into them, return samples added."""
+        self._phases = {
+            phase_id: phase for phase_id, phase in phases if phase.history is not None
+        }
+        if self._restored:
+            return 0
+        self._restored = True
+        data = await self._store.async_load()
+        if not data:
+            return 0
+        elapsed = max(time.time() - data["saved"], 0.0)
+        restored = 0
+        for phase_id, phase in self._phases.items():
+            stored = data["phases"].get(phase_id.name)
+            if stored is None:
+                continue
+            count = len(phase.history)
+            phase.history.restore(
+                [
+                    (age + elapsed, value)
+                    for age, value in zip(stored["ages"], stored["values"], strict=True)
+                ]
+            )
+            restored += len(phase.history) - count
+        _LOGGER.debug("Restored %d history samples saved %.0f s ago", restored, elapsed)
+        return restored
+
+    def async_schedule_save(self) -> None:
+        """Save history in a while, unless a save is already scheduled."""
+        if self._phases and not self._save_scheduled:
+            self._save_scheduled = True
+            self._store.async_delay_save(self._data, SAVE_DELAY)
+
+    async def async_save(self) -> None:
+        """Save history right away."""
+        if self._phases:
+            await self._store.async_save(self._data())
+
+    async def async_remove(self) -> None:
+        """Remove stored history."""
+        await self._store.async_remove()
@@ -0,0 +1,164 @@
+"""Minimal Modbus TCP client for reading energy meters."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Sequence
+import itertools
+import logging
+import struct
+from typing import NamedTuple
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from ..const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_MODBUS_CLIENTS = f"{DOMAIN}_modbus_clients"
+
+DEFAULT_PORT = 502
+READ_TIMEOUT = 5
+FUNCTION_READ_INPUT_REGISTERS = 0x04
+
+_HEADER = struct.Struct(">HHHB")
+# Length field counts unit id and PDU, at least a function code, at most 253 bytes
+_MIN_LENGTH = 2
+_MAX_LENGTH = 254
+
+
+class ModbusError(HomeAssistantError):
+    """Error to indicate a failed Modbus request."""
+
+
+def split_address(address: str, default_port: int = DEFAULT_PORT) -> tuple[str, int]:
+    """Get host and port of `host` or `host:port`."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return host.strip("[]"), int(port)
+    return address, default_port
+
+
+def decode_float32(registers: Sequence[int]) -> list[float]:
+    """Decode IEEE 754 floats, high word first."""
+    data = struct.pack(f">{len(registers)}H", *registers)
+    return list(struct.unpack(f">{len(registers) // 2}f", data))
+
+
+def decode_int32_swapped(registers: Sequence[int]) -> list[float]:
+    """Decode signed 32 bit integers, low word first."""
+    data = b"".join(
+        struct.pack(">HH", high, low)
+        for low, high in zip(registers[::2], registers[1::2], strict=True)
+    )
+    return list(struct.unpack(f">{len(registers) // 2}i", data))
+
+
+class MeterProfile(NamedTuple):
+    """Input registers holding the currents of all phases, read in one request."""
+
+    address: int
+    count: int
+    decode: Callable[[Sequence[int]], list[float]]
+    scale: float
+
+
+METER_PROFILES = {
+    "sdm630": MeterProfile(0x0006, 6, decode_float32, 1.0),
+    "carlo_gavazzi_em": MeterProfile(0x000C, 6, decode_int32_swapped, 0.001),
+}
+
+
+def get_modbus_client(hass: HomeAssistant, host: str, port: int) -> ModbusClient:
+    """Get the client of a host, shared by all meters behind it."""
+    clients: dict[tuple[str, int], ModbusClient] = hass.data.setdefault(
+        DATA_MODBUS_CLIENTS, {}
+    )
+    client = clients.get((host, port))
+    if client is None:
+        client = clients[(host, port)] = ModbusClient(hass, host, port)
+    client.users += 1
+    return client
+
+
+class ModbusClient:
+    """Persistent connection to a Modbus TCP server or gateway.
+
+    The connection is opened on first request and kept for the next ones.
+    Requests are sent one at a time, as many gateways only handle one
+    outstanding request, and it is closed when the last user releases it.
+    """
+
+    def __init__(self, hass: HomeAssistant, host: str, port: int) -> None:
+        """Initialize object."""
+        self._hass = hass
+        self._host = host
+        self._port = port
+        self._lock = asyncio.Lock()
+        self._transaction = itertools.count(1)
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self.users = 0
+        self.connect_count = 0
+
+    async def async_read_input_registers(
+        self, unit: int, address: int, count: int
+    ) -> list[int]:
+        """Read `count` contiguous input registers starting at `address`."""
+        pdu = struct.pack(">BHH", FUNCTION_READ_INPUT_REGISTERS, address, count)
+        response = await self._async_request(unit, pdu)
+        if len(response) != 2 + 2 * count or response[1] != 2 * count:
+            raise ModbusError(f"Unexpected response length from {self._host}")
+        return list(struct.unpack(f">{count}H", response[2:]))
+
+    async def _async_request(self, unit: int, pdu: bytes) -> bytes:
+        """Send request, get the response PDU."""
+        async with self._lock:
+            transaction = next(self._transaction) & 0xFFFF
+            try:
+                async with asyncio.timeout(READ_TIMEOUT):
+                    if self._writer is None:
+                        self._reader, self._writer = await asyncio.open_connection(
+                            self._host, self._port
+                        )
+                        self.connect_count += 1
+                    self._writer.write(
+                        _HEADER.pack(transaction, 0, len(pdu) + 1, unit) + pdu
+                    )
+                    await self._writer.drain()
+                    header = await self._reader.readexactly(_HEADER.size)
+                    received, protocol, length, _ = _HEADER.unpack(header)
+                    if not _MIN_LENGTH <= length <= _MAX_LENGTH:
+                        response = None
+                    else:
+                        response = await self._reader.readexactly(length - 1)
+            except (OSError, TimeoutError, asyncio.IncompleteReadError) as err:
+                self.close()
+                raise ModbusError(
+                    f"Request to {self._host}:{self._port} failed: {err!r}"
+                ) from err
+            if received != transaction or protocol != 0 or response is None:
+                # Stream is out of step, start over on a new connection
+                self.close()
+                raise ModbusError(f"Unexpected response from {self._host}")
+        if response[0] & 0x80 and len(response) == 2:
+            raise ModbusError(
+                f"Exception {response[1]} for function {response[0] & 0x7F}"
+            )
+        return response
+
+    def close(self) -> None:
+        """Close connection, the next request reconnects."""
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    def release(self) -> None:
+        """Stop using client, closing it when no one else does."""
+        self.users -= 1
+        if self.users <= 0:
+            self.close()
+            clients = self._hass.data.get(DATA_MODBUS_CLIENTS, {})
+            if clients.get((self._host, self._port)) is self:
+                del clients[(self._host, self._port)]
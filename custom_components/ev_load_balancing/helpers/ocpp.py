@@ -0,0 +1,287 @@
+"""Local OCPP 1.6J central system for charge points connecting over websocket."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from collections.abc import Callable, Iterator
+from datetime import UTC, datetime
+import itertools
+import json
+import logging
+import time
+from typing import Any, Protocol
+
+from aiohttp import WSCloseCode, WSMsgType, web
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from ..const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_CENTRAL_SYSTEMS = f"{DOMAIN}_ocpp_central_systems"
+
+SUBPROTOCOL = "ocpp1.6"
+CALL = 2
+CALL_RESULT = 3
+CALL_ERROR = 4
+CALL_TIMEOUT = 10
+HEARTBEAT_INTERVAL = 60
+
+
+class OcppError(HomeAssistantError):
+    """Error to indicate a failed OCPP call."""
+
+
+def get_central_system(hass: HomeAssistant, host: str, port: int) -> CentralSystem:
+    """Get the central system listening on address, shared by its charge points."""
+    systems: dict[tuple[str, int], CentralSystem] = hass.data.setdefault(
+        DATA_CENTRAL_SYSTEMS, {}
+    )
+    system = systems.get((host, port))
+    if system is None:
+        system = systems[(host, port)] = CentralSystem(hass, host, port)
+    system.users += 1
+    return system
+
+
+class ChargePointHandler(Protocol):
+    """Receiver of the notifications of a charge point."""
+
+    def status_changed(self, payload: dict[str, Any]) -> None:
+        """Handle StatusNotification."""
+
+    def meter_values(self, payload: dict[str, Any]) -> None:
+        """Handle MeterValues."""
+
+    def transaction_started(self, transaction_id: int) -> None:
+        """Handle StartTransaction, given the id of the transaction."""
+
+    def transaction_stopped(self) -> None:
+        """Handle StopTransaction."""
+
+    def booted(self) -> None:
+        """Handle accepted BootNotification, calls can be sent from now."""
+
+    async def async_updated(self) -> None:
+        """Handle that state changed by the notification."""
+
+
+class ChargePointConnection:
+    """Websocket of one connected charge point."""
+
+    def __init__(
+        self,
+        charge_point_id: str,
+        ws: web.WebSocketResponse,
+        handler: ChargePointHandler,
+        transaction_ids: Iterator[int],
+    ) -> None:
+        """Initialize object."""
+        self.charge_point_id = charge_point_id
+        self._ws = ws
+        self._handler = handler
+        self._transaction_ids = transaction_ids
+        self._ids = itertools.count(1)
+        self._calls: dict[str, asyncio.Future[dict[str, Any]]] = {}
+
+    async def async_call(self, action: str, payload: dict[str, Any]) -> dict[str, Any]:
+        """Send call to charge point, get the payload of its result."""
+        unique_id = str(next(self._ids))
+        future: asyncio.Future[dict[str, Any]] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._calls[unique_id] = future
+        try:
+            await self._ws.send_str(json.dumps([CALL, unique_id, action, payload]))
+            async with asyncio.timeout(CALL_TIMEOUT):
+                return await future
+        except (ConnectionError, TimeoutError) as err:
+            raise OcppError(
+                f"{action} to {self.charge_point_id} failed: {err!r}"
+            ) from err
+        finally:
+            self._calls.pop(unique_id, None)
+
+    async def async_close(self) -> None:
+        """Close websocket."""
+        await self._ws.close(code=WSCloseCode.GOING_AWAY)
+
+    async def async_receive(self) -> None:
+        """Handle messages until the charge point disconnects."""
+        async for msg in self._ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            try:
+                message = json.loads(msg.data)
+                kind, unique_id = message[0], message[1]
+            except (ValueError, IndexError, KeyError, TypeError):
+                _LOGGER.warning("Invalid message from %s", self.charge_point_id)
+                continue
+            if kind == CALL:
+                await self._async_handle_call(unique_id, message[2], message[3])
+            elif (future := self._calls.get(unique_id)) and not future.done():
+                if kind == CALL_RESULT:
+                    future.set_result(message[2])
+                else:
+                    future.set_exception(OcppError(f"{message[2]}: {message[3]}"))
+        for future in self._calls.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Charge point disconnected"))
+
+    async def _async_handle_call(
+        self, unique_id: str, action: str, payload: dict[str, Any]
+    ) -> None:
+        """Answer call of charge point, passing the data to the charger."""
+        result: dict[str, Any] | None = {}
+        if action == "BootNotification":
+            result = {
+                "status": "Accepted",
+                "currentTime": _now(),
+                "interval": HEARTBEAT_INTERVAL,
+            }
+        elif action == "Heartbeat":
+            result = {"currentTime": _now()}
+        elif action in ("Authorize", "StopTransaction"):
+            result = {"idTagInfo": {"status": "Accepted"}}
+            if action == "StopTransaction":
+                self._handler.transaction_stopped()
+        elif action == "StartTransaction":
+            transaction_id = next(self._transaction_ids)
+            self._handler.transaction_started(transaction_id)
+            result = {
+                "transactionId": transaction_id,
+                "idTagInfo": {"status": "Accepted"},
+            }
+        elif action == "StatusNotification":
+            self._handler.status_changed(payload)
+        elif action == "MeterValues":
+            self._handler.meter_values(payload)
+        elif action not in ("DataTransfer", "DiagnosticsStatusNotification"):
+            result = None
+        if result is None:
+            response = [CALL_ERROR, unique_id, "NotImplemented", action, {}]
+        else:
+            response = [CALL_RESULT, unique_id, result]
+        await self._ws.send_str(json.dumps(response))
+        if action == "BootNotification":
+            self._handler.booted()
+        if action in ("StartTransaction", "StatusNotification", "MeterValues"):
+            await self._handler.async_updated()
+
+
+def _now() -> str:
+    """Get current time as OCPP timestamp."""
+    return datetime.now(UTC).isoformat().replace("+00:00", "Z")
+
+
+class CentralSystem:
+    """Websocket server that charge points connect to at `/<charge point id>`.
+
+    Only charge points with a registered handler are accepted, the handler
+    gets their notifications and sends them calls through the connection.
+    """
+
+    def __init__(self, hass: HomeAssistant, host: str, port: int) -> None:
+        """Initialize object."""
+        self._hass = hass
+        self._host = host
+        self._port = port
+        self._handlers: dict[str, ChargePointHandler] = {}
+        self._connections: dict[str, ChargePointConnection] = {}
+        self._runner: web.AppRunner | None = None
+        self._started: asyncio.Task | None = None
+        # Seeded from the time, so ids are not reused after a reload or restart
+        self._transaction_ids = itertools.count(int(time.time()))
+        self.users = 0
+
+    @property
+    def port(self) -> int | None:
+        """Port listened on, None until started."""
+        if self._runner is None or not self._runner.addresses:
+            return None
+        return self._runner.addresses[0][1]
+
+    def register(
+        self, charge_point_id: str, handler: ChargePointHandler
+    ) -> Callable[[], None]:
+        """Route charge point to handler, return function to unregister."""
+        self._handlers[charge_point_id] = handler
+        if self._started is None:
+            self._started = self._hass.async_create_background_task(
+                self.async_start(), f"OCPP central system {self._port}"
+            )
+
+        def unregister() -> None:
+            if self._handlers.get(charge_point_id) is handler:
+                del self._handlers[charge_point_id]
+
+        return unregister
+
+    def connection(self, charge_point_id: str) -> ChargePointConnection | None:
+        """Get connection of charge point, None if not connected."""
+        return self._connections.get(charge_point_id)
+
+    async def async_start(self) -> None:
+        """Start listening."""
+        app = web.Application()
+        app.router.add_get("/{charge_point_id}", self._async_websocket)
+        self._runner = web.AppRunner(app, handle_signals=False)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host=self._host, port=self._port).start()
+        _LOGGER.debug("OCPP central system listening on port %s", self.port)
+
+    async def async_wait_started(self) -> None:
+        """Wait until listening, raise OSError if not able to."""
+        if self._started is not None:
+            await self._started
+
+    async def _async_websocket(self, request: web.Request) -> web.StreamResponse:
+        """Accept websocket of a registered charge point."""
+        charge_point_id = request.match_info["charge_point_id"]
+        handler = self._handlers.get(charge_point_id)
+        if handler is None:
+            _LOGGER.warning("Rejecting unknown charge point %s", charge_point_id)
+            raise web.HTTPNotFound
+        ws = web.WebSocketResponse(protocols=(SUBPROTOCOL,), heartbeat=None)
+        await ws.prepare(request)
+        connection = ChargePointConnection(
+            charge_point_id, ws, handler, self._transaction_ids
+        )
+        self._connections[charge_point_id] = connection
+        _LOGGER.info("Charge point %s connected", charge_point_id)
+        try:
+            await connection.async_receive()
+        finally:
+            if self._connections.get(charge_point_id) is connection:
+                del self._connections[charge_point_id]
+            _LOGGER.info("Charge point %s disconnected", charge_point_id)
+        return ws
+
+    async def async_release(self) -> None:
+        """Stop using system, stopping it when no one else does.
+
+        Returns once the port is closed, so a reload can listen on it again.
+        """
+        self.users -= 1
+        if self.users > 0:
+            return
+        systems = self._hass.data.get(DATA_CENTRAL_SYSTEMS, {})
+        if systems.get((self._host, self._port)) is self:
+            del systems[(self._host, self._port)]
+        await self._async_stop()
+
+    async def _async_stop(self) -> None:
+        """Close connections and stop listening."""
+        if self._started is not None:
+            # A failed start was reported when setting up already
+            with contextlib.suppress(OSError):
+                await self._started
+            self._started = None
+        for connection in list(self._connections.values()):
+            await connection.async_close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,56 @@
+"""Adaptive rate of the control loop."""
+
+FAST_COOLDOWN = 0.2
+NORMAL_COOLDOWN = 1.0
+SLOW_COOLDOWN = 10.0
+
+
+class RateScheduler:
+    """Choose time until next control update from mains headroom and variance."""
+
+    def __init__(
+        self,
+        mains_limit: float,
+        fast: float = FAST_COOLDOWN,
+        normal: float = NORMAL_COOLDOWN,
+        slow: float = SLOW_COOLDOWN,
+    ) -> None:
+        """Initialize object."""
+        self._mains_limit = mains_limit
+        self._fast = fast
+        self._normal = normal
+        self._slow = slow
+        self.cooldown = normal
+        self.immediate = False
+
+    @property
+    def fast_cooldown(self) -> float:
+        """Shortest time between updates."""
+        return self._fast
+
+    @property
+    def rate(self) -> float:
+        """Effective update rate in Hz."""
+        return 1 / self.cooldown
+
+    def reset(self) -> None:
+        """Go back to normal rate."""
+        self.cooldown = self._normal
+        self.immediate = False
+
+    def update(self, spare: float, stddev: float) -> float:
+        """Calculate cooldown from smallest spare current on mains and its stddev.
+
+        Overload gives fastest rate with immediate updates. Otherwise the rate
+        goes from normal when spare is within three stddev, to slow when the
+        margin is half the mains limit or more.
+        """
+        if spare < 0:
+            self.cooldown = self._fast
+            self.immediate = True
+        else:
+            margin = spare - 3 * stddev
+            ratio = min(max(margin / (self._mains_limit / 2), 0.0), 1.0)
+            self.cooldown = self._normal + (self._slow - self._normal) * ratio
+            self.immediate = False
+        return self.cooldown
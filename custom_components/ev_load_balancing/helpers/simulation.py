@@ -0,0 +1,223 @@
+"""Closed-loop simulation of a household, an EV charger and a car."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import random
+from typing import NamedTuple
+
+from homeassistant.core import HomeAssistant
+
+from ..chargers import ChargingState
+from ..const import DOMAIN, MIN_CHARGING_CURRENT
+
+DATA_SIMULATIONS = f"{DOMAIN}_simulations"
+
+DAY = 86400.0
+VOLTAGE = 230.0
+# Longest step of integration, so ramps and delays are followed closely
+MAX_STEP = 1.0
+
+
+def get_simulation(hass: HomeAssistant, simulation_id: str) -> Simulation:
+    """Get the simulation shared by the virtual mains and charger of an id."""
+    simulations: dict[str, Simulation] = hass.data.setdefault(DATA_SIMULATIONS, {})
+    simulation = simulations.get(simulation_id)
+    if simulation is None:
+        simulation = simulations[simulation_id] = Simulation(hass, simulation_id)
+    simulation.users += 1
+    return simulation
+
+
+class Load(NamedTuple):
+    """Appliance drawing current per phase for a while, in seconds of day."""
+
+    start: float
+    duration: float
+    currents: tuple[float, float, float]
+
+
+def _hours(hour: float) -> float:
+    """Seconds of day at hour."""
+    return hour * 3600
+
+
+@dataclass
+class HouseholdProfile:
+    """Daily household load per phase, from appliances on a fixed schedule.
+
+    Random short loads on top are drawn from `seed`, so each day is the same
+    and runs are comparable.
+    """
+
+    base: tuple[float, float, float] = (0.8, 0.6, 1.0)
+    loads: list[Load] = field(
+        default_factory=lambda: [
+            Load(_hours(7.0), 480, (9.0, 0.0, 0.0)),  # Kettle
+            Load(_hours(6.0), _hours(2), (4.0, 4.0, 4.0)),  # Heat pump
+            Load(_hours(17.0), _hours(6), (4.0, 4.0, 4.0)),  # Heat pump
+            Load(_hours(17.5), 3600, (0.0, 8.0, 0.0)),  # Oven
+            Load(_hours(18.0), 2400, (10.0, 0.0, 10.0)),  # Induction hob
+            Load(_hours(20.0), 1200, (0.0, 0.0, 9.0)),  # Washing machine heating
+            Load(_hours(21.5), 1800, (0.0, 9.0, 0.0)),  # Dishwasher heating
+        ]
+    )
+    random_loads: int = 40
+    seed: int = 1
+
+    def __post_init__(self) -> None:
+        """Add random short loads to schedule."""
+        rng = random.Random(self.seed)
+        for _ in range(self.random_loads):
+            currents = [0.0, 0.0, 0.0]
+            currents[rng.randrange(3)] = rng.uniform(1.0, 8.0)
+            self.loads.append(
+                Load(rng.uniform(0, DAY), rng.uniform(60, 1200), tuple(currents))
+            )
+
+    def currents(self, t: float) -> list[float]:
+        """Load per phase at `t` seconds into the simulated day."""
+        t %= DAY
+        currents = list(self.base)
+        for load in self.loads:
+            if load.start <= t < load.start + load.duration:
+                for phase in range(3):
+                    currents[phase] += load.currents[phase]
+        return currents
+
+
+@dataclass
+class Vehicle:
+    """Car connected from `arrival` until `departure`, in seconds of day.
+
+    It accepts `max_current` on `phases` phases, tapering off linearly from
+    `taper_soc` towards full, and stops when `target_soc` is reached.
+    """
+
+    capacity_kwh: float = 60.0
+    soc: float = 0.2
+    target_soc: float = 0.9
+    taper_soc: float = 0.8
+    max_current: float = 16.0
+    phases: int = 3
+    arrival: float = _hours(17.0)
+    departure: float = _hours(7.5)
+
+    def connected(self, t: float) -> bool:
+        """Check if car is connected `t` seconds into the simulated day."""
+        t %= DAY
+        if self.arrival <= self.departure:
+            return self.arrival <= t < self.departure
+        return t >= self.arrival or t < self.departure
+
+    def acceptance(self) -> float:
+        """Current per phase the car accepts now."""
+        if self.soc >= self.target_soc:
+            return 0.0
+        if self.soc <= self.taper_soc:
+            return self.max_current
+        return self.max_current * max(
+            (1.0 - self.soc) / (1.0 - self.taper_soc), MIN_CHARGING_CURRENT / 16
+        )
+
+
+class Simulation:
+    """Household, charger and car in a closed loop, on the clock of the loop.
+
+    Limits take effect `response_delay` seconds after they are set, then the
+    charger ramps towards them at `ramp_rate` ampere per second, as far as
+    the car accepts. Phases limited below the minimum charging current pause.
+    Mains currents are the household load plus what the charger draws. Time
+    is that of the event loop, so a frozen test clock runs it at any speed.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        simulation_id: str,
+        household: HouseholdProfile | None = None,
+        vehicle: Vehicle | None = None,
+        rated_current: float = 16.0,
+        response_delay: float = 2.0,
+        ramp_rate: float = 3.0,
+    ) -> None:
+        """Initialize object, the simulated day starts at midnight now."""
+        self._hass = hass
+        self._id = simulation_id
+        self.household = household or HouseholdProfile()
+        self.vehicle = vehicle or Vehicle()
+        self.rated_current = rated_current
+        self.response_delay = response_delay
+        self.ramp_rate = ramp_rate
+        self.mains_limit: float | None = None
+        self.users = 0
+        self._start = hass.loop.time()
+        self._time = 0.0
+        self._pending: list[tuple[float, list[float]]] = []
+        self.limits = [rated_current] * 3
+        self.draw = [0.0, 0.0, 0.0]
+        self.delivered_kwh = 0.0
+        self.overload_seconds = 0.0
+        self.peak_current = 0.0
+
+    @property
+    def time(self) -> float:
+        """Seconds simulated."""
+        return self._time
+
+    def set_limits(self, limits: list[float]) -> None:
+        """Set charger limits, applied after the response delay."""
+        self.advance()
+        self._pending.append((self._time + self.response_delay, list(limits)))
+
+    def advance(self) -> None:
+        """Simulate until the current time of the loop."""
+        until = self._hass.loop.time() - self._start
+        while self._time < until:
+            dt = min(MAX_STEP, until - self._time)
+            self._step(dt)
+
+    def _step(self, dt: float) -> None:
+        """Simulate `dt` seconds."""
+        self._time += dt
+        while self._pending and self._pending[0][0] <= self._time:
+            _, self.limits = self._pending.pop(0)
+        vehicle = self.vehicle
+        acceptance = vehicle.acceptance() if vehicle.connected(self._time) else 0.0
+        for phase in range(3):
+            limit = self.limits[phase]
+            target = 0.0
+            if phase < vehicle.phases and limit >= MIN_CHARGING_CURRENT:
+                target = min(limit, acceptance, self.rated_current)
+            step = self.ramp_rate * dt
+            self.draw[phase] += max(min(target - self.draw[phase], step), -step)
+        energy = sum(self.draw) * VOLTAGE * dt / 3600 / 1000
+        self.delivered_kwh += energy
+        vehicle.soc = min(vehicle.soc + energy / vehicle.capacity_kwh, 1.0)
+        peak = max(self.mains_currents())
+        self.peak_current = max(self.peak_current, peak)
+        if self.mains_limit is not None and peak > self.mains_limit:
+            self.overload_seconds += dt
+
+    def mains_currents(self) -> list[float]:
+        """Current per mains phase, household load plus charger draw."""
+        household = self.household.currents(self._time)
+        return [load + draw for load, draw in zip(household, self.draw, strict=True)]
+
+    @property
+    def charging_state(self) -> ChargingState:
+        """State of charger, pending while the car waits for a higher limit."""
+        vehicle = self.vehicle
+        if not vehicle.connected(self._time) or vehicle.acceptance() == 0.0:
+            return ChargingState.OFF
+        if any(draw > 0.0 for draw in self.draw):
+            return ChargingState.CHARGING
+        return ChargingState.PENDING
+
+    def release(self) -> None:
+        """Stop using simulation, dropping it when no one else does."""
+        self.users -= 1
+        if self.users <= 0:
+            simulations = self._hass.data.get(DATA_SIMULATIONS, {})
+            if simulations.get(self._id) is self:
+                del simulations[self._id]
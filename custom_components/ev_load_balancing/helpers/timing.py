@@ -0,0 +1,42 @@
+"""Timing of the stages of a control update."""
+
+from collections import deque
+import time
+
+STAGE_READ = "read"
+STAGE_STATISTICS = "statistics"
+STAGE_CALCULATE = "calculate"
+STAGE_COMMAND = "command"
+STAGES = (STAGE_READ, STAGE_STATISTICS, STAGE_CALCULATE, STAGE_COMMAND)
+
+
+class StageTimings:
+    """Rolling window of durations per stage."""
+
+    def __init__(self, capacity: int = 200) -> None:
+        """Initialize object."""
+        self._durations = {stage: deque(maxlen=capacity) for stage in STAGES}
+
+    @staticmethod
+    def start() -> float:
+        """Get start timestamp of first stage."""
+        return time.perf_counter()
+
+    def record(self, stage: str, start: float) -> float:
+        """Record duration of stage since start, return start of next stage."""
+        now = time.perf_counter()
+        self._durations[stage].append(now - start)
+        return now
+
+    def summary(self, stage: str) -> dict[str, float | int] | None:
+        """Get p50, p95 and max in milliseconds and sample count of stage."""
+        values = sorted(self._durations[stage])
+        if not values:
+            return None
+        count = len(values)
+        return {
+            "p50": values[(count - 1) // 2] * 1000,
+            "p95": values[min(int(count * 0.95), count - 1)] * 1000,
+            "max": values[-1] * 1000,
+            "count": count,
+        }
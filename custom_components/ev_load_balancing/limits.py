@@ -0,0 +1,32 @@
+"""Calculation of new charger limits from mains load."""
+
+from collections.abc import Sequence
+
+
+def calculate_limits(
+    mains_actual: Sequence[float],
+    mains_stddev: Sequence[float],
+    mains_limit: float,
+    set_limits: Sequence[float],
+    charger_limits: Sequence[float],
+) -> tuple[list[float], list[float]]:
+    """Calculate new limits for a matrix of chargers and mains phases.
+
+    The mains vectors have one value per phase and `set_limits` is a row-major
+    matrix with one row per charger, columns in the same phase order as the
+    mains vectors. `charger_limits` is the rated limit per charger.
+
+    Returns the current budget per phase for all chargers together, and the
+    matrix of new limits if each charger alone could use all spare current.
+    """
+    phases = len(mains_actual)
+    spare = [
+        mains_limit - actual - stddev
+        for actual, stddev in zip(mains_actual, mains_stddev, strict=True)
+    ]
+    budget = [spare[p] + sum(set_limits[p::phases]) for p in range(phases)]
+    limits = [
+        min(set_limits[i] + spare[i % phases], charger_limits[i // phases], mains_limit)
+        for i in range(len(set_limits))
+    ]
+    return budget, limits
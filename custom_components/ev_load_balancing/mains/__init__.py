@@ -1,19 +1,166 @@
 """Handling Mains currents input."""
 
 from abc import ABC, abstractmethod
-from datetime import datetime
+from array import array
+import math
+import time
 from typing import Any
 
 import voluptuous as vol
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, State
+from homeassistant.helpers.device_registry import DeviceEntry
 
 from ..const import Phases
 
 
+class RollingStatistics:
+    """Rolling window of samples with incremental mean and variance.
+
+    Samples are kept in a fixed-capacity ring buffer and evicted when the
+    buffer is full or when they are older than `max_age` seconds, though the
+    `min_count` newest samples are always kept. Mean and variance are updated
+    with Welford's algorithm on both insert and eviction, so adding a sample
+    costs the same regardless of window size. Monotonic timestamps and values
+    are stored unboxed in typed arrays, 16 bytes per sample.
+    """
+
+    __slots__ = (
+        "_capacity",
+        "_count",
+        "_evictions",
+        "_m2",
+        "_max_age",
+        "_mean",
+        "_min_count",
+        "_start",
+        "_timestamps",
+        "_values",
+    )
+
+    def __init__(self, capacity: int, min_count: int, max_age: float) -> None:
+        """Initialize object."""
+        self._capacity = capacity
+        self._min_count = min_count
+        self._max_age = max_age
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._start = 0
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        """Return number of samples in window."""
+        return self._count
+
+    def add(self, value: float, timestamp: float | None = None) -> None:
+        """Add a sample and evict the ones no longer in window."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if self._count == self._capacity:
+            self._evict_oldest()
+
+        index = (self._start + self._count) % self._capacity
+        self._timestamps[index] = timestamp
+        self._values[index] = value
+        self._count += 1
+        delta = value - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (value - self._mean)
+
+        oldest_allowed = timestamp - self._max_age
+        while (
+            self._count > self._min_count
+            and self._timestamps[self._start] < oldest_allowed
+        ):
+            self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        """Remove the oldest sample from window."""
+        value = self._values[self._start]
+        self._start = (self._start + 1) % self._capacity
+        self._count -= 1
+        if self._count == 0:
+            self._mean = 0.0
+            self._m2 = 0.0
+            return
+        delta = value - self._mean
+        self._mean -= delta / self._count
+        self._m2 -= delta * (value - self._mean)
+
+        # Recalculate from scratch once per buffer turnaround to keep rounding
+        # errors from the removals from accumulating, amortized O(1)
+        self._evictions += 1
+        if self._evictions >= self._capacity:
+            self._evictions = 0
+            self._recalculate()
+
+    def _recalculate(self) -> None:
+        """Recalculate mean and variance from samples in window."""
+        values = [
+            self._values[(self._start + i) % self._capacity] for i in range(self._count)
+        ]
+        self._mean = math.fsum(values) / self._count
+        self._m2 = math.fsum((v - self._mean) ** 2 for v in values)
+
+    def samples(self, now: float | None = None) -> list[tuple[float, float]]:
+        """Get (age, value) of samples in window, oldest first."""
+        if now is None:
+            now = time.monotonic()
+        return [
+            (now - self._timestamps[index], self._values[index])
+            for index in (
+                (self._start + i) % self._capacity for i in range(self._count)
+            )
+        ]
+
+    def restore(
+        self, samples: list[tuple[float, float]], now: float | None = None
+    ) -> None:
+        """Merge (age, value) samples, like from before a restart, into window.
+
+        Merged samples older than `max_age` are dropped, also when that leaves
+        less than `min_count` samples, as they may be from before a long stop.
+        """
+        if now is None:
+            now = time.monotonic()
+        merged = [sample for sample in samples if sample[0] <= self._max_age]
+        merged.extend(self.samples(now))
+        merged.sort(key=lambda sample: -sample[0])
+        self.clear()
+        for age, value in merged[-self._capacity :]:
+            self.add(value, now - age)
+
+    def clear(self) -> None:
+        """Remove all samples."""
+        self._start = 0
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._evictions = 0
+
+    @property
+    def mean(self) -> float:
+        """Mean of samples in window."""
+        return self._mean
+
+    @property
+    def stddev(self) -> float:
+        """Population standard deviation of samples in window."""
+        if self._count == 0:
+            return 0.0
+        return math.sqrt(max(self._m2, 0.0) / self._count)
+
+
 class MainsPhase(ABC):
     """A data class for a mains phase."""
 
+    __slots__ = ()
+
+    _history: RollingStatistics | None = None
+
     # def __init__(self) -> None:
     #     """Initialize object."""
 
@@ -30,18 +177,23 @@ class MainsPhase(ABC):
     def name(self) -> str:
         """Get friendly name of phase."""
 
+    @property
+    def history(self) -> RollingStatistics | None:
+        """Get rolling window of samples, None if phase keeps no history."""
+        return self._history
+
 
 class Mains(ABC):
     """Base class for Mains extractor."""
 
-    _history_phase1: dict[datetime, float] = {}
-    _history_phase2: dict[datetime, float] = {}
-    _history_phase3: dict[datetime, float] = {}
+    # Integration that provides the devices, None if not selected by device
+    device_domain: str | None = None
 
     def __init__(self, hass: HomeAssistant, update_callback) -> None:
         """Initialize base class."""
         self._hass = hass
         self._update_callback = update_callback
+        self._state_change_listeners = []
 
     @abstractmethod
     def get_phase(self, phase: Phases) -> MainsPhase:
@@ -74,8 +226,19 @@ class Mains(ABC):
     def validate_user_input(hass: HomeAssistant, user_input: dict[str, Any]) -> bool:
         """Validate the result from config flow step."""
 
+    @staticmethod
+    def match_device(hass: HomeAssistant, device: DeviceEntry) -> bool:
+        """Check if device of `device_domain` can be selected in config flow."""
+        return False
+
+    def _push_state(self, entity_id: str, state: State | None) -> None:
+        """Update from a changed input entity state, by default re-reads all."""
+        self.update()
+
     async def _async_input_changed(self, event):
         """Input entity change callback from state change event."""
         # _LOGGER.debug("Sensor change event from HASS: %s", event)
+        if event is not None and "new_state" in event.data:
+            self._push_state(event.data["entity_id"], event.data["new_state"])
         if self._update_callback is not None:
             await self._update_callback()
@@ -0,0 +1,235 @@
+"""Handling mains currents read directly from a DSMR (P1 port) telegram stream."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+import logging
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import selector
+
+from ..const import (
+    CONF_DEVICE_ID,
+    CONF_MAINS_BAUDRATE,
+    CONF_MAINS_LIMIT,
+    CONF_MAINS_PORT,
+    DEFAULT_MAINS_BAUDRATE,
+    Phases,
+)
+from ..helpers.dsmr import TelegramParser
+from . import Mains, MainsPhase, RollingStatistics
+
+try:
+    import serial
+    import serial_asyncio_fast
+except ImportError:
+    # In the requirements, only missing if installing it failed
+    serial = serial_asyncio_fast = None
+
+_LOGGER = logging.getLogger(__name__)
+
+RECONNECT_DELAY = 10
+READ_TIMEOUT = 30
+
+
+def parse_port(port: str) -> tuple[str, int] | None:
+    """Get host and port of a `host:port` address, None for a serial device."""
+    host, sep, number = port.rpartition(":")
+    if not sep or not host or not number.isdigit():
+        return None
+    return host.strip("[]"), int(number)
+
+
+async def async_open_port(
+    port: str, baudrate: int
+) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """Open TCP connection or serial device delivering telegrams."""
+    address = parse_port(port)
+    if address is not None:
+        return await asyncio.open_connection(*address)
+    # DSMR 4 and later use 115200 8N1, older versions 9600 7E1
+    legacy = baudrate < 115200
+    return await serial_asyncio_fast.open_serial_connection(
+        url=port,
+        baudrate=baudrate,
+        bytesize=serial.SEVENBITS if legacy else serial.EIGHTBITS,
+        parity=serial.PARITY_EVEN if legacy else serial.PARITY_NONE,
+        stopbits=serial.STOPBITS_ONE,
+    )
+
+
+class MainsPhaseDsmr(MainsPhase):
+    """A data class for a mains phase."""
+
+    __slots__ = ("_history", "_name", "_value")
+
+    _stddev_min_num = 10
+    _stddev_max_num = 600
+    _stddev_max_age = timedelta(minutes=2)
+
+    def __init__(self, name: str) -> None:
+        """Initialize object."""
+        self._name = name
+        self._value = None
+        self._history = RollingStatistics(
+            self._stddev_max_num,
+            self._stddev_min_num,
+            self._stddev_max_age.total_seconds(),
+        )
+
+    def set_value(self, value: float) -> None:
+        """Update measurements from telegram."""
+        self._value = value
+        self._history.add(value)
+
+    def actual_current(self) -> float:
+        """Get actual current on phase."""
+        return self._value
+
+    def stddev_current(self) -> float:
+        """Get standard deviation of current on phase."""
+        if len(self._history) > self._stddev_min_num / 2:
+            return self._history.stddev
+        _LOGGER.debug(
+            "Not enough values for stddev (%d), returning 0", len(self._history)
+        )
+        return 0
+
+    @property
+    def name(self) -> str:
+        """Get friendly name of phase."""
+        return self._name
+
+
+class MainsDsmr(Mains):
+    """DSMR telegram stream mains extractor.
+
+    Reads telegrams from a serial port or a raw TCP port (ser2net, or the
+    Slimmelezer), instead of the sensor entities published from them. All
+    phases of a telegram are updated together before the coordinator is
+    notified, once per telegram.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, update_callback, options: dict[str, Any]
+    ) -> None:
+        """Initialize DSMR extractor."""
+        super().__init__(hass, update_callback)
+        self._port = options[CONF_MAINS_PORT]
+        self._baudrate = int(options.get(CONF_MAINS_BAUDRATE, DEFAULT_MAINS_BAUDRATE))
+        self._mains_limit = options[CONF_MAINS_LIMIT]
+        self._parser = TelegramParser()
+        self._phases = {
+            phase: MainsPhaseDsmr(f"Phase {phase.value + 1}") for phase in Phases
+        }
+        self._task: asyncio.Task | None = None
+
+        # Only read telegrams when running, not while in config flow
+        if update_callback is not None:
+            if serial_asyncio_fast is None and parse_port(self._port) is None:
+                raise ConfigEntryNotReady(
+                    f"Reading serial port {self._port} needs pyserial-asyncio-fast"
+                )
+            self._task = hass.async_create_background_task(
+                self._async_read(), f"DSMR reader {self._port}"
+            )
+
+    @property
+    def telegrams(self) -> int:
+        """Number of valid telegrams received."""
+        return self._parser.telegrams
+
+    @property
+    def crc_errors(self) -> int:
+        """Number of telegrams dropped due to invalid CRC."""
+        return self._parser.crc_errors
+
+    async def _async_read(self) -> None:
+        """Read telegrams, reconnecting when the stream fails."""
+        while True:
+            try:
+                reader, writer = await async_open_port(self._port, self._baudrate)
+            except OSError as err:
+                _LOGGER.warning("Unable to open %s: %s", self._port, err)
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            _LOGGER.debug("Reading telegrams from %s", self._port)
+            try:
+                while data := await asyncio.wait_for(reader.read(1024), READ_TIMEOUT):
+                    for telegram in self._parser.feed(data):
+                        await self._async_telegram(telegram.currents)
+                _LOGGER.warning("Connection to %s closed", self._port)
+            except (OSError, TimeoutError) as err:
+                _LOGGER.warning("Reading from %s failed: %s", self._port, err)
+            finally:
+                writer.close()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _async_telegram(self, currents: tuple[float, float, float]) -> None:
+        """Update all phases from one telegram and notify the coordinator."""
+        for phase, value in zip(Phases, currents, strict=True):
+            self._phases[phase].set_value(value)
+        await self._update_callback()
+
+    def get_phase(self, phase: Phases) -> MainsPhase:
+        """Return phase X data."""
+        return self._phases.get(phase)
+
+    def get_rated_limit(self) -> int:
+        """Return main limit per phase."""
+        return self._mains_limit
+
+    def update(self) -> None:
+        """Nothing to do, telegrams are pushed as received."""
+
+    def cleanup(self):
+        """Cleanup by stopping the reader."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @property
+    def device_id(self) -> str:
+        """Device id."""
+        return f"dsmr_{self._port}"
+
+    @staticmethod
+    def get_schema(selections: dict[str, Any]) -> vol.Schema:
+        """Device config schema."""
+        return vol.Schema(
+            {
+                vol.Required(CONF_MAINS_PORT): str,
+                vol.Required(
+                    CONF_MAINS_BAUDRATE, default=str(DEFAULT_MAINS_BAUDRATE)
+                ): selector.SelectSelector(
+                    selector.SelectSelectorConfig(
+                        options=["9600", "115200"],
+                        mode=selector.SelectSelectorMode.DROPDOWN,
+                    )
+                ),
+                vol.Required(CONF_MAINS_LIMIT, default=20): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=6,
+                        max=80,
+                        step=1,
+                        unit_of_measurement="ampere",
+                    )
+                ),
+            }
+        )
+
+    @staticmethod
+    def validate_user_input(hass: HomeAssistant, user_input: dict[str, Any]) -> bool:
+        """Validate the result from config flow step."""
+        port = user_input[CONF_MAINS_PORT].strip()
+        if not port:
+            return False
+        user_input[CONF_MAINS_PORT] = port
+        # The port identifies the meter, as there is no device to select
+        user_input[CONF_DEVICE_ID] = f"dsmr_{port}"
+        return True
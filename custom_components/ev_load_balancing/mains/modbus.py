@@ -0,0 +1,228 @@
+"""Handling mains currents polled from a Modbus TCP energy meter."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import logging
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import selector
+from homeassistant.helpers.event import async_track_time_interval
+
+from ..const import (
+    CONF_DEVICE_ID,
+    CONF_MAINS_HOST,
+    CONF_MAINS_LIMIT,
+    CONF_MAINS_METER,
+    CONF_MAINS_POLL_INTERVAL,
+    CONF_MAINS_UNIT,
+    DEFAULT_MAINS_POLL_INTERVAL,
+    Phases,
+)
+from ..helpers.modbus import (
+    METER_PROFILES,
+    ModbusError,
+    get_modbus_client,
+    split_address,
+)
+from . import Mains, MainsPhase, RollingStatistics
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class MainsPhaseModbus(MainsPhase):
+    """A data class for a mains phase."""
+
+    __slots__ = ("_history", "_name", "_value")
+
+    _stddev_min_num = 10
+    _stddev_max_num = 600
+    _stddev_max_age = timedelta(minutes=2)
+
+    def __init__(self, name: str) -> None:
+        """Initialize object."""
+        self._name = name
+        self._value = None
+        self._history = RollingStatistics(
+            self._stddev_max_num,
+            self._stddev_min_num,
+            self._stddev_max_age.total_seconds(),
+        )
+
+    def set_value(self, value: float | None) -> None:
+        """Update measurements from polled registers."""
+        self._value = value
+        if value is not None:
+            self._history.add(value)
+
+    def actual_current(self) -> float:
+        """Get actual current on phase."""
+        return self._value
+
+    def stddev_current(self) -> float:
+        """Get standard deviation of current on phase."""
+        if len(self._history) > self._stddev_min_num / 2:
+            return self._history.stddev
+        _LOGGER.debug(
+            "Not enough values for stddev (%d), returning 0", len(self._history)
+        )
+        return 0
+
+    @property
+    def name(self) -> str:
+        """Get friendly name of phase."""
+        return self._name
+
+
+class MainsModbus(Mains):
+    """Modbus TCP energy meter mains extractor.
+
+    Each poll reads the currents of all phases in one request of contiguous
+    registers, over a connection shared with other entries using the same
+    meter or gateway.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, update_callback, options: dict[str, Any]
+    ) -> None:
+        """Initialize Modbus extractor."""
+        super().__init__(hass, update_callback)
+        self._host, self._port = split_address(options[CONF_MAINS_HOST])
+        self._unit = int(options[CONF_MAINS_UNIT])
+        self._profile = METER_PROFILES[options[CONF_MAINS_METER]]
+        self._mains_limit = options[CONF_MAINS_LIMIT]
+        self._phases = {
+            phase: MainsPhaseModbus(f"Phase {phase.value + 1}") for phase in Phases
+        }
+        self._client = None
+        self._polling = False
+        self.poll_count = 0
+
+        # Only poll when running, not while in config flow
+        if update_callback is not None:
+            self._client = get_modbus_client(hass, self._host, self._port)
+            self._state_change_listeners.append(
+                async_track_time_interval(
+                    hass,
+                    self._async_poll,
+                    timedelta(
+                        seconds=options.get(
+                            CONF_MAINS_POLL_INTERVAL, DEFAULT_MAINS_POLL_INTERVAL
+                        )
+                    ),
+                    name=f"Modbus poll {self._host}",
+                )
+            )
+
+    async def async_read(self) -> bool:
+        """Read currents of all phases, False if it failed."""
+        profile = self._profile
+        if self._client is None:
+            return False
+        try:
+            registers = await self._client.async_read_input_registers(
+                self._unit, profile.address, profile.count
+            )
+        except ModbusError as err:
+            _LOGGER.warning("Reading meter failed: %s", err)
+            for phase in self._phases.values():
+                phase.set_value(None)
+            return False
+        self.poll_count += 1
+        for phase, value in zip(Phases, profile.decode(registers), strict=True):
+            self._phases[phase].set_value(value * profile.scale)
+        return True
+
+    async def _async_poll(self, _now: datetime) -> None:
+        """Poll meter and notify the coordinator, skip if previous poll is slow."""
+        if self._polling:
+            _LOGGER.debug("Skipping poll, previous one still running")
+            return
+        self._polling = True
+        try:
+            if await self.async_read():
+                await self._update_callback()
+        finally:
+            self._polling = False
+
+    def get_phase(self, phase: Phases) -> MainsPhase:
+        """Return phase X data."""
+        return self._phases.get(phase)
+
+    def get_rated_limit(self) -> int:
+        """Return main limit per phase."""
+        return self._mains_limit
+
+    def update(self) -> None:
+        """Nothing to do, polls are pushed as read."""
+
+    def cleanup(self):
+        """Cleanup by stopping polls and releasing the connection."""
+        for listener in self._state_change_listeners:
+            listener()
+        self._state_change_listeners.clear()
+        if self._client is not None:
+            self._client.release()
+            self._client = None
+
+    @property
+    def device_id(self) -> str:
+        """Device id."""
+        return f"modbus_{self._host}_{self._port}_{self._unit}"
+
+    @staticmethod
+    def get_schema(selections: dict[str, Any]) -> vol.Schema:
+        """Device config schema."""
+        return vol.Schema(
+            {
+                vol.Required(CONF_MAINS_HOST): str,
+                vol.Required(CONF_MAINS_UNIT, default=1): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=1, max=247, step=1, mode=selector.NumberSelectorMode.BOX
+                    )
+                ),
+                vol.Required(
+                    CONF_MAINS_METER, default=next(iter(METER_PROFILES))
+                ): selector.SelectSelector(
+                    selector.SelectSelectorConfig(
+                        options=list(METER_PROFILES),
+                        mode=selector.SelectSelectorMode.DROPDOWN,
+                    )
+                ),
+                vol.Required(
+                    CONF_MAINS_POLL_INTERVAL, default=DEFAULT_MAINS_POLL_INTERVAL
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0.5,
+                        max=60,
+                        step=0.5,
+                        unit_of_measurement="seconds",
+                    )
+                ),
+                vol.Required(CONF_MAINS_LIMIT, default=20): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=6,
+                        max=80,
+                        step=1,
+                        unit_of_measurement="ampere",
+                    )
+                ),
+            }
+        )
+
+    @staticmethod
+    def validate_user_input(hass: HomeAssistant, user_input: dict[str, Any]) -> bool:
+        """Validate the result from config flow step."""
+        address = user_input[CONF_MAINS_HOST].strip()
+        if not address or user_input[CONF_MAINS_METER] not in METER_PROFILES:
+            return False
+        user_input[CONF_MAINS_HOST] = address
+        host, port = split_address(address)
+        # The address identifies the meter, as there is no device to select
+        user_input[CONF_DEVICE_ID] = (
+            f"modbus_{host}_{port}_{int(user_input[CONF_MAINS_UNIT])}"
+        )
+        return True
@@ -1,20 +1,25 @@
 """Handling Slimmelezer mains currents input."""
 
-from datetime import UTC, datetime, timedelta
+from datetime import timedelta
 import logging
-import statistics
 from typing import Any
 
 import voluptuous as vol
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, State
 from homeassistant.helpers import selector
+from homeassistant.helpers.device_registry import DeviceEntry
 from homeassistant.helpers.event import async_track_state_change_event
-from homeassistant.helpers.template import device_entities
 
 from ..const import CONF_DEVICE_ID, CONF_MAINS_LIMIT, Phases
-from ..helpers.entity_value import get_sensor_entity_value
-from . import Mains, MainsPhase
+from ..helpers.entity_roles import (
+    ROLE_CURRENT_PHASE1,
+    ROLE_CURRENT_PHASE2,
+    ROLE_CURRENT_PHASE3,
+    get_entity_roles,
+)
+from ..helpers.entity_value import get_state_value
+from . import Mains, MainsPhase, RollingStatistics
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -22,7 +27,10 @@ _LOGGER = logging.getLogger(__name__)
 class MainsPhaseSlimmelezer(MainsPhase):
     """A data class for a mains phase."""
 
+    __slots__ = ("_entity", "_hass", "_history", "_value")
+
     _stddev_min_num = 10
+    _stddev_max_num = 600
     _stddev_max_age = timedelta(minutes=2)
 
     def __init__(self, hass: HomeAssistant, entity_id: str) -> None:
@@ -30,34 +38,25 @@ class MainsPhaseSlimmelezer(MainsPhase):
         self._hass = hass
         self._entity = entity_id
         self._value = None
-        self._history_values = {}
+        self._history = RollingStatistics(
+            self._stddev_max_num,
+            self._stddev_min_num,
+            self._stddev_max_age.total_seconds(),
+        )
 
     def update(self) -> None:
         """Update measurements."""
-        now = datetime.now(UTC)
-        self._value = get_sensor_entity_value(
-            self._hass,
-            _LOGGER,
-            self._entity,
-        )
+        self.set_state(self._hass.states.get(self._entity))
+
+    def set_state(self, state: State | None) -> None:
+        """Update measurements from entity state."""
+        self._value = get_state_value(_LOGGER, self._entity, state)
 
         if self._value is None:
             _LOGGER.debug("Skipping history since None value")
             return
 
-        self._history_values[now] = self._value
-
-        # Find and drop old values if enough in dict
-        drop_keys = []
-        keep_count = 0
-        for k in sorted(self._history_values.keys(), reverse=True):
-            if keep_count < self._stddev_min_num or k > now - self._stddev_max_age:
-                keep_count += 1
-            else:
-                drop_keys.append(k)
-        for k in drop_keys:
-            self._history_values.pop(k)
-            _LOGGER.debug("Dropping measurement with key %s", k)
+        self._history.add(self._value)
 
     def actual_current(self) -> float:
         """Get actual current on phase."""
@@ -65,10 +64,10 @@ class MainsPhaseSlimmelezer(MainsPhase):
 
     def stddev_current(self) -> float:
         """Get standard deviation of current on phase."""
-        if len(self._history_values) > self._stddev_min_num / 2:
-            return statistics.pstdev(self._history_values.values())
+        if len(self._history) > self._stddev_min_num / 2:
+            return self._history.stddev
         _LOGGER.debug(
-            "Not enough values for stddev (%d), returning 0", len(self._history_values)
+            "Not enough values for stddev (%d), returning 0", len(self._history)
         )
         return 0
 
@@ -81,7 +80,7 @@ class MainsPhaseSlimmelezer(MainsPhase):
 class MainsSlimmelezer(Mains):
     """Slimmelezer mains extractor."""
 
-    _state_change_listeners = []
+    device_domain = "esphome"
 
     def __init__(
         self, hass: HomeAssistant, update_callback, options: dict[str, str]
@@ -91,21 +90,27 @@ class MainsSlimmelezer(Mains):
         self._id = options[CONF_DEVICE_ID]
         self._mains_limit = options[CONF_MAINS_LIMIT]
 
-        entities = device_entities(hass, self._id)
+        roles = get_entity_roles(hass)
         used_entities = []
 
-        entity_phase1 = [e for e in entities if "_current" in e and e.endswith("1")][0]
+        entity_phase1 = roles.require(self._id, ROLE_CURRENT_PHASE1)
         self._phase1 = MainsPhaseSlimmelezer(self._hass, entity_phase1)
         used_entities.append(entity_phase1)
 
-        entity_phase2 = [e for e in entities if "_current" in e and e.endswith("2")][0]
+        entity_phase2 = roles.require(self._id, ROLE_CURRENT_PHASE2)
         self._phase2 = MainsPhaseSlimmelezer(self._hass, entity_phase2)
         used_entities.append(entity_phase2)
 
-        entity_phase3 = [e for e in entities if "_current" in e and e.endswith("3")][0]
+        entity_phase3 = roles.require(self._id, ROLE_CURRENT_PHASE3)
         self._phase3 = MainsPhaseSlimmelezer(self._hass, entity_phase3)
         used_entities.append(entity_phase3)
 
+        self._phases_by_entity = {
+            entity_phase1: self._phase1,
+            entity_phase2: self._phase2,
+            entity_phase3: self._phase3,
+        }
+
         self._state_change_listeners.append(
             async_track_state_change_event(
                 self._hass,
@@ -114,6 +119,11 @@ class MainsSlimmelezer(Mains):
             )
         )
 
+    def _push_state(self, entity_id: str, state: State | None) -> None:
+        """Update only the phase of the changed entity."""
+        if entity_id in self._phases_by_entity:
+            self._phases_by_entity[entity_id].set_state(state)
+
     def get_phase(self, phase: Phases) -> MainsPhase:
         """Return phase X data."""
         if phase == Phases.PHASE1:
@@ -136,8 +146,9 @@ class MainsSlimmelezer(Mains):
 
     def cleanup(self):
         """Cleanup by removing event listeners."""
-        # for listener in self._state_change_listeners:
-        #     listener()
+        for listener in self._state_change_listeners:
+            listener()
+        self._state_change_listeners.clear()
 
     @property
     def device_id(self) -> str:
@@ -165,3 +176,12 @@ class MainsSlimmelezer(Mains):
     def validate_user_input(hass: HomeAssistant, user_input: dict[str, Any]) -> bool:
         """Validate the result from config flow step."""
         return True
+
+    @staticmethod
+    def match_device(hass: HomeAssistant, device: DeviceEntry) -> bool:
+        """Check if ESPHome device has current sensors for all phases."""
+        roles = get_entity_roles(hass)
+        return all(
+            roles.get(device.id, role) is not None
+            for role in (ROLE_CURRENT_PHASE1, ROLE_CURRENT_PHASE2, ROLE_CURRENT_PHASE3)
+        )
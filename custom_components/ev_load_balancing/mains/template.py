@@ -1,17 +1,20 @@
 """Handling Sensor Entities mains currents input."""
 
-from datetime import UTC, datetime, timedelta
+from datetime import timedelta
 import logging
 import re
-import statistics
 from typing import Any
 
 import voluptuous as vol
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, State
 from homeassistant.exceptions import TemplateError
 from homeassistant.helpers import selector
-from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.helpers.event import (
+    TrackTemplate,
+    TrackTemplateResult,
+    async_track_template_result,
+)
 from homeassistant.helpers.template import Template
 
 from ..const import (
@@ -21,7 +24,7 @@ from ..const import (
     CONF_MAINS_PHASE3,
     Phases,
 )
-from . import Mains, MainsPhase
+from . import Mains, MainsPhase, RollingStatistics
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -29,43 +32,57 @@ _LOGGER = logging.getLogger(__name__)
 class MainsPhaseTemplate(MainsPhase):
     """A data class for a mains phase."""
 
+    __slots__ = ("_hass", "_history", "_name", "_template", "_tracked", "_value")
+
     _stddev_min_num = 10
+    _stddev_max_num = 600
     _stddev_max_age = timedelta(minutes=2)
 
     def __init__(self, hass: HomeAssistant, template: str, name: str) -> None:
         """Initialize object."""
         self._hass = hass
-        self._template = template
+        self._template = Template(template, hass)
         self._name = name
+        self._tracked = False
 
         self._value = None
-        self._history_values = {}
+        self._history = RollingStatistics(
+            self._stddev_max_num,
+            self._stddev_min_num,
+            self._stddev_max_age.total_seconds(),
+        )
+
+    @property
+    def template(self) -> Template:
+        """Get the compiled template of phase."""
+        return self._template
+
+    def track(self) -> TrackTemplate:
+        """Get template tracker, results will be pushed by `set_result`."""
+        self._tracked = True
+        return TrackTemplate(self._template, None)
 
     def update(self) -> None:
-        """Update measurements."""
-        now = datetime.now(UTC)
-        self._value = Template(self._template, self._hass).async_render() or None
+        """Update measurements, if not tracked for changes."""
+        if not self._tracked:
+            self.set_result(self._template.async_render())
+
+    def set_result(self, result: Any) -> None:
+        """Update measurements from a rendered result."""
+        if isinstance(result, TemplateError):
+            _LOGGER.warning("Template %s failed: %s", self._template.template, result)
+            result = None
+        self._value = result or None
 
         if not isinstance(self._value, float):
             _LOGGER.warning("Template did not return a numeric value")
+            self._value = None
 
         if self._value is None:
             _LOGGER.debug("Skipping history since None value")
             return
 
-        self._history_values[now] = self._value
-
-        # Find and drop old values if enough in dict
-        drop_keys = []
-        keep_count = 0
-        for k in sorted(self._history_values.keys(), reverse=True):
-            if keep_count < self._stddev_min_num or k > now - self._stddev_max_age:
-                keep_count += 1
-            else:
-                drop_keys.append(k)
-        for k in drop_keys:
-            self._history_values.pop(k)
-            _LOGGER.debug("Dropping measurement with key %s", k)
+        self._history.add(self._value)
 
     def actual_current(self) -> float:
         """Get actual current on phase."""
@@ -73,10 +90,10 @@ class MainsPhaseTemplate(MainsPhase):
 
     def stddev_current(self) -> float:
         """Get standard deviation of current on phase."""
-        if len(self._history_values) > self._stddev_min_num / 2:
-            return statistics.pstdev(self._history_values.values())
+        if len(self._history) > self._stddev_min_num / 2:
+            return self._history.stddev
         _LOGGER.debug(
-            "Not enough values for stddev (%d), returning 0", len(self._history_values)
+            "Not enough values for stddev (%d), returning 0", len(self._history)
         )
         return 0
 
@@ -89,8 +106,6 @@ class MainsPhaseTemplate(MainsPhase):
 class MainsTemplate(Mains):
     """Template mains extractor."""
 
-    _state_change_listeners = []
-
     def __init__(
         self, hass: HomeAssistant, update_callback, options: dict[str, str]
     ) -> None:
@@ -98,30 +113,45 @@ class MainsTemplate(Mains):
         super().__init__(hass, update_callback)
         self._mains_limit = options[CONF_MAINS_LIMIT]
 
-        # used_entities = []
-
         self._phase1 = MainsPhaseTemplate(
             self._hass, options[CONF_MAINS_PHASE1], "Phase 1"
         )
-        # used_entities.append(entity_phase1)
-
         self._phase2 = MainsPhaseTemplate(
             self._hass, options[CONF_MAINS_PHASE2], "Phase 2"
         )
-        # used_entities.append(entity_phase2)
-
         self._phase3 = MainsPhaseTemplate(
             self._hass, options[CONF_MAINS_PHASE3], "Phase 3"
         )
-        # used_entities.append(entity_phase3)
 
-        # self._state_change_listeners.append(
-        #     async_track_state_change_event(
-        #         self._hass,
-        #         used_entities,
-        #         self._async_input_changed,
-        #     )
-        # )
+        # Only re-render on changes when running, not while in config flow
+        if update_callback is not None:
+            trackers: dict[Template, TrackTemplate] = {}
+            self._tracked_phases: dict[Template, list[MainsPhaseTemplate]] = {}
+            for phase in (self._phase1, self._phase2, self._phase3):
+                # Equal templates are tracked once, the result goes to each phase
+                trackers.setdefault(phase.template, phase.track())
+                self._tracked_phases.setdefault(phase.template, []).append(phase)
+            info = async_track_template_result(
+                self._hass,
+                list(trackers.values()),
+                self._async_templates_changed,
+            )
+            self._state_change_listeners.append(info.async_remove)
+            info.async_refresh()
+
+    def _push_state(self, entity_id: str, state: State | None) -> None:
+        """Nothing to do, results are pushed by template tracking."""
+
+    async def _async_templates_changed(
+        self, event, updates: list[TrackTemplateResult]
+    ) -> None:
+        """Template result change callback from template tracking."""
+        for update in updates:
+            for phase in self._tracked_phases[update.template]:
+                phase.set_result(update.result)
+        # Initial results are pushed without event, no need to refresh then
+        if event is not None:
+            await self._async_input_changed(event)
 
     def get_phase(self, phase: Phases) -> MainsPhase:
         """Return phase X data."""
@@ -145,8 +175,9 @@ class MainsTemplate(Mains):
 
     def cleanup(self):
         """Cleanup by removing event listeners."""
-        # for listener in self._state_change_listeners:
-        #     listener()
+        for listener in self._state_change_listeners:
+            listener()
+        self._state_change_listeners.clear()
 
     @property
     def device_id(self) -> str:
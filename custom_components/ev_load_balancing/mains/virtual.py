@@ -1,16 +1,26 @@
-"""Handling Virtual mains currents input."""
+"""Handling mains currents of a simulated household."""
 
-from datetime import UTC, datetime, timedelta
+from __future__ import annotations
+
+from datetime import datetime, timedelta
 import logging
-import statistics
+from typing import Any
 
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.event import async_track_state_change_event
-from homeassistant.helpers.template import device_entities
+import voluptuous as vol
 
-from ..const import Phases
-from ..helpers.entity_value import get_sensor_entity_value
-from . import Mains, MainsPhase
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import selector
+from homeassistant.helpers.event import async_track_time_interval
+
+from ..const import (
+    CONF_DEVICE_ID,
+    CONF_MAINS_LIMIT,
+    CONF_MAINS_POLL_INTERVAL,
+    DEFAULT_MAINS_POLL_INTERVAL,
+    Phases,
+)
+from ..helpers.simulation import get_simulation
+from . import Mains, MainsPhase, RollingStatistics
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -18,46 +28,26 @@ _LOGGER = logging.getLogger(__name__)
 class MainsPhaseVirtual(MainsPhase):
     """A data class for a mains phase."""
 
+    __slots__ = ("_history", "_name", "_value")
+
     _stddev_min_num = 10
+    _stddev_max_num = 600
     _stddev_max_age = timedelta(minutes=2)
 
-    def __init__(self, hass: HomeAssistant, entity_id: str) -> None:
+    def __init__(self, name: str) -> None:
         """Initialize object."""
-        self._hass = hass
-        self._entity = entity_id
+        self._name = name
         self._value = None
-        self._history_values = {}
-
-    def set_expected(self):
-        """Fake update mathod."""
-        pass
-
-    def update(self) -> None:
-        """Update measuremetns."""
-        now = datetime.now(UTC)
-        self._value = get_sensor_entity_value(
-            self._hass,
-            _LOGGER,
-            self._entity,
+        self._history = RollingStatistics(
+            self._stddev_max_num,
+            self._stddev_min_num,
+            self._stddev_max_age.total_seconds(),
         )
 
-        if self._value is None:
-            _LOGGER.debug("Skipping history since None value")
-            return
-
-        self._history_values[now] = self._value
-
-        # Find and drop old values if enough in dict
-        drop_keys = []
-        keep_count = 0
-        for k in sorted(self._history_values.keys(), reverse=True):
-            if keep_count < self._stddev_min_num or k > now - self._stddev_max_age:
-                keep_count += 1
-            else:
-                drop_keys.append(k)
-        for k in drop_keys:
-            self._history_values.pop(k)
-            _LOGGER.debug("Dropping measurement with key %s", k)
+    def set_value(self, value: float) -> None:
+        """Update measurements from simulation."""
+        self._value = value
+        self._history.add(value)
 
     def actual_current(self) -> float:
         """Get actual current on phase."""
@@ -65,71 +55,121 @@ class MainsPhaseVirtual(MainsPhase):
 
     def stddev_current(self) -> float:
         """Get standard deviation of current on phase."""
-        if len(self._history_values) > self._stddev_min_num / 2:
-            return statistics.pstdev(self._history_values.values())
+        if len(self._history) > self._stddev_min_num / 2:
+            return self._history.stddev
         _LOGGER.debug(
-            "Not enough values for stddev (%d), returning 0", len(self._history_values)
+            "Not enough values for stddev (%d), returning 0", len(self._history)
         )
         return 0
 
+    @property
+    def name(self) -> str:
+        """Get friendly name of phase."""
+        return self._name
+
 
 class MainsVirtual(Mains):
-    """Virtual mains extractor."""
+    """Virtual mains extractor, measuring a simulation.
 
-    _state_change_listeners = []
+    The simulation is shared with the virtual charger of the same id, so
+    mains currents include what that charger draws.
+    """
 
     def __init__(
-        self, hass: HomeAssistant, update_callback, device_id: str, mains_limit: int
+        self, hass: HomeAssistant, update_callback, options: dict[str, Any]
     ) -> None:
-        """Initilalize Virtual extractor."""
+        """Initialize Virtual extractor."""
         super().__init__(hass, update_callback)
-        self._id = device_id
-        self._mains_limit = mains_limit
-
-        entities = device_entities(hass, device_id)
-        used_entities = []
-
-        entity_phase1 = [e for e in entities if "_current" in e and e.endswith("1")][0]
-        self._phase1 = MainsPhaseVirtual(self._hass, entity_phase1)
-        used_entities.append(entity_phase1)
-
-        entity_phase2 = [e for e in entities if "_current" in e and e.endswith("2")][0]
-        self._phase2 = MainsPhaseVirtual(self._hass, entity_phase2)
-        used_entities.append(entity_phase2)
-
-        entity_phase3 = [e for e in entities if "_current" in e and e.endswith("3")][0]
-        self._phase3 = MainsPhaseVirtual(self._hass, entity_phase3)
-        used_entities.append(entity_phase3)
-
-        self._state_change_listeners.append(
-            async_track_state_change_event(
-                self._hass,
-                used_entities,
-                self._async_input_changed,
+        self._id = options[CONF_DEVICE_ID]
+        self._mains_limit = options[CONF_MAINS_LIMIT]
+        self._phases = {
+            phase: MainsPhaseVirtual(f"Phase {phase.value + 1}") for phase in Phases
+        }
+        self._simulation = None
+
+        # Only simulate when running, not while in config flow
+        if update_callback is not None:
+            self._simulation = get_simulation(hass, self._id)
+            self._simulation.mains_limit = self._mains_limit
+            self._state_change_listeners.append(
+                async_track_time_interval(
+                    hass,
+                    self._async_sample,
+                    timedelta(
+                        seconds=options.get(
+                            CONF_MAINS_POLL_INTERVAL, DEFAULT_MAINS_POLL_INTERVAL
+                        )
+                    ),
+                    name=f"Virtual mains {self._id}",
+                )
             )
-        )
+
+    async def _async_sample(self, _now: datetime) -> None:
+        """Sample simulated currents and notify the coordinator."""
+        self.update()
+        await self._update_callback()
 
     def get_phase(self, phase: Phases) -> MainsPhase:
         """Return phase X data."""
-        if phase == Phases.PHASE1:
-            return self._phase1
-        if phase == Phases.PHASE2:
-            return self._phase2
-        if phase == Phases.PHASE3:
-            return self._phase3
-        return None
+        return self._phases.get(phase)
 
     def get_rated_limit(self) -> int:
         """Return main limit per phase."""
         return self._mains_limit
 
     def update(self) -> None:
-        """Update measuremetns."""
-        self._phase1.update()
-        self._phase2.update()
-        self._phase3.update()
+        """Update measurements from the simulation."""
+        if self._simulation is None:
+            return
+        self._simulation.advance()
+        currents = self._simulation.mains_currents()
+        for phase, value in zip(Phases, currents, strict=True):
+            self._phases[phase].set_value(value)
 
     def cleanup(self):
-        """Cleanup by removing event listeners."""
-        # for listner in self._state_change_listeners:
-        #     listner()
+        """Cleanup by stopping samples and releasing the simulation."""
+        for listener in self._state_change_listeners:
+            listener()
+        self._state_change_listeners.clear()
+        if self._simulation is not None:
+            self._simulation.release()
+            self._simulation = None
+
+    @property
+    def device_id(self) -> str:
+        """Device id."""
+        return self._id
+
+    @staticmethod
+    def get_schema(selections: dict[str, Any]) -> vol.Schema:
+        """Device config schema."""
+        return vol.Schema(
+            {
+                vol.Required(CONF_DEVICE_ID, default="virtual"): str,
+                vol.Required(
+                    CONF_MAINS_POLL_INTERVAL, default=DEFAULT_MAINS_POLL_INTERVAL
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0.5,
+                        max=60,
+                        step=0.5,
+                        unit_of_measurement="seconds",
+                    )
+                ),
+                vol.Required(CONF_MAINS_LIMIT, default=20): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=6,
+                        max=80,
+                        step=1,
+                        unit_of_measurement="ampere",
+                    )
+                ),
+            }
+        )
+
+    @staticmethod
+    def validate_user_input(hass: HomeAssistant, user_input: dict[str, Any]) -> bool:
+        """Validate the result from config flow step."""
+        simulation_id = user_input[CONF_DEVICE_ID].strip()
+        user_input[CONF_DEVICE_ID] = simulation_id
+        return bool(simulation_id)
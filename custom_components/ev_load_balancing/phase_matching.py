@@ -0,0 +1,140 @@
+"""Matching of charger phases to mains phases from the response to current steps."""
+
+import asyncio
+from collections import deque
+import logging
+import math
+import statistics
+
+from homeassistant.exceptions import ConfigEntryError
+
+from .chargers import Charger
+from .const import Phases
+from .mains import Mains
+
+_LOGGER = logging.getLogger(__name__)
+
+STEP_CURRENT = 10.0
+MIN_RESPONSE = 6.0
+
+
+class PhaseLearningFailed(ConfigEntryError):
+    """Special error if phase learning fails."""
+
+
+class PhaseCommandFailed(PhaseLearningFailed):
+    """Error if the charger did not accept a step current."""
+
+
+class PhaseMatcher:
+    """Find the mains phase that responds to a current step on each charger phase.
+
+    Mains samples are taken on every mains state change, so the matcher must
+    be used as update callback of the mains. After each command it waits for a
+    full window of samples where one mains phase has risen at least
+    `min_response` above the previous stable level, `confidence` standard
+    deviations more than any other phase, and has settled again.
+    """
+
+    def __init__(
+        self,
+        charger: Charger,
+        step_current: float = STEP_CURRENT,
+        min_response: float = MIN_RESPONSE,
+        window: int = 5,
+        confidence: float = 4.0,
+        max_noise: float = 1.0,
+        timeout: float = 60.0,
+    ) -> None:
+        """Initialize object."""
+        self._charger = charger
+        self._step_current = step_current
+        self._min_response = min_response
+        self._confidence = confidence
+        self._max_noise = max_noise
+        self._timeout = timeout
+        self._mains: Mains | None = None
+        self._samples: deque[tuple[float, ...]] = deque(maxlen=window)
+        self._new_sample = asyncio.Event()
+
+    async def async_mains_changed(self) -> None:
+        """Take a sample of all mains phases."""
+        if self._mains is None:
+            return
+        values = tuple(self._mains.get_phase(p).actual_current() for p in Phases)
+        if None in values:
+            return
+        self._samples.append(values)
+        self._new_sample.set()
+
+    async def async_match(self, mains: Mains) -> dict[Phases, Phases]:
+        """Step each charger phase in turn, return mains phase per charger phase."""
+        self._mains = mains
+        matches: dict[Phases, Phases] = {}
+        try:
+            await self._async_command(None)
+            baseline = await self._async_wait(self._stable)
+            for c_phase in Phases:
+                await self._async_command(c_phase)
+                m_phase, baseline = await self._async_wait(
+                    lambda means, stddevs, baseline=baseline: self._response(
+                        baseline, means, stddevs
+                    )
+                )
+                _LOGGER.debug(
+                    "Found match for charger %s in mains %s", c_phase.name, m_phase.name
+                )
+                matches[c_phase] = m_phase
+        except TimeoutError as err:
+            raise PhaseLearningFailed(
+                f"No stable mains response after {len(matches)} matched phases"
+            ) from err
+        finally:
+            self._mains = None
+
+        if len(set(matches.values())) < len(Phases):
+            raise PhaseLearningFailed("Failed to match phases")
+        return matches
+
+    async def _async_command(self, phase: Phases | None) -> None:
+        """Set step current on one charger phase and zero on the others."""
+        self._samples.clear()
+        limits = [self._step_current if p == phase else 0.0 for p in Phases]
+        if not await self._charger.async_set_limits(*limits):
+            raise PhaseCommandFailed(f"Charger did not accept limits {limits}")
+
+    async def _async_wait(self, check):
+        """Wait for a window of samples for which check returns a result."""
+        async with asyncio.timeout(self._timeout):
+            while True:
+                self._new_sample.clear()
+                await self._new_sample.wait()
+                if len(self._samples) < self._samples.maxlen:
+                    continue
+                columns = list(zip(*self._samples, strict=True))
+                means = [statistics.fmean(column) for column in columns]
+                stddevs = [statistics.pstdev(column) for column in columns]
+                result = check(means, stddevs)
+                if result is not None:
+                    return result
+
+    def _stable(self, means: list[float], stddevs: list[float]):
+        """Get window as baseline if all phases have settled."""
+        if max(stddevs) > self._max_noise:
+            return None
+        return means, stddevs
+
+    def _response(self, baseline, means: list[float], stddevs: list[float]):
+        """Get responding mains phase and new baseline, if confident."""
+        base_means, base_stddevs = baseline
+        deltas = [new - old for new, old in zip(means, base_means, strict=True)]
+        best = max(range(len(deltas)), key=deltas.__getitem__)
+        runner_up = max(delta for i, delta in enumerate(deltas) if i != best)
+        noise = max(math.hypot(base_stddevs[best], stddevs[best]), 0.1)
+        if (
+            deltas[best] < self._min_response
+            or deltas[best] - max(runner_up, 0.0) < self._confidence * noise
+            or self._stable(means, stddevs) is None
+        ):
+            return None
+        return Phases(best), (means, stddevs)
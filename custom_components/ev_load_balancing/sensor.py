@@ -8,13 +8,21 @@ from homeassistant.components.sensor import (
     SensorDeviceClass,
     SensorEntity,
     SensorEntityDescription,
+    SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import STATE_UNKNOWN, EntityCategory
+from homeassistant.const import (
+    STATE_UNKNOWN,
+    EntityCategory,
+    UnitOfFrequency,
+    UnitOfTime,
+)
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from . import EvLoadBalancingCoordinator
 from .const import DOMAIN
+from .helpers.timing import STAGES
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -45,14 +53,95 @@ async def async_setup_entry(
                 native_unit_of_measurement="seconds",
             ),
         ),
+        UpdateRateSensor(
+            coordinator,
+            entity_description=SensorEntityDescription(
+                key="update_rate",
+                name="Update Rate",
+                device_class=SensorDeviceClass.FREQUENCY,
+                state_class=SensorStateClass.MEASUREMENT,
+                entity_category=EntityCategory.DIAGNOSTIC,
+                native_unit_of_measurement=UnitOfFrequency.HERTZ,
+                suggested_display_precision=2,
+            ),
+        ),
+        CommandsSentSensor(
+            coordinator,
+            entity_description=SensorEntityDescription(
+                key="commands_sent",
+                name="Commands Sent",
+                state_class=SensorStateClass.TOTAL_INCREASING,
+                entity_category=EntityCategory.DIAGNOSTIC,
+            ),
+        ),
+        CommandsSkippedSensor(
+            coordinator,
+            entity_description=SensorEntityDescription(
+                key="commands_skipped",
+                name="Commands Skipped",
+                state_class=SensorStateClass.TOTAL_INCREASING,
+                entity_category=EntityCategory.DIAGNOSTIC,
+            ),
+        ),
+        CommandQueueDepthSensor(
+            coordinator,
+            entity_description=SensorEntityDescription(
+                key="command_queue_depth",
+                name="Command Queue Depth",
+                state_class=SensorStateClass.MEASUREMENT,
+                entity_category=EntityCategory.DIAGNOSTIC,
+            ),
+        ),
+        CommandsSupersededSensor(
+            coordinator,
+            entity_description=SensorEntityDescription(
+                key="commands_superseded",
+                name="Commands Superseded",
+                state_class=SensorStateClass.TOTAL_INCREASING,
+                entity_category=EntityCategory.DIAGNOSTIC,
+            ),
+        ),
+        CommandLatencySensor(
+            coordinator,
+            entity_description=SensorEntityDescription(
+                key="command_latency",
+                name="Command Latency",
+                device_class=SensorDeviceClass.DURATION,
+                state_class=SensorStateClass.MEASUREMENT,
+                entity_category=EntityCategory.DIAGNOSTIC,
+                native_unit_of_measurement=UnitOfTime.SECONDS,
+                suggested_display_precision=2,
+            ),
+        ),
     ]
+    entities.extend(
+        StageTimingSensor(
+            coordinator,
+            entity_description=SensorEntityDescription(
+                key=f"timing_{stage}",
+                name=f"Timing {stage.capitalize()}",
+                device_class=SensorDeviceClass.DURATION,
+                state_class=SensorStateClass.MEASUREMENT,
+                entity_category=EntityCategory.DIAGNOSTIC,
+                entity_registry_enabled_default=False,
+                native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+                suggested_display_precision=3,
+            ),
+            stage=stage,
+        )
+        for stage in STAGES
+    )
 
     async_add_entities(entities)
     return True
 
 
-class BaseSensor(SensorEntity):
-    """Base class for sensor entity."""
+class BaseSensor(CoordinatorEntity[EvLoadBalancingCoordinator], SensorEntity):
+    """Base class for sensor entity.
+
+    States are written when the coordinator publishes, which it does at most
+    once per publish interval for all its sensors together.
+    """
 
     def __init__(
         self,
@@ -60,24 +149,14 @@ class BaseSensor(SensorEntity):
         entity_description: SensorEntityDescription,
     ) -> None:
         """Initialize the entity."""
-        # super().__init__(planner)
-        self._coordinator = coordinator
+        super().__init__(coordinator)
         self.entity_description = entity_description
         self._attr_device_info = coordinator.get_device_info()
-        self._attr_name = self._coordinator.name + " " + entity_description.name
+        self._attr_name = coordinator.name + " " + entity_description.name
         self._attr_unique_id = (
             (DOMAIN + "_" + self._attr_name).lower().replace(".", "").replace(" ", "_")
         )
 
-    async def async_added_to_hass(self) -> None:
-        """Load the last known state when added to hass."""
-        await super().async_added_to_hass()
-        self._coordinator.register_output_listener_entity(self.update_callback)
-
-    def update_callback(self) -> None:
-        """Call from planner that new data available."""
-        self.schedule_update_ha_state()
-
 
 class LastUpdateSensor(BaseSensor):
     """State sensor."""
@@ -88,8 +167,8 @@ class LastUpdateSensor(BaseSensor):
     def native_value(self):
         """Output state."""
         state = None
-        if self._coordinator.last_update is not None:
-            state = self._coordinator.last_update
+        if self.coordinator.last_update is not None:
+            state = self.coordinator.last_update
         _LOGGER.debug(
             'Returning state "%s" of sensor "%s"',
             state,
@@ -109,20 +188,133 @@ class UpdateAgeSensor(BaseSensor):
     def native_value(self):
         """Output state."""
         state = None
-        if self._coordinator.last_update is not None:
+        if self.coordinator.last_update is not None:
             if self._last_update is not None:
                 delta = int(
-                    (self._coordinator.last_update - self._last_update).total_seconds()
+                    (self.coordinator.last_update - self._last_update).total_seconds()
                 )
                 if delta != 0:
                     state = delta
                     self._last_value = delta
                 else:
                     state = self._last_value
-            self._last_update = self._coordinator.last_update
+            self._last_update = self.coordinator.last_update
         _LOGGER.debug(
             'Returning state "%s" of sensor "%s"',
             state,
             self.unique_id,
         )
         return state
+
+
+class UpdateRateSensor(BaseSensor):
+    """State sensor."""
+
+    _attr_icon = "mdi:speedometer"
+
+    @property
+    def native_value(self):
+        """Output state."""
+        return self.coordinator.update_rate
+
+    @property
+    def extra_state_attributes(self):
+        """Extra state attributes."""
+        return {"cooldown": 1 / self.coordinator.update_rate}
+
+
+class CommandsSentSensor(BaseSensor):
+    """State sensor."""
+
+    _attr_icon = "mdi:send-check"
+
+    @property
+    def native_value(self):
+        """Output state."""
+        return self.coordinator.commands_sent
+
+
+class CommandsSkippedSensor(BaseSensor):
+    """State sensor."""
+
+    _attr_icon = "mdi:send-lock"
+
+    @property
+    def native_value(self):
+        """Output state."""
+        return self.coordinator.commands_skipped
+
+
+class CommandQueueDepthSensor(BaseSensor):
+    """State sensor."""
+
+    _attr_icon = "mdi:tray-full"
+
+    @property
+    def native_value(self):
+        """Output state."""
+        return self.coordinator.command_queue_depth
+
+
+class CommandsSupersededSensor(BaseSensor):
+    """State sensor."""
+
+    _attr_icon = "mdi:send-clock"
+
+    @property
+    def native_value(self):
+        """Output state."""
+        return self.coordinator.commands_superseded
+
+
+class CommandLatencySensor(BaseSensor):
+    """State sensor."""
+
+    _attr_icon = "mdi:timer-sand"
+
+    @property
+    def native_value(self):
+        """Output state."""
+        return self.coordinator.command_latency
+
+
+class StageTimingSensor(BaseSensor):
+    """Timing sensor, only times update stages while enabled."""
+
+    _attr_icon = "mdi:timer-outline"
+
+    def __init__(
+        self,
+        coordinator: EvLoadBalancingCoordinator,
+        entity_description: SensorEntityDescription,
+        stage: str,
+    ) -> None:
+        """Initialize the entity."""
+        super().__init__(coordinator, entity_description)
+        self._stage = stage
+
+    async def async_added_to_hass(self) -> None:
+        """Start timing when added to hass."""
+        await super().async_added_to_hass()
+        self.coordinator.enable_timings()
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop timing when removed from hass."""
+        self.coordinator.disable_timings()
+        await super().async_will_remove_from_hass()
+
+    @property
+    def native_value(self):
+        """Output state, 95th percentile of stage duration."""
+        summary = self._summary()
+        return summary["p95"] if summary is not None else None
+
+    @property
+    def extra_state_attributes(self):
+        """Extra state attributes."""
+        return self._summary()
+
+    def _summary(self) -> dict[str, float | int] | None:
+        """Get timing summary of stage."""
+        timings = self.coordinator.timings
+        return timings.summary(self._stage) if timings is not None else None
@@ -0,0 +1,390 @@
+"""Common test helpers."""
+
+import asyncio
+import itertools
+import json
+import random
+import socket
+import struct
+from typing import Any
+
+import aiohttp
+import aiohttp.abc
+from custom_components.ev_load_balancing.chargers import (
+    Charger,
+    ChargerPhase,
+    ChargingState,
+)
+from custom_components.ev_load_balancing.const import Phases
+from custom_components.ev_load_balancing.mains import Mains, MainsPhase
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+
+
+def create_device(
+    hass: HomeAssistant,
+    domain: str,
+    name: str,
+    manufacturer: str,
+    object_ids: list[str],
+) -> str:
+    """Create a device with sensor entities in registries, return device id."""
+    config_entry = MockConfigEntry(domain=domain)
+    config_entry.add_to_hass(hass)
+    device = dr.async_get(hass).async_get_or_create(
+        config_entry_id=config_entry.entry_id,
+        identifiers={(domain, name)},
+        manufacturer=manufacturer,
+        name=name,
+    )
+    for object_id in object_ids:
+        er.async_get(hass).async_get_or_create(
+            "sensor",
+            domain,
+            f"{name}_{object_id}",
+            suggested_object_id=object_id,
+            config_entry=config_entry,
+            device_id=device.id,
+        )
+    return device.id
+
+
+def create_slimmelezer(hass: HomeAssistant, name: str = "slimmelezer") -> str:
+    """Create a Slimmelezer device with phase current sensors."""
+    return create_device(
+        hass,
+        "esphome",
+        name,
+        "Zuidwijk",
+        [f"{name}_current_phase_{i}" for i in (1, 2, 3)],
+    )
+
+
+class FakeMainsPhase(MainsPhase):
+    """Mains phase with values set directly by test."""
+
+    def __init__(self, name: str, current: float = 0.0, stddev: float = 0.0) -> None:
+        """Initialize object."""
+        self._name = name
+        self.current = current
+        self.stddev = stddev
+
+    def actual_current(self) -> float:
+        """Get actual current on phase."""
+        return self.current
+
+    def stddev_current(self) -> float:
+        """Get standard deviation of current on phase."""
+        return self.stddev
+
+    @property
+    def name(self) -> str:
+        """Get friendly name of phase."""
+        return self._name
+
+
+class FakeMains(Mains):
+    """Mains with values set directly by test."""
+
+    def __init__(
+        self, hass: HomeAssistant, update_callback, limit: int = 20, device_id="mains"
+    ) -> None:
+        """Initialize object."""
+        super().__init__(hass, update_callback)
+        self._limit = limit
+        self._id = device_id
+        self.phases = {p: FakeMainsPhase(f"Mains {p.name}") for p in Phases}
+
+    def get_phase(self, phase: Phases) -> MainsPhase:
+        """Return phase X data."""
+        return self.phases[phase]
+
+    def get_rated_limit(self) -> int:
+        """Return main limit per phase."""
+        return self._limit
+
+    def update(self) -> None:
+        """Update measurements."""
+
+    def cleanup(self) -> None:
+        """Cleanup event listeners etc."""
+
+    @property
+    def device_id(self) -> str:
+        """Device id."""
+        return self._id
+
+    @staticmethod
+    def get_schema(selections: dict[str, Any]) -> vol.Schema:
+        """Device config schema."""
+        return vol.Schema({})
+
+    @staticmethod
+    def validate_user_input(hass: HomeAssistant, user_input: dict[str, Any]) -> bool:
+        """Validate the result from config flow step."""
+        return True
+
+
+class FakeChargerPhase(ChargerPhase):
+    """Charger phase with values set directly by test."""
+
+    def __init__(self, name: str, limit: float = 0.0) -> None:
+        """Initialize object."""
+        self._name = name
+        self.limit = limit
+
+    def current_limit(self) -> float:
+        """Get set current limit on phase."""
+        return self.limit
+
+    @property
+    def name(self) -> str:
+        """Get friendly name of phase."""
+        return self._name
+
+
+class FakeCharger(Charger):
+    """Charger recording the limits it is set to."""
+
+    def __init__(
+        self, hass: HomeAssistant, update_callback, limit: int = 16, device_id="charger"
+    ) -> None:
+        """Initialize object."""
+        super().__init__(hass, update_callback)
+        self._limit = limit
+        self._id = device_id
+        self.state = ChargingState.CHARGING
+        self.phases = {p: FakeChargerPhase(f"Charger {p.name}") for p in Phases}
+        self.commands: list[tuple[float, float, float]] = []
+
+    async def async_set_limits(
+        self, phase1: float, phase2: float, phase3: float
+    ) -> bool:
+        """Set charger limits."""
+        self.commands.append((phase1, phase2, phase3))
+        for phase, limit in zip(Phases, (phase1, phase2, phase3), strict=True):
+            self.phases[phase].limit = limit
+        return True
+
+    def update(self) -> None:
+        """Update measurements."""
+
+    def cleanup(self) -> None:
+        """Cleanup event listeners etc."""
+
+    @property
+    def charging_state(self) -> ChargingState:
+        """Return charging state."""
+        return self.state
+
+    def get_phase(self, phase: Phases) -> ChargerPhase:
+        """Return phase X data."""
+        return self.phases[phase]
+
+    def get_rated_limit(self) -> int:
+        """Return charger limit per phase."""
+        return self._limit
+
+    @property
+    def device_id(self) -> str:
+        """Device id."""
+        return self._id
+
+    @staticmethod
+    def get_schema(selections: dict[str, Any]) -> vol.Schema:
+        """Device config schema."""
+        return vol.Schema({})
+
+    @staticmethod
+    def validate_user_input(hass: HomeAssistant, user_input: dict[str, Any]) -> bool:
+        """Validate the result from config flow step."""
+        return True
+
+
+class SimulatedCharger(FakeCharger):
+    """Charger wired to mains phases, with a meter reporting noisy currents."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        mains_entities: list[str],
+        wiring: dict[Phases, Phases],
+        base: tuple[float, float, float] = (3.0, 2.5, 4.0),
+        noise: float = 0.2,
+        delay: float = 0.02,
+        interval: float = 0.005,
+    ) -> None:
+        """Initialize object, wiring maps charger phase to mains phase."""
+        super().__init__(hass, None)
+        self._mains_entities = mains_entities
+        self._wiring = wiring
+        self._base = base
+        self._noise = noise
+        self._delay = delay
+        self._interval = interval
+        self._draw = [0.0, 0.0, 0.0]
+        self._random = random.Random(1)
+        self._meter: asyncio.Task | None = None
+
+    async def async_set_limits(
+        self, phase1: float, phase2: float, phase3: float
+    ) -> bool:
+        """Set charger limits, the car follows after a delay."""
+        await super().async_set_limits(phase1, phase2, phase3)
+        self._hass.loop.call_later(
+            self._delay, self._set_draw, [phase1, phase2, phase3]
+        )
+        return True
+
+    def _set_draw(self, limits: list[float]) -> None:
+        """Let the car draw the set limits on the wired mains phases."""
+        for c_phase, m_phase in self._wiring.items():
+            self._draw[m_phase.value] = limits[c_phase.value]
+
+    def start(self) -> None:
+        """Start reporting mains currents."""
+        self._meter = self._hass.async_create_background_task(
+            self._async_run_meter(), "simulated meter"
+        )
+
+    async def stop(self) -> None:
+        """Stop reporting mains currents."""
+        self._meter.cancel()
+        await asyncio.gather(self._meter, return_exceptions=True)
+
+    async def _async_run_meter(self) -> None:
+        """Report all mains phases every interval."""
+        while True:
+            await asyncio.sleep(self._interval)
+            for i, entity_id in enumerate(self._mains_entities):
+                value = self._base[i] + self._draw[i]
+                value += self._random.gauss(0, self._noise)
+                self._hass.states.async_set(entity_id, f"{value:.2f}")
+
+
+class ModbusServerStandIn:
+    """Modbus TCP server answering input register reads from a register map."""
+
+    def __init__(self) -> None:
+        """Initialize object."""
+        self.registers: dict[int, int] = {}
+        self.requests: list[tuple[int, int, int]] = []
+        self.connections = 0
+        # Length field sent instead of the actual one, for malformed frames
+        self.response_length: int | None = None
+        self._server: asyncio.Server | None = None
+
+    def set_float32(self, address: int, values: list[float]) -> None:
+        """Store floats, high word first, from address on."""
+        data = struct.pack(f">{len(values)}f", *values)
+        for i, word in enumerate(struct.unpack(f">{len(values) * 2}H", data)):
+            self.registers[address + i] = word
+
+    async def async_start(self) -> int:
+        """Start listening on a free local port, return it."""
+        self._server = await asyncio.start_server(self._async_serve, "127.0.0.1", 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def async_stop(self) -> None:
+        """Stop listening."""
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _async_serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answer requests of one connection."""
+        self.connections += 1
+        try:
+            while True:
+                header = await reader.readexactly(7)
+                transaction, _, length, unit = struct.unpack(">HHHB", header)
+                function, address, count = struct.unpack(
+                    ">BHH", await reader.readexactly(length - 1)
+                )
+                self.requests.append((unit, address, count))
+                words = [self.registers.get(address + i, 0) for i in range(count)]
+                pdu = struct.pack(f">BB{count}H", function, 2 * count, *words)
+                length = len(pdu) + 1
+                if self.response_length is not None:
+                    length = self.response_length
+                writer.write(struct.pack(">HHHB", transaction, 0, length, unit) + pdu)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class LocalResolver(aiohttp.abc.AbstractResolver):
+    """Resolver of IP addresses only, without the threads of a DNS resolver."""
+
+    async def resolve(
+        self, host: str, port: int = 0, family: int = socket.AF_INET
+    ) -> list[dict[str, Any]]:
+        """Return address as is."""
+        return [
+            {
+                "hostname": host,
+                "host": host,
+                "port": port,
+                "family": family,
+                "proto": 0,
+                "flags": socket.AI_NUMERICHOST,
+            }
+        ]
+
+    async def close(self) -> None:
+        """Nothing to close."""
+
+
+class SimulatedChargePoint:
+    """OCPP 1.6J charge point answering charging profiles with `status`."""
+
+    def __init__(self, charge_point_id: str) -> None:
+        """Initialize object."""
+        self.charge_point_id = charge_point_id
+        self.profiles: list[dict[str, Any]] = []
+        self.status = "Accepted"
+        self._ids = itertools.count(1)
+        self._results: dict[str, asyncio.Future] = {}
+        self._session: aiohttp.ClientSession | None = None
+        self._ws: aiohttp.ClientWebSocketResponse | None = None
+        self._receiver: asyncio.Task | None = None
+
+    async def async_connect(self, port: int) -> None:
+        """Connect to central system on local port."""
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(resolver=LocalResolver())
+        )
+        self._ws = await self._session.ws_connect(
+            f"ws://127.0.0.1:{port}/{self.charge_point_id}", protocols=("ocpp1.6",)
+        )
+        self._receiver = asyncio.create_task(self._async_receive())
+
+    async def async_disconnect(self) -> None:
+        """Close connection."""
+        await self._ws.close()
+        await self._receiver
+        await self._session.close()
+
+    async def async_call(self, action: str, payload: dict[str, Any]) -> Any:
+        """Send call to central system, get its result."""
+        unique_id = f"cp-{next(self._ids)}"
+        future = self._results[unique_id] = asyncio.get_running_loop().create_future()
+        await self._ws.send_json([2, unique_id, action, payload])
+        return await future
+
+    async def _async_receive(self) -> None:
+        """Answer calls of central system and pass on results."""
+        async for msg in self._ws:
+            message = json.loads(msg.data)
+            if message[0] == 2:
+                if message[2] == "SetChargingProfile":
+                    self.profiles.append(message[3])
+                await self._ws.send_json([3, message[1], {"status": self.status}])
+            else:
+                self._results.pop(message[1]).set_result(message[2])
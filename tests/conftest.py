@@ -3,6 +3,25 @@
 import pytest
 
 
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add option to run benchmarks."""
+    parser.addoption(
+        "--run-benchmarks", action="store_true", help="run timing benchmarks"
+    )
+
+
+def pytest_collection_modifyitems(
+    config: pytest.Config, items: list[pytest.Item]
+) -> None:
+    """Skip benchmarks unless asked for, timings are unreliable on loaded runners."""
+    if config.getoption("--run-benchmarks"):
+        return
+    skip = pytest.mark.skip(reason="benchmark, run with --run-benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
 @pytest.fixture(autouse=True)
 def auto_enable_custom_integrations(enable_custom_integrations):
     """Enable custom integrations."""
@@ -0,0 +1,336 @@
+"""Replay of recorded state changes through the coordinator on a virtual clock."""
+
+import csv
+from dataclasses import dataclass, field
+from datetime import timedelta
+import json
+from pathlib import Path
+import statistics
+import time
+from typing import Any
+from unittest import mock
+
+from custom_components.ev_load_balancing import EvLoadBalancingCoordinator
+from custom_components.ev_load_balancing.chargers import easee
+from custom_components.ev_load_balancing.const import DOMAIN, MIN_CHARGING_CURRENT
+from freezegun.api import FrozenDateTimeFactory
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from homeassistant.const import ATTR_NAME
+from homeassistant.core import HomeAssistant, ServiceCall
+
+from .common import create_device
+
+TRACES = Path(__file__).parent / "traces"
+
+MAINS_ENTITIES = ("sensor.mains_l1", "sensor.mains_l2", "sensor.mains_l3")
+STATUS_ENTITY = "sensor.easee_status"
+LIMIT_ENTITY = "sensor.easee_dynamic_circuit_limit"
+LIMIT_ATTRIBUTES = (
+    "state_dynamicCircuitCurrentP1",
+    "state_dynamicCircuitCurrentP2",
+    "state_dynamicCircuitCurrentP3",
+)
+
+
+@dataclass
+class TraceEvent:
+    """One recorded state change."""
+
+    t: float
+    entity_id: str
+    state: str
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+
+def load_trace(path: Path) -> list[TraceEvent]:
+    """Load trace from JSONL, or CSV with columns t, entity_id, state."""
+    with path.open(encoding="utf-8") as file:
+        if path.suffix == ".csv":
+            rows = list(csv.DictReader(file))
+        else:
+            rows = [json.loads(line) for line in file if line.strip()]
+    events = [
+        TraceEvent(
+            float(row["t"]),
+            row["entity_id"],
+            str(row["state"]),
+            row.get("attributes") or {},
+        )
+        for row in rows
+    ]
+    return sorted(events, key=lambda event: event.t)
+
+
+@dataclass
+class ReplayReport:
+    """Metrics of one replay."""
+
+    duration: float
+    cpu_time: float
+    commands: int = 0
+    service_calls: int = 0
+    latencies: list[float] = field(default_factory=list)
+    overload_seconds: float = 0.0
+    overshoot_ah: float = 0.0
+    delivered_ah: float = 0.0
+    headroom: list[float] = field(default_factory=list)
+
+    @property
+    def commands_per_second(self) -> float:
+        """Limit commands submitted per virtual second."""
+        return self.commands / self.duration
+
+    @property
+    def speedup(self) -> float:
+        """Virtual seconds replayed per CPU second, as the test clock is frozen."""
+        return self.duration / self.cpu_time
+
+    @property
+    def latency_mean(self) -> float:
+        """Mean time from first unanswered input change to command."""
+        return statistics.fmean(self.latencies) if self.latencies else 0.0
+
+    @property
+    def latency_max(self) -> float:
+        """Max time from first unanswered input change to command."""
+        return max(self.latencies, default=0.0)
+
+    @property
+    def headroom_mean(self) -> float:
+        """Mean current per phase the charger could have used but did not."""
+        return statistics.fmean(self.headroom) if self.headroom else 0.0
+
+    def __str__(self) -> str:
+        """Summary for benchmark output."""
+        return (
+            f"{self.duration:.0f} s replayed at {self.speedup:.0f}x: "
+            f"{self.commands_per_second:.2f} commands/s, "
+            f"{self.service_calls} service calls, "
+            f"latency mean {self.latency_mean:.2f} s max {self.latency_max:.2f} s, "
+            f"overload {self.overload_seconds:.1f} s, "
+            f"overshoot {self.overshoot_ah:.3f} Ah, "
+            f"delivered {self.delivered_ah:.2f} Ah, "
+            f"unused headroom {self.headroom_mean:.2f} A"
+        )
+
+
+class ReplayHarness:
+    """Run a coordinator with template mains and Easee charger against a trace.
+
+    Mains values in the trace are the household load without the charger. The
+    harness adds what the car draws, which follows each command after
+    `response_delay` seconds, so the loop is closed like in a real install.
+    Time is advanced in `tick` steps with the frozen clock of the test.
+    Commands are rate limited like for an Easee account, unless another
+    `command_rate` per second is given.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        freezer: FrozenDateTimeFactory,
+        mains_limit: float = 25,
+        charger_limit: float = 16,
+        response_delay: float = 2.0,
+        tick: float = 0.1,
+        options: dict[str, Any] | None = None,
+        command_rate: float | None = None,
+    ) -> None:
+        """Initialize object."""
+        self._hass = hass
+        self._freezer = freezer
+        self._mains_limit = mains_limit
+        self._charger_limit = charger_limit
+        self._response_delay = response_delay
+        self._tick = tick
+        self._options = options or {}
+        self._command_rate = command_rate or easee.COMMAND_RATE
+        self.coordinator: EvLoadBalancingCoordinator | None = None
+
+        self._now = 0.0
+        self._house = [0.0, 0.0, 0.0]
+        self._draw = [0.0, 0.0, 0.0]
+        self._limits = [0.0, 0.0, 0.0]
+        self._pending_draw: list[tuple[float, list[float]]] = []
+        self._unanswered: float | None = None
+        self._report: ReplayReport | None = None
+
+    async def async_setup(self) -> EvLoadBalancingCoordinator:
+        """Create entities, service and coordinator."""
+        device_id = create_device(
+            self._hass,
+            "easee",
+            "easee",
+            "Easee",
+            ["easee_status", "easee_dynamic_circuit_limit"],
+        )
+        self._hass.states.async_set(STATUS_ENTITY, "disconnected")
+        self._set_limit_state()
+        for entity_id in MAINS_ENTITIES:
+            self._hass.states.async_set(entity_id, "0.0")
+        self._hass.services.async_register(
+            "easee", "set_circuit_dynamic_limit", self._async_service
+        )
+
+        config_entry = MockConfigEntry(
+            domain=DOMAIN,
+            data={
+                ATTR_NAME: "Replay",
+                "mains_type": "template",
+                "charger_type": "easee",
+                "developer_mode": False,
+            },
+            options={
+                "mains": {
+                    "mains_phase1": "{{ states('sensor.mains_l1') | float(0) }}",
+                    "mains_phase2": "{{ states('sensor.mains_l2') | float(0) }}",
+                    "mains_phase3": "{{ states('sensor.mains_l3') | float(0) }}",
+                    "mains_limit": self._mains_limit,
+                    **self._options.get("mains", {}),
+                },
+                "charger": {
+                    "device_id": device_id,
+                    "charger_expires": 10,
+                    "phase_auto_matching": False,
+                    **self._options.get("charger", {}),
+                },
+                "phases": {
+                    "mains_phase1": "PHASE1",
+                    "mains_phase2": "PHASE2",
+                    "mains_phase3": "PHASE3",
+                    "charger_phase1": "PHASE1",
+                    "charger_phase2": "PHASE2",
+                    "charger_phase3": "PHASE3",
+                },
+            },
+        )
+        config_entry.add_to_hass(self._hass)
+        with mock.patch.object(easee, "COMMAND_RATE", self._command_rate):
+            self.coordinator = EvLoadBalancingCoordinator(self._hass, config_entry)
+        await self.coordinator._async_setup_method()
+        return self.coordinator
+
+    async def async_shutdown(self) -> None:
+        """Stop coordinator and let pending timers run out."""
+        await self.coordinator.async_shutdown()
+        for _ in range(2):
+            self._freezer.tick(timedelta(seconds=60))
+            async_fire_time_changed(self._hass)
+            await self._hass.async_block_till_done()
+
+    async def async_replay(self, trace: list[TraceEvent]) -> ReplayReport:
+        """Replay trace, return metrics."""
+        duration = trace[-1].t - trace[0].t if trace else 0.0
+        self._now = trace[0].t if trace else 0.0
+        report = self._report = ReplayReport(
+            duration=max(duration, self._tick), cpu_time=0.0
+        )
+        commands = self._commands()
+        start = time.process_time()
+        for event in trace:
+            await self._async_advance(event.t)
+            if event.entity_id in MAINS_ENTITIES:
+                self._house[MAINS_ENTITIES.index(event.entity_id)] = float(event.state)
+                self._set_mains_state(event.entity_id)
+            else:
+                self._hass.states.async_set(
+                    event.entity_id, event.state, event.attributes
+                )
+            if self._unanswered is None:
+                self._unanswered = self._now
+            await self._hass.async_block_till_done()
+        report.cpu_time = time.process_time() - start
+        report.commands = self._commands() - commands
+        self._report = None
+        return report
+
+    async def _async_advance(self, until: float) -> None:
+        """Step virtual clock, firing due timers and integrating metrics."""
+        while self._now + self._tick <= until:
+            self._now += self._tick
+            self._freezer.tick(timedelta(seconds=self._tick))
+            async_fire_time_changed(self._hass)
+            await self._hass.async_block_till_done()
+            self._apply_pending_draw()
+            self._measure(self._tick)
+
+    @property
+    def _car_draw(self) -> list[float]:
+        """Current drawn by the car, nothing when not charging."""
+        if self._hass.states.get(STATUS_ENTITY).state != "charging":
+            return [0.0, 0.0, 0.0]
+        return self._draw
+
+    def _apply_pending_draw(self) -> None:
+        """Let the car follow commands after its response delay."""
+        while self._pending_draw and self._pending_draw[0][0] <= self._now:
+            _, self._draw = self._pending_draw.pop(0)
+
+    def _measure(self, dt: float) -> None:
+        """Integrate overload, delivered current and unused headroom."""
+        draw = self._car_draw
+        load = [house + value for house, value in zip(self._house, draw, strict=True)]
+        if any(value > self._mains_limit for value in load):
+            self._report.overload_seconds += dt
+        self._report.overshoot_ah += (
+            sum(max(value - self._mains_limit, 0.0) for value in load) * dt / 3600
+        )
+        self._report.delivered_ah += sum(draw) * dt / 3600
+        if self._hass.states.get(STATUS_ENTITY).state == "charging":
+            self._report.headroom.append(
+                statistics.fmean(
+                    max(min(self._mains_limit - value, self._charger_limit - draw), 0)
+                    for value, draw in zip(load, self._draw, strict=True)
+                )
+            )
+
+    def _set_mains_state(self, entity_id: str) -> None:
+        """Write mains entity as household load plus car draw."""
+        phase = MAINS_ENTITIES.index(entity_id)
+        self._hass.states.async_set(
+            entity_id, f"{self._house[phase] + self._car_draw[phase]:.2f}"
+        )
+
+    def _set_limit_state(self) -> None:
+        """Write charger limit entity as the Easee integration would."""
+        self._hass.states.async_set(
+            LIMIT_ENTITY,
+            str(max(self._limits)),
+            {
+                "circuit_ratedCurrent": self._charger_limit,
+                **dict(zip(LIMIT_ATTRIBUTES, self._limits)),
+            },
+        )
+
+    def _commands(self) -> int:
+        """Count commands submitted, each one is sent, skipped or superseded."""
+        return (
+            self.coordinator.commands_sent
+            + self.coordinator.commands_skipped
+            + self.coordinator.commands_superseded
+        )
+
+    async def _async_service(self, call: ServiceCall) -> None:
+        """Handle limit command like an Easee charger.
+
+        Limits are clipped to the rated current, and the car pauses on phases
+        below the minimum charging current.
+        """
+        self._limits = [
+            min(max(float(call.data[key]), 0.0), self._charger_limit)
+            for key in ("current_p1", "current_p2", "current_p3")
+        ]
+        draw = [
+            limit if limit >= MIN_CHARGING_CURRENT else 0.0 for limit in self._limits
+        ]
+        self._pending_draw.append((self._now + self._response_delay, draw))
+        self._set_limit_state()
+        if self._report is not None:
+            self._report.service_calls += 1
+            if self._unanswered is not None:
+                self._report.latencies.append(self._now - self._unanswered)
+        self._unanswered = None
@@ -0,0 +1,185 @@
+"""allocation tests."""
+
+import time
+from unittest import mock
+
+from custom_components.ev_load_balancing import EvLoadBalancingCoordinator
+from custom_components.ev_load_balancing.allocation import (
+    DATA_ALLOCATION_GROUPS,
+    allocate_current,
+    get_allocation_group,
+)
+from custom_components.ev_load_balancing.const import (
+    CONF_CHARGER,
+    CONF_CHARGER_PRIORITY,
+    CONF_MAINS,
+    CONF_MAINS_SHARED,
+    DOMAIN,
+    Phases,
+)
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import UpdateFailed
+
+from .common import FakeCharger, FakeMains
+from .test_coordinator import CONF_ENTRY
+from .test_init import create_template_entry
+
+
+def test_allocate_fair_share() -> None:
+    """Test that equal priorities share and unused capacity is redistributed."""
+    assert allocate_current([30], [(0, 16), (0, 16)]) == [[15], [15]]
+    assert allocate_current([30], [(0, 10), (0, 32), (0, 32)]) == [[10], [10], [10]]
+    assert allocate_current([40], [(0, 8), (0, 32), (0, 32)]) == [[8], [16], [16]]
+
+
+def test_allocate_priority_and_minimum() -> None:
+    """Test that higher priority is served first and shares below 6 A are dropped."""
+    assert allocate_current([20], [(0, 16), (1, 16)]) == [[0], [16]]
+    assert allocate_current([24], [(0, 16), (1, 16)]) == [[8], [16]]
+    assert allocate_current([11], [(0, 16), (0, 16)]) == [[11], [0]]
+    assert allocate_current([-5], [(0, 16), (0, 16)]) == [[0], [0]]
+
+
+def test_allocate_minimum_on_all_phases() -> None:
+    """Test that a charger gets the minimum on all phases or on none."""
+    assert allocate_current([20, 4, 20], [(0, 16)]) == [[0, 0, 0]]
+    assert allocate_current([20, 13, 30], [(0, 16), (0, 16)]) == [
+        [10, 6.5, 15],
+        [10, 6.5, 15],
+    ]
+    assert allocate_current([20, 11, 30], [(0, 16), (0, 16)]) == [
+        [16, 11, 16],
+        [0, 0, 0],
+    ]
+
+
+@pytest.mark.benchmark
+def test_allocate_benchmark() -> None:
+    """Benchmark a solver pass for many chargers."""
+    demands = [(i % 3, 16) for i in range(50)]
+    start = time.perf_counter()
+    for _ in range(100):
+        allocate_current([200, 200, 200], demands)
+    elapsed = (time.perf_counter() - start) / 100
+    assert elapsed < 0.005, f"allocation of 50 chargers: {elapsed * 1e6:.0f} us"
+
+
+@pytest.mark.asyncio
+async def test_allocation_group(hass: HomeAssistant) -> None:
+    """Test that chargers sharing mains are allocated in one batched pass."""
+    count = 20
+    mains = FakeMains(hass, None, limit=63)
+    chargers = []
+    coordinators = []
+    for i in range(count):
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            data=CONF_ENTRY.data,
+            options={
+                **CONF_ENTRY.options,
+                CONF_MAINS: {**CONF_ENTRY.options[CONF_MAINS], CONF_MAINS_SHARED: True},
+                CONF_CHARGER: {
+                    **CONF_ENTRY.options[CONF_CHARGER],
+                    CONF_CHARGER_PRIORITY: 1 if i == 0 else 0,
+                },
+            },
+        )
+        charger = FakeCharger(hass, None, limit=16, device_id=f"charger_{i}")
+        with (
+            mock.patch(
+                "custom_components.ev_load_balancing.coordinator.get_mains",
+                return_value=mains,
+            ),
+            mock.patch(
+                "custom_components.ev_load_balancing.coordinator.get_charger",
+                return_value=charger,
+            ),
+        ):
+            coordinator = EvLoadBalancingCoordinator(hass, entry)
+        await coordinator._async_setup_method()
+        chargers.append(charger)
+        coordinators.append(coordinator)
+
+    group = get_allocation_group(hass, mains.device_id)
+    assert len(group.members) == count
+
+    for phase in Phases:
+        mains.phases[phase].current = 3.0
+    await group._async_allocate()
+
+    # 60 A spare: priority charger gets 16 A, 44 A are left for 19 chargers,
+    # which is only enough for 7 chargers at the 6 A minimum
+    assert all(len(charger.commands) == 1 for charger in chargers)
+    assert chargers[0].commands[0] == (16.0, 16.0, 16.0)
+    charging = [c for c in chargers[1:] if c.commands[0][0] > 0]
+    assert len(charging) == 7
+    assert sum(c.commands[0][0] for c in chargers) <= 60
+
+    for coordinator in coordinators:
+        coordinator.cleanup()
+    assert not group.members
+
+
+@pytest.mark.asyncio
+async def test_allocation_group_overload(hass: HomeAssistant) -> None:
+    """Test that an overload allocates at once, without the group cooldown."""
+    mains = FakeMains(hass, None, limit=25)
+    charger = FakeCharger(hass, None, limit=16)
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data=CONF_ENTRY.data,
+        options={
+            **CONF_ENTRY.options,
+            CONF_MAINS: {**CONF_ENTRY.options[CONF_MAINS], CONF_MAINS_SHARED: True},
+        },
+    )
+    with (
+        mock.patch(
+            "custom_components.ev_load_balancing.coordinator.get_mains",
+            return_value=mains,
+        ),
+        mock.patch(
+            "custom_components.ev_load_balancing.coordinator.get_charger",
+            return_value=charger,
+        ),
+    ):
+        coordinator = EvLoadBalancingCoordinator(hass, entry)
+    await coordinator._async_setup_method()
+    group = get_allocation_group(hass, mains.device_id)
+
+    await group.async_request_allocation()
+    assert not charger.commands
+
+    mains.phases[Phases.PHASE2].current = 30.0
+    await group.async_request_allocation()
+    assert charger.commands == [(0.0, 0.0, 0.0)]
+
+    coordinator.cleanup()
+    await hass.async_block_till_done()
+
+
+@pytest.mark.asyncio
+async def test_allocation_group_failed_first_refresh(hass: HomeAssistant) -> None:
+    """Test that a coordinator failing its first refresh leaves the group."""
+    config_entry = create_template_entry(hass)
+    hass.config_entries.async_update_entry(
+        config_entry,
+        options={
+            **config_entry.options,
+            CONF_MAINS: {**config_entry.options[CONF_MAINS], CONF_MAINS_SHARED: True},
+        },
+    )
+    with mock.patch.object(
+        EvLoadBalancingCoordinator,
+        "_async_update_method",
+        side_effect=UpdateFailed("Charger not responding"),
+    ):
+        assert not await hass.config_entries.async_setup(config_entry.entry_id)
+    assert config_entry.state is ConfigEntryState.SETUP_RETRY
+    assert not hass.data.get(DATA_ALLOCATION_GROUPS)
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
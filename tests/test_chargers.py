@@ -0,0 +1,256 @@
+"""charger tests."""
+
+from datetime import timedelta
+import socket
+import time
+
+from custom_components.ev_load_balancing.chargers import ChargingState
+from custom_components.ev_load_balancing.chargers.easee import ChargerEasee
+from custom_components.ev_load_balancing.chargers.ocpp import RETRY_DELAY, ChargerOcpp
+from custom_components.ev_load_balancing.chargers.template import ChargerTemplate
+from custom_components.ev_load_balancing.const import (
+    CONF_CHARGER_ACTIVE,
+    CONF_CHARGER_COMMAND,
+    CONF_CHARGER_EXPIRES,
+    CONF_CHARGER_HOST,
+    CONF_CHARGER_ID,
+    CONF_CHARGER_LIMIT,
+    CONF_CHARGER_PHASE1,
+    CONF_CHARGER_PHASE2,
+    CONF_CHARGER_PHASE3,
+    CONF_CHARGER_PORT,
+    CONF_CHARGER_RATED_CURRENT,
+    CONF_DEVICE_ID,
+    Phases,
+)
+from custom_components.ev_load_balancing.helpers.ocpp import DATA_CENTRAL_SYSTEMS
+import pytest
+from pytest_homeassistant_custom_component.common import (
+    async_fire_time_changed,
+    async_mock_service,
+)
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.util import dt as dt_util
+
+from .common import SimulatedChargePoint, create_device
+
+
+def free_port() -> int:
+    """Get a local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("", 0))
+        return sock.getsockname()[1]
+
+
+def meter_values(transaction_id: int, currents: list[float]) -> dict:
+    """MeterValues payload with current per phase."""
+    return {
+        "connectorId": 1,
+        "transactionId": transaction_id,
+        "meterValue": [
+            {
+                "timestamp": "2024-03-15T12:00:00Z",
+                "sampledValue": [
+                    {
+                        "value": str(current),
+                        "measurand": "Current.Import",
+                        "phase": f"L{i + 1}",
+                        "unit": "A",
+                    }
+                    for i, current in enumerate(currents)
+                ],
+            }
+        ],
+    }
+
+
+async def test_easee_charger_in_config_flow(hass: HomeAssistant) -> None:
+    """Test that without update callback limits are sent without rate limit."""
+    device_id = create_device(
+        hass, "easee", "easee", "Easee", ["easee_status", "easee_dynamic_circuit_limit"]
+    )
+    calls = async_mock_service(hass, "easee", "set_circuit_dynamic_limit")
+    charger = ChargerEasee(
+        hass, None, {CONF_DEVICE_ID: device_id, CONF_CHARGER_EXPIRES: 10}
+    )
+    assert await charger.async_set_limits(10.0, 0.0, 0.0)
+    assert len(calls) == 1
+    assert calls[0].data["current_p1"] == 10.0
+    charger.cleanup()
+
+
+async def test_template_charger_shared_template(hass: HomeAssistant) -> None:
+    """Test that a single limit template feeds overall and phase limits."""
+    hass.states.async_set("sensor.limit", "16.0")
+    hass.states.async_set("binary_sensor.charging", "on")
+
+    async def update_callback():
+        pass
+
+    template = "{{ states('sensor.limit') | float }}"
+    charger = ChargerTemplate(
+        hass,
+        update_callback,
+        {
+            CONF_CHARGER_ACTIVE: "{{ is_state('binary_sensor.charging', 'on') }}",
+            CONF_CHARGER_LIMIT: template,
+            CONF_CHARGER_COMMAND: "",
+            CONF_CHARGER_PHASE1: template,
+            CONF_CHARGER_PHASE2: template,
+            CONF_CHARGER_PHASE3: template,
+        },
+    )
+    await hass.async_block_till_done()
+    hass.states.async_set("sensor.limit", "10.0")
+    await hass.async_block_till_done()
+    limits = [charger.get_phase(phase).current_limit() for phase in Phases]
+    assert limits == [10.0] * 3
+    assert charger._limit_value == 10.0
+    assert charger.charging_state is ChargingState.CHARGING
+    charger.cleanup()
+
+
+async def test_ocpp_charger(hass: HomeAssistant, socket_enabled: None) -> None:
+    """Test limits and state exchanged with a simulated charge point."""
+    updates = 0
+
+    async def update_callback():
+        nonlocal updates
+        updates += 1
+
+    options = {
+        CONF_CHARGER_ID: "CP1",
+        CONF_CHARGER_HOST: "127.0.0.1",
+        CONF_CHARGER_PORT: free_port(),
+        CONF_CHARGER_RATED_CURRENT: 16,
+    }
+    assert ChargerOcpp.validate_user_input(hass, options)
+    charger = ChargerOcpp(hass, update_callback, options)
+    assert charger.device_id == options[CONF_DEVICE_ID]
+    assert not await charger.async_set_limits(10, 10, 10)
+
+    await charger._system.async_wait_started()
+    charge_point = SimulatedChargePoint("CP1")
+    await charge_point.async_connect(charger._system.port)
+    boot = await charge_point.async_call(
+        "BootNotification", {"chargePointVendor": "Sim", "chargePointModel": "1"}
+    )
+    assert boot["status"] == "Accepted"
+    # Limits set while disconnected are sent once booted
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert len(charge_point.profiles) == 1
+    period = charge_point.profiles[0]["csChargingProfiles"]["chargingSchedule"]
+    assert period["chargingSchedulePeriod"][0]["limit"] == 10
+
+    await charge_point.async_call(
+        "StatusNotification",
+        {"connectorId": 1, "errorCode": "NoError", "status": "Charging"},
+    )
+    not_before = int(time.time())
+    started = await charge_point.async_call(
+        "StartTransaction",
+        {"connectorId": 1, "idTag": "car", "meterStart": 0, "timestamp": "x"},
+    )
+    await charge_point.async_call(
+        "MeterValues", meter_values(started["transactionId"], [9.8, 10.1, 0.2])
+    )
+    assert updates == 3
+    # Ids are not restarted by a reload
+    assert started["transactionId"] >= not_before
+    assert charger.charging_state is ChargingState.CHARGING
+    assert charger.measured_current(Phases.PHASE2) == 10.1
+
+    start = time.perf_counter()
+    assert await charger.async_set_limits(12.0, 11.0, 13.0)
+    latency = time.perf_counter() - start
+    assert latency < 0.5, f"OCPP limit round trip {latency * 1e3:.1f} ms"
+    profile = charge_point.profiles[-1]
+    assert profile["connectorId"] == 1
+    assert profile["csChargingProfiles"]["chargingProfilePurpose"] == "TxProfile"
+    assert profile["csChargingProfiles"]["transactionId"] == started["transactionId"]
+    period = profile["csChargingProfiles"]["chargingSchedule"]["chargingSchedulePeriod"]
+    assert period[0]["limit"] == 11.0
+    assert charger.get_phase(Phases.PHASE3).current_limit() == 11.0
+
+    await charge_point.async_call(
+        "StopTransaction",
+        {"transactionId": started["transactionId"], "meterStop": 5, "timestamp": "x"},
+    )
+    assert await charger.async_set_limits(16.0, 16.0, 16.0)
+    profile = charge_point.profiles[-1]
+    assert profile["connectorId"] == 0
+    assert (
+        profile["csChargingProfiles"]["chargingProfilePurpose"]
+        == "ChargePointMaxProfile"
+    )
+
+    await charge_point.async_disconnect()
+    await charger.async_cleanup()
+    assert not hass.data[DATA_CENTRAL_SYSTEMS]
+
+    # Port is free again right away, for the charger after a reload
+    charger = ChargerOcpp(hass, update_callback, options)
+    await charger._system.async_wait_started()
+    assert charger._system.port == options[CONF_CHARGER_PORT]
+    await charger.async_cleanup()
+
+
+async def test_ocpp_charger_port_taken(
+    hass: HomeAssistant, socket_enabled: None
+) -> None:
+    """Test that setup is retried when the port is listened on already."""
+
+    async def update_callback():
+        pass
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.listen()
+        options = {
+            CONF_CHARGER_ID: "CP1",
+            CONF_CHARGER_HOST: "127.0.0.1",
+            CONF_CHARGER_PORT: sock.getsockname()[1],
+            CONF_CHARGER_RATED_CURRENT: 16,
+        }
+        charger = ChargerOcpp(hass, update_callback, options)
+        with pytest.raises(ConfigEntryNotReady):
+            await charger.async_setup()
+        await charger.async_cleanup()
+    assert not hass.data[DATA_CENTRAL_SYSTEMS]
+
+
+async def test_ocpp_charger_retries_limits(
+    hass: HomeAssistant, socket_enabled: None
+) -> None:
+    """Test that limits the charge point rejects are sent again."""
+
+    async def update_callback():
+        pass
+
+    options = {
+        CONF_CHARGER_ID: "CP1",
+        CONF_CHARGER_PORT: free_port(),
+        CONF_CHARGER_RATED_CURRENT: 16,
+    }
+    assert ChargerOcpp.validate_user_input(hass, options)
+    charger = ChargerOcpp(hass, update_callback, options)
+    await charger._system.async_wait_started()
+    charge_point = SimulatedChargePoint("CP1")
+    await charge_point.async_connect(charger._system.port)
+    await charge_point.async_call(
+        "BootNotification", {"chargePointVendor": "Sim", "chargePointModel": "1"}
+    )
+
+    charge_point.status = "Rejected"
+    assert not await charger.async_set_limits(8.0, 8.0, 8.0)
+    assert charger.get_phase(Phases.PHASE1).current_limit() == 16
+    charge_point.status = "Accepted"
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=RETRY_DELAY))
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert len(charge_point.profiles) == 2
+    assert charger.get_phase(Phases.PHASE1).current_limit() == 8.0
+
+    await charge_point.async_disconnect()
+    await charger.async_cleanup()
@@ -5,6 +5,7 @@ from unittest import mock
 from custom_components.ev_load_balancing import config_flow
 from custom_components.ev_load_balancing.const import *
 import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
 
 # from pytest_homeassistant_custom_component.async_mock import patch
 import voluptuous as vol
@@ -34,3 +35,139 @@ async def test_flow_init(hass: HomeAssistant) -> None:
         "type": "form",
     }
     assert expected == result
+
+
+async def test_flow_virtual_in_developer_mode(hass: HomeAssistant) -> None:
+    """Test that simulated devices are only offered in developer mode."""
+    result = await hass.config_entries.flow.async_init(
+        config_flow.DOMAIN, context={"source": "user"}
+    )
+    user_input = {
+        "name": "Simulation",
+        "mains_type": "virtual",
+        "charger_type": "virtual",
+        "developer_mode": True,
+    }
+    with pytest.raises(vol.Invalid):
+        await hass.config_entries.flow.async_configure(result["flow_id"], user_input)
+
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"],
+        {**user_input, "mains_type": "template", "charger_type": "template"},
+    )
+    assert result["step_id"] == "user"
+    assert result["errors"] == {}
+
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {**user_input, "developer_mode": False}
+    )
+    assert result["errors"] == {"base": "developer_mode_required"}
+
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], user_input
+    )
+    assert result["step_id"] == "mains"
+
+
+async def test_auto_phases_cleans_up(hass: HomeAssistant) -> None:
+    """Test that auto phase matching releases the mains and charger it used."""
+    flow = config_flow.EvLoadBalancingConfigFlow()
+    flow.hass = hass
+    charger = mock.Mock(async_cleanup=mock.AsyncMock())
+    mains = mock.Mock()
+    with (
+        mock.patch.object(config_flow, "get_charger", return_value=charger),
+        mock.patch.object(config_flow, "get_mains", return_value=mains),
+        mock.patch.object(
+            config_flow.PhaseMatcher,
+            "async_match",
+            side_effect=config_flow.PhaseLearningFailed("Failed to match phases"),
+        ),
+        pytest.raises(config_flow.PhaseLearningFailed),
+    ):
+        await flow.async_step_auto_phases()
+    mains.cleanup.assert_called_once()
+    charger.async_cleanup.assert_awaited_once()
+
+
+async def test_reconfigure_flow(hass: HomeAssistant) -> None:
+    """Test that reconfiguring goes through the setup steps, prefilled."""
+    mains = {
+        CONF_DEVICE_ID: "mains",
+        CONF_MAINS_POLL_INTERVAL: 1.0,
+        CONF_MAINS_LIMIT: 25,
+        CONF_MAINS_SHARED: False,
+    }
+    charger = {
+        CONF_DEVICE_ID: "charger",
+        CONF_CHARGER_RATED_CURRENT: 16,
+        CONF_CHARGER_DEADBAND: 1.0,
+        CONF_CHARGER_STEP: 0.5,
+        CONF_CHARGER_PRIORITY: 0,
+        CONF_CHARGER_FORECAST: False,
+        CONF_CHARGER_RESPONSE_TIME: 5.0,
+        CONF_PHASE_AUTO_MATCHING: False,
+    }
+    phases = {
+        CONF_MAINS_PHASE1: "PHASE2",
+        CONF_MAINS_PHASE2: "PHASE3",
+        CONF_MAINS_PHASE3: "PHASE1",
+        CONF_CHARGER_PHASE1: "PHASE1",
+        CONF_CHARGER_PHASE2: "PHASE2",
+        CONF_CHARGER_PHASE3: "PHASE3",
+    }
+    user_input = {
+        "name": "Simulation",
+        "mains_type": "virtual",
+        "charger_type": "virtual",
+        "developer_mode": True,
+        "publish_interval": 0,
+    }
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        version=CONFIG_VERSION,
+        minor_version=CONFIG_MINOR_VERSION,
+        unique_id="mains_charger",
+        data=user_input,
+        options={CONF_MAINS: mains, CONF_CHARGER: charger, CONF_PHASES: phases},
+    )
+    entry.add_to_hass(hass)
+
+    result = await entry.start_reconfigure_flow(hass)
+    assert result["step_id"] == "reconfigure"
+    assert result["data_schema"] is not config_flow.USER_SCHEMA
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {**user_input, "developer_mode": False}
+    )
+    assert result["step_id"] == "reconfigure"
+    assert result["errors"] == {"base": "developer_mode_required"}
+
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {**user_input, "name": "Renamed"}
+    )
+    assert result["step_id"] == "mains"
+    suggested = {
+        key.schema: key.description["suggested_value"]
+        for key in result["data_schema"].schema
+        if key.description
+    }
+    assert suggested[CONF_MAINS_LIMIT] == 25
+
+    result = await hass.config_entries.flow.async_configure(result["flow_id"], mains)
+    assert result["step_id"] == "charger"
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {**charger, CONF_CHARGER_PRIORITY: 3}
+    )
+    assert result["step_id"] == "phases"
+    with mock.patch(
+        "custom_components.ev_load_balancing.async_setup_entry", return_value=True
+    ):
+        result = await hass.config_entries.flow.async_configure(
+            result["flow_id"], phases
+        )
+        await hass.async_block_till_done()
+    assert result["type"] == "abort"
+    assert result["reason"] == "reconfigure_successful"
+    assert entry.title == "Renamed"
+    assert entry.options[CONF_CHARGER][CONF_CHARGER_PRIORITY] == 3
+    assert entry.options[CONF_PHASES] == phases
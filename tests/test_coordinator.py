@@ -1,9 +1,17 @@
 """planner tests."""
 
+import asyncio
+from datetime import timedelta
+import time
 from unittest import mock
 
 from custom_components.ev_load_balancing import EvLoadBalancingCoordinator
-from custom_components.ev_load_balancing.const import DOMAIN
+from custom_components.ev_load_balancing.const import (
+    DEFAULT_PUBLISH_INTERVAL,
+    DOMAIN,
+    Phases,
+)
+from custom_components.ev_load_balancing.helpers.timing import STAGES
 
 # from pytest_homeassistant_custom_component.async_mock import patch
 # from pytest_homeassistant_custom_component.common import (
@@ -12,7 +20,9 @@ from custom_components.ev_load_balancing.const import DOMAIN
 #     mock_integration,
 #     mock_platform,
 # )
+from freezegun.api import FrozenDateTimeFactory
 import pytest
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
 
 from homeassistant import config_entries
 from homeassistant.const import ATTR_NAME, ATTR_UNIT_OF_MEASUREMENT
@@ -21,6 +31,8 @@ from homeassistant.const import ATTR_NAME, ATTR_UNIT_OF_MEASUREMENT
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
+from .common import FakeCharger, FakeMains
+
 NAME = "My balancer"
 
 CONF_ENTRY = config_entries.ConfigEntry(
@@ -72,3 +84,186 @@ async def test_coordinator_init(hass: HomeAssistant) -> None:
     coordinator = EvLoadBalancingCoordinator(hass, CONF_ENTRY)
 
     assert coordinator.name == NAME
+
+
+def create_fake_coordinator(hass: HomeAssistant) -> EvLoadBalancingCoordinator:
+    """Create coordinator using fake mains and charger."""
+    with (
+        mock.patch(
+            "custom_components.ev_load_balancing.coordinator.get_mains",
+            side_effect=lambda hass, data, options, cb: FakeMains(hass, cb),
+        ),
+        mock.patch(
+            "custom_components.ev_load_balancing.coordinator.get_charger",
+            side_effect=lambda hass, data, options, cb: FakeCharger(hass, cb),
+        ),
+    ):
+        return EvLoadBalancingCoordinator(hass, CONF_ENTRY)
+
+
+async def _async_update_cost(hass: HomeAssistant, count: int, updates: int) -> float:
+    """Update first of `count` coordinators, return seconds per update."""
+    coordinators = [create_fake_coordinator(hass) for _ in range(count)]
+    for coordinator in coordinators:
+        await coordinator._async_setup_method()
+
+    start = time.perf_counter()
+    for _ in range(updates):
+        await coordinators[0]._async_update_method()
+    elapsed = time.perf_counter() - start
+
+    calls = [c.commands_sent + c.commands_skipped for c in coordinators]
+    assert calls[0] == updates
+    assert sum(calls[1:]) == 0
+    assert len(coordinators[0]._pairs) == 3
+    return elapsed / updates
+
+
+@pytest.mark.asyncio
+async def test_coordinator_scaling(hass: HomeAssistant) -> None:
+    """Test that an update only touches its own entry, for any number of entries."""
+    await _async_update_cost(hass, 50, 20)
+
+
+@pytest.mark.benchmark
+@pytest.mark.asyncio
+async def test_coordinator_scaling_benchmark(hass: HomeAssistant) -> None:
+    """Benchmark that cost per update is independent of number of entries."""
+    single = min([await _async_update_cost(hass, 1, 200) for _ in range(3)])
+    many = min([await _async_update_cost(hass, 50, 200) for _ in range(3)])
+    assert many < single * 3, (
+        f"per update: 1 entry {single * 1e6:.1f} us, 50 entries {many * 1e6:.1f} us"
+    )
+
+
+@pytest.mark.asyncio
+async def test_coordinator_update_rate(hass: HomeAssistant) -> None:
+    """Test that rate slows down with headroom and overload refreshes at once."""
+    coordinator = create_fake_coordinator(hass)
+    await coordinator._async_setup_method()
+    mains = coordinator._mains
+    charger = coordinator._charger
+
+    for phase in mains.phases.values():
+        phase.current = 5.0
+    await coordinator._async_update_method()
+    assert coordinator._debounced_refresh.cooldown > 1.0
+
+    commands = len(charger.commands)
+    mains.phases[Phases.PHASE1].current = 25.0
+    coordinator._last_refresh -= 1
+    await coordinator._async_request_input_refresh()
+    assert len(charger.commands) == commands + 1
+    assert coordinator._debounced_refresh.immediate
+    assert coordinator.update_rate == 5.0
+
+    await coordinator.async_shutdown()
+
+
+@pytest.mark.asyncio
+async def test_coordinator_timings(hass: HomeAssistant) -> None:
+    """Test that update stages are only timed while enabled."""
+    coordinator = create_fake_coordinator(hass)
+    await coordinator._async_setup_method()
+    await coordinator._async_update_method()
+    assert coordinator.timings is None
+
+    coordinator.enable_timings()
+    coordinator.enable_timings()
+    coordinator._mains.phases[Phases.PHASE1].current = 25.0
+    await coordinator._async_update_method()
+    for stage in STAGES:
+        assert coordinator.timings.summary(stage)["count"] == 1
+
+    coordinator.disable_timings()
+    assert coordinator.timings is not None
+    coordinator.disable_timings()
+    assert coordinator.timings is None
+
+
+@pytest.mark.asyncio
+async def test_coordinator_command_channel(hass: HomeAssistant) -> None:
+    """Test that a slow charger gets one command at a time, only the latest."""
+    coordinator = create_fake_coordinator(hass)
+    await coordinator._async_setup_method()
+    charger = coordinator._charger
+    release = asyncio.Event()
+    set_limits = charger.async_set_limits
+
+    async def slow_set_limits(*limits: float) -> bool:
+        await release.wait()
+        return await set_limits(*limits)
+
+    charger.async_set_limits = slow_set_limits
+    for limit in (6.0, 8.0, 10.0, 12.0):
+        await coordinator.async_set_limits([limit, limit, limit])
+    assert coordinator.command_queue_depth == 2
+    assert coordinator.commands_superseded == 2
+
+    release.set()
+    await coordinator._commands.async_join()
+    assert charger.commands == [(6.0, 6.0, 6.0), (12.0, 12.0, 12.0)]
+    assert coordinator.command_queue_depth == 0
+    assert coordinator.command_latency > 0
+
+    await coordinator.async_shutdown()
+
+
+@pytest.mark.asyncio
+async def test_coordinator_resends_failed_command(hass: HomeAssistant) -> None:
+    """Test that limits the charger did not accept are sent on next update."""
+    coordinator = create_fake_coordinator(hass)
+    await coordinator._async_setup_method()
+    charger = coordinator._charger
+    set_limits = charger.async_set_limits
+    for failure in (
+        mock.AsyncMock(return_value=False),
+        mock.AsyncMock(side_effect=OSError("Connection reset")),
+    ):
+        charger.async_set_limits = failure
+        await coordinator.async_set_limits([10.0, 10.0, 10.0])
+        await coordinator._commands.async_join()
+        assert coordinator.commands_sent == 0
+        assert coordinator._commands.depth == 0
+
+    charger.async_set_limits = set_limits
+    await coordinator.async_set_limits([10.0, 10.0, 10.0])
+    await coordinator._commands.async_join()
+    assert charger.commands == [(10.0, 10.0, 10.0)]
+    assert coordinator.commands_sent == 1
+
+    await coordinator.async_set_limits([10.0, 10.0, 10.0])
+    assert coordinator.commands_skipped == 1
+
+    await coordinator.async_shutdown()
+
+
+@pytest.mark.asyncio
+async def test_coordinator_publish_interval(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test that updates within the publish interval are published once."""
+    coordinator = create_fake_coordinator(hass)
+    await coordinator._async_setup_method()
+    calls = 0
+
+    def listener() -> None:
+        nonlocal calls
+        calls += 1
+
+    remove = coordinator.async_add_listener(listener)
+    for _ in range(5):
+        coordinator.async_update_listeners()
+    assert calls == 1
+
+    freezer.tick(timedelta(seconds=DEFAULT_PUBLISH_INTERVAL))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+    assert calls == 2
+
+    freezer.tick(timedelta(seconds=DEFAULT_PUBLISH_INTERVAL))
+    coordinator.async_update_listeners()
+    assert calls == 3
+
+    remove()
+    await coordinator.async_shutdown()
@@ -0,0 +1,306 @@
+"""helpers tests."""
+
+import asyncio
+from datetime import timedelta
+
+from custom_components.ev_load_balancing.chargers.easee import ChargerEasee
+from custom_components.ev_load_balancing.chargers.template import ChargerTemplate
+from custom_components.ev_load_balancing.helpers.command_channel import CommandChannel
+from custom_components.ev_load_balancing.helpers.command_scheduler import (
+    DATA_COMMAND_SCHEDULERS,
+    CommandScheduler,
+    TokenBucket,
+    get_command_scheduler,
+)
+from custom_components.ev_load_balancing.helpers.deadband import CommandDeadband
+from custom_components.ev_load_balancing.helpers.device_index import get_device_index
+from custom_components.ev_load_balancing.helpers.forecast import LoadForecast
+from custom_components.ev_load_balancing.helpers.entity_roles import (
+    ROLE_CURRENT_PHASE2,
+    ROLE_CURRENT_PHASE3,
+    ROLE_STATUS,
+    get_entity_roles,
+)
+from custom_components.ev_load_balancing.helpers.rate_scheduler import (
+    FAST_COOLDOWN,
+    NORMAL_COOLDOWN,
+    SLOW_COOLDOWN,
+    RateScheduler,
+)
+from custom_components.ev_load_balancing.helpers.timing import STAGE_READ, StageTimings
+from custom_components.ev_load_balancing.mains.slimmelezer import MainsSlimmelezer
+from freezegun.api import FrozenDateTimeFactory
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+import pytest
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ConfigEntryError
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+
+from .common import create_device, create_slimmelezer
+
+
+def test_deadband_suppresses_small_increases() -> None:
+    """Test that increases within deadband are counted and skipped."""
+    deadband = CommandDeadband(deadband=1.0, step=0.5, time_to_live=600)
+
+    limits = deadband.check([10.3, 10.9, 11.0], now=0)
+    assert limits == (10.0, 10.5, 11.0)
+    deadband.sent(limits, now=0)
+
+    assert deadband.check([10.7, 10.9, 11.4], now=1) is None
+    assert deadband.check([11.0, 10.5, 11.0], now=2) == (11.0, 10.5, 11.0)
+    assert deadband.sent_count == 1
+    assert deadband.skipped_count == 1
+
+
+def test_deadband_sends_small_reductions() -> None:
+    """Test that any reduction is sent, even within deadband."""
+    deadband = CommandDeadband(deadband=1.0, step=0.5, time_to_live=None)
+    deadband.sent((10.0, 10.5, 11.0), now=0)
+
+    assert deadband.check([10.0, 10.4, 11.0], now=1) == (10.0, 10.0, 11.0)
+    assert deadband.check([10.0, 10.5, 10.9], now=2) == (10.0, 10.5, 10.5)
+    assert deadband.skipped_count == 0
+
+
+def test_deadband_resends_before_expiry() -> None:
+    """Test that unchanged limits are sent again before time to live expires."""
+    deadband = CommandDeadband(deadband=1.0, step=0.5, time_to_live=600)
+    deadband.sent((16.0, 16.0, 16.0), now=0)
+
+    assert deadband.check([16.0, 16.0, 16.0], now=299) is None
+    assert deadband.check([16.0, 16.0, 16.0], now=300) == (16.0, 16.0, 16.0)
+
+    deadband.reset()
+    assert deadband.check([16.0, 16.0, 16.0], now=301) is not None
+
+
+def test_deadband_compares_with_submitted() -> None:
+    """Test that limits on their way count, and a failure forgets all."""
+    deadband = CommandDeadband(deadband=1.0, step=0.5, time_to_live=None)
+    deadband.sent((10.0, 10.0, 10.0), now=0)
+    deadband.submitted((12.0, 12.0, 12.0))
+
+    assert deadband.check([12.5, 12.5, 12.5], now=1) is None
+    deadband.reset()
+    assert deadband.check([12.5, 12.5, 12.5], now=2) == (12.5, 12.5, 12.5)
+
+
+def test_token_bucket() -> None:
+    """Test burst, refill and reserve of token bucket."""
+    bucket = TokenBucket(rate=0.5, burst=3)
+    now = bucket._timestamp
+    assert [bucket.take(now=now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take(now=now) == pytest.approx(2.0)
+    assert bucket.take(now=now + 2) == 0.0
+    assert bucket.take(reserve=1, now=now + 4) == pytest.approx(2.0)
+    assert bucket.take(now=now + 4) == 0.0
+
+
+async def test_command_scheduler(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test that reductions go first and increases of a circuit are merged."""
+    scheduler = CommandScheduler(hass, "account", rate=0.5, burst=3, reserve=1)
+    sent: list[tuple[str, tuple[float, ...]]] = []
+
+    def sender(circuit: str):
+        async def send(limits: tuple[float, ...]) -> None:
+            sent.append((circuit, limits))
+
+        return send
+
+    def submit(circuit: str, limit: float) -> asyncio.Task:
+        return hass.async_create_task(
+            scheduler.async_send(circuit, (limit,) * 3, sender(circuit))
+        )
+
+    await asyncio.gather(submit("a", 10), submit("b", 10))
+    increase = submit("a", 12)
+    await asyncio.sleep(0)
+    assert scheduler.pending == 1
+    merged = submit("a", 13)
+    assert await submit("b", 8)
+    assert sent[-1] == ("b", (8, 8, 8))
+
+    freezer.tick(timedelta(seconds=4))
+    async_fire_time_changed(hass)
+    assert await increase
+    assert await merged
+    assert sent[2:] == [("b", (8, 8, 8)), ("a", (13, 13, 13))]
+    assert scheduler.merged_count == 1
+
+    dropped = submit("a", 16)
+    await asyncio.sleep(0)
+    scheduler.cancel("a")
+    assert not await dropped
+    assert scheduler.pending == 0
+
+
+async def test_command_channel_through_scheduler(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test that a cut replaces an increase the channel has waiting for a token."""
+    scheduler = CommandScheduler(hass, "account", rate=0.5, burst=3, reserve=1)
+    sent: list[tuple[float, ...]] = []
+
+    async def send(limits: tuple[float, ...]) -> None:
+        sent.append(limits)
+
+    async def send_limits(limits: tuple[float, ...]) -> bool:
+        return await scheduler.async_send("a", limits, send)
+
+    deadband = CommandDeadband(deadband=1.0, step=0.5, time_to_live=None)
+    channel = CommandChannel(
+        hass,
+        "charger",
+        send_limits,
+        deadband,
+        lambda limits: scheduler.replace("a", limits),
+    )
+    for limit in (10.0, 12.0):
+        channel.submit((limit,) * 3)
+        await channel.async_join()
+
+    # Only the reserved token is left, the increase waits for a refill
+    channel.submit((14.0,) * 3)
+    await asyncio.sleep(0)
+    assert scheduler.pending == 1
+    channel.submit((6.0,) * 3)
+    await channel.async_join()
+    assert sent == [(10.0,) * 3, (12.0,) * 3, (6.0,) * 3]
+    assert channel.superseded_count == 1
+    assert deadband.check([6.0, 6.0, 6.0], now=0) is None
+
+
+async def test_command_scheduler_shared(hass: HomeAssistant) -> None:
+    """Test that chargers of an account share a scheduler until the last leaves."""
+    first = get_command_scheduler(hass, "account", rate=0.5, burst=3)
+    second = get_command_scheduler(hass, "account", rate=0.5, burst=3)
+    assert first is second
+
+    first.release()
+    assert hass.data[DATA_COMMAND_SCHEDULERS] == {"account": first}
+    second.release()
+    assert hass.data[DATA_COMMAND_SCHEDULERS] == {}
+
+
+def test_rate_scheduler() -> None:
+    """Test that cooldown follows headroom and variance on mains."""
+    rate = RateScheduler(mains_limit=20)
+    assert rate.cooldown == NORMAL_COOLDOWN
+
+    assert rate.update(spare=-1.0, stddev=0.0) == FAST_COOLDOWN
+    assert rate.immediate
+
+    assert rate.update(spare=3.0, stddev=1.0) == NORMAL_COOLDOWN
+    assert not rate.immediate
+    assert rate.update(spare=15.0, stddev=0.5) == SLOW_COOLDOWN
+    assert NORMAL_COOLDOWN < rate.update(spare=8.0, stddev=1.0) < SLOW_COOLDOWN
+
+    rate.reset()
+    assert rate.rate == 1 / NORMAL_COOLDOWN
+
+
+def test_stage_timings() -> None:
+    """Test percentiles of recorded stage durations."""
+    timings = StageTimings(capacity=100)
+    assert timings.summary(STAGE_READ) is None
+
+    for i in range(1, 101):
+        timings._durations[STAGE_READ].append(i / 1000)
+    summary = timings.summary(STAGE_READ)
+    assert summary["p50"] == 50.0
+    assert summary["p95"] == 96.0
+    assert summary["max"] == 100.0
+    assert summary["count"] == 100
+
+
+def test_load_forecast() -> None:
+    """Test forecast follows a ramp and settles on a constant load."""
+    forecast = LoadForecast()
+    assert forecast.predict(2) is None
+    for i in range(120):
+        forecast.add(5 + 0.5 * i, i * 0.5)
+    assert forecast.trend == pytest.approx(1.0, rel=0.15)
+    assert forecast.predict(2) == pytest.approx(5 + 0.5 * 119 + 2, abs=1)
+
+    for i in range(120, 400):
+        forecast.add(30, i * 0.5)
+    assert forecast.trend == pytest.approx(0, abs=0.05)
+    assert forecast.predict(10) == pytest.approx(30, abs=0.5)
+
+    forecast.reset()
+    assert forecast.predict(2) is None
+
+
+async def test_entity_role_index(hass: HomeAssistant) -> None:
+    """Test lookups are cached and dropped on registry changes."""
+    device_id = create_slimmelezer(hass)
+    other_id = create_slimmelezer(hass, "other")
+    roles = get_entity_roles(hass)
+    assert get_entity_roles(hass) is roles
+
+    assert (
+        roles.get(device_id, ROLE_CURRENT_PHASE2)
+        == "sensor.slimmelezer_current_phase_2"
+    )
+    assert roles.get(device_id, ROLE_STATUS) is None
+    roles.get(device_id, ROLE_CURRENT_PHASE3)
+    roles.get(other_id, ROLE_CURRENT_PHASE3)
+    assert roles.build_count == 2
+
+    er.async_get(hass).async_update_entity(
+        "sensor.slimmelezer_current_phase_2",
+        new_entity_id="sensor.slimmelezer_current_l2",
+    )
+    await hass.async_block_till_done()
+    assert roles.get(device_id, ROLE_CURRENT_PHASE2) == "sensor.slimmelezer_current_l2"
+    roles.get(other_id, ROLE_CURRENT_PHASE2)
+    assert roles.build_count == 3
+
+    er.async_get(hass).async_remove("sensor.slimmelezer_current_l2")
+    await hass.async_block_till_done()
+    with pytest.raises(ConfigEntryError):
+        roles.require(device_id, ROLE_CURRENT_PHASE2)
+
+
+async def test_device_index(hass: HomeAssistant) -> None:
+    """Test devices are identified per type, cached and re-checked on changes."""
+    for i in range(200):
+        create_device(hass, "hue", f"lamp {i}", "Zuidwijk easee", ["power"])
+    create_device(hass, "esphome", "plug", "Zuidwijk", ["current"])
+    mains_id = create_slimmelezer(hass)
+    charger_id = create_device(
+        hass,
+        "easee",
+        "garage",
+        "Easee",
+        ["garage_status", "garage_dynamic_circuit_limit"],
+    )
+    await hass.async_block_till_done()
+    index = get_device_index(hass)
+    assert get_device_index(hass) is index
+
+    assert index.devices(MainsSlimmelezer) == {mains_id: "slimmelezer"}
+    assert index.devices(ChargerEasee) == {charger_id: "garage"}
+    assert index.devices(ChargerTemplate) == {}
+    index.devices(MainsSlimmelezer)
+    assert index.build_count == 3
+
+    other_id = create_slimmelezer(hass, "other")
+    dr.async_get(hass).async_update_device(charger_id, name_by_user="Carport")
+    dr.async_get(hass).async_update_device(charger_id, name="carport")
+    await hass.async_block_till_done()
+    assert index.devices(MainsSlimmelezer) == {
+        mains_id: "slimmelezer",
+        other_id: "other",
+    }
+    assert index.devices(ChargerEasee) == {charger_id: "carport"}
+
+    er.async_get(hass).async_remove("sensor.other_current_phase_2")
+    dr.async_get(hass).async_remove_device(charger_id)
+    await hass.async_block_till_done()
+    assert index.devices(MainsSlimmelezer) == {mains_id: "slimmelezer"}
+    assert index.devices(ChargerEasee) == {}
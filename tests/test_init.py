@@ -0,0 +1,296 @@
+"""init tests."""
+
+import asyncio
+import gc
+import json
+import logging
+import subprocess
+import sys
+import traceback
+import tracemalloc
+from typing import Any
+from unittest import mock
+
+from custom_components.ev_load_balancing import EvLoadBalancingCoordinator
+from custom_components.ev_load_balancing.backends import (
+    CHARGER_BACKENDS,
+    MAINS_BACKENDS,
+    async_get_charger_class,
+    async_get_mains_class,
+    async_load_backends,
+)
+from custom_components.ev_load_balancing.const import DOMAIN, NAME_TEMPLATE
+from custom_components.ev_load_balancing.helpers import history_store
+from custom_components.ev_load_balancing.mains.template import MainsTemplate
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import ATTR_NAME
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ConfigEntryError
+from homeassistant.helpers.update_coordinator import UpdateFailed
+
+
+def create_template_entry(hass: HomeAssistant) -> MockConfigEntry:
+    """Create entry with template mains and charger reading plain entities."""
+    for i in (1, 2, 3):
+        hass.states.async_set(f"sensor.mains_l{i}", "5.0")
+        hass.states.async_set(f"sensor.charger_l{i}", "16.0")
+    hass.states.async_set("sensor.charger_status", "charging")
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        version=0,
+        minor_version=3,
+        data={
+            ATTR_NAME: "Soak",
+            "mains_type": "template",
+            "charger_type": "template",
+            "developer_mode": False,
+        },
+        options={
+            "mains": {
+                **{
+                    f"mains_phase{i}": f"{{{{ states('sensor.mains_l{i}') | float(0) }}}}"
+                    for i in (1, 2, 3)
+                },
+                "mains_limit": 25,
+            },
+            "charger": {
+                **{
+                    f"charger_phase{i}": f"{{{{ states('sensor.charger_l{i}') | float(0) }}}}"
+                    for i in (1, 2, 3)
+                },
+                "charger_active": "{{ is_state('sensor.charger_status', 'charging') }}",
+                "charger_limit": "{{ 16.0 }}",
+                "charger_command": "{{ phase1 }}",
+            },
+            "phases": {
+                "mains_phase1": "PHASE1",
+                "mains_phase2": "PHASE2",
+                "mains_phase3": "PHASE3",
+                "charger_phase1": "PHASE1",
+                "charger_phase2": "PHASE2",
+                "charger_phase3": "PHASE3",
+            },
+        },
+    )
+    config_entry.add_to_hass(hass)
+    return config_entry
+
+
+def count_instances(cls: type) -> int:
+    """Count live instances of class."""
+    gc.collect()
+    return sum(isinstance(obj, cls) for obj in gc.get_objects())
+
+
+async def test_unload_entry(hass: HomeAssistant) -> None:
+    """Test that unload removes entities and stops the coordinator."""
+    config_entry = create_template_entry(hass)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert config_entry.state is ConfigEntryState.LOADED
+    assert hass.states.get("sensor.soak_commands_sent") is not None
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert config_entry.state is ConfigEntryState.NOT_LOADED
+    assert config_entry.entry_id not in hass.data[DOMAIN]
+
+
+async def test_history_warm_start(
+    hass: HomeAssistant, hass_storage: dict[str, Any]
+) -> None:
+    """Test that phase history is saved on unload and restored if fresh."""
+    config_entry = create_template_entry(hass)
+    key = f"{DOMAIN}.history.{config_entry.entry_id}"
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    for i in range(20):
+        hass.states.async_set("sensor.mains_l1", f"{5 + i % 4}.0")
+        await hass.async_block_till_done()
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert len(hass_storage[key]["data"]["phases"]["PHASE1"]["values"]) == 20
+
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    phase = hass.data[DOMAIN][config_entry.entry_id].pairs[0].mains_phase
+    assert len(phase.history) == 21
+    assert phase.stddev_current() > 1
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    hass_storage[key]["data"]["saved"] -= 3600
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    phase = hass.data[DOMAIN][config_entry.entry_id].pairs[0].mains_phase
+    assert len(phase.history) == 1
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    assert await hass.config_entries.async_remove(config_entry.entry_id)
+    assert key not in hass_storage
+
+
+async def _async_reload(hass: HomeAssistant, config_entry: MockConfigEntry) -> None:
+    """Reload entry and wait for it to settle."""
+    assert await hass.config_entries.async_reload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+
+async def _async_callbacks_per_change(hass: HomeAssistant) -> int:
+    """Count refresh requests per mains change."""
+    with mock.patch.object(
+        EvLoadBalancingCoordinator,
+        "async_request_refresh",
+        autospec=True,
+    ) as refresh:
+        hass.states.async_set("sensor.mains_l1", "6.0")
+        await hass.async_block_till_done()
+        hass.states.async_set("sensor.mains_l1", "5.0")
+        await hass.async_block_till_done()
+    return refresh.call_count // 2
+
+
+async def test_reload_soak(hass: HomeAssistant) -> None:
+    """Test that reloads do not add listeners, callbacks or instances."""
+    config_entry = create_template_entry(hass)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    await _async_reload(hass, config_entry)
+    listeners = sum(hass.bus.async_listeners().values())
+    assert await _async_callbacks_per_change(hass) == 1
+
+    for _ in range(5):
+        await _async_reload(hass, config_entry)
+    assert sum(hass.bus.async_listeners().values()) == listeners
+    assert await _async_callbacks_per_change(hass) == 1
+    assert count_instances(EvLoadBalancingCoordinator) == 1
+    assert count_instances(MainsTemplate) == 1
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+
+async def test_setup_retry_releases_listeners(hass: HomeAssistant) -> None:
+    """Test that a failing first refresh releases everything on each retry."""
+    config_entry = create_template_entry(hass)
+    listeners = sum(hass.bus.async_listeners().values())
+    with mock.patch.object(
+        EvLoadBalancingCoordinator,
+        "_async_update_method",
+        side_effect=UpdateFailed("Charger not responding"),
+    ):
+        assert not await hass.config_entries.async_setup(config_entry.entry_id)
+        for _ in range(3):
+            await hass.config_entries.async_reload(config_entry.entry_id)
+            await hass.async_block_till_done()
+            assert config_entry.state is ConfigEntryState.SETUP_RETRY
+
+    assert sum(hass.bus.async_listeners().values()) == listeners
+    assert count_instances(EvLoadBalancingCoordinator) == 0
+    assert count_instances(MainsTemplate) == 0
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+@pytest.mark.benchmark
+async def test_reload_memory_benchmark(hass: HomeAssistant) -> None:
+    """Benchmark that reloads do not retain memory."""
+    reloads = 20
+    config_entry = create_template_entry(hass)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    await _async_reload(hass, config_entry)
+
+    # Log capture, asyncio debug tracebacks and the mocked storage, that records
+    # all data written to it, grow on their own
+    filters = [
+        tracemalloc.Filter(False, history_store.__file__),
+        tracemalloc.Filter(False, mock.__file__),
+        tracemalloc.Filter(False, logging.__file__),
+        tracemalloc.Filter(False, traceback.__file__),
+        tracemalloc.Filter(False, asyncio.events.__file__),
+        tracemalloc.Filter(False, asyncio.base_events.__file__),
+    ]
+    tracemalloc.start()
+    await _async_reload(hass, config_entry)
+    gc.collect()
+    before = tracemalloc.take_snapshot().filter_traces(filters)
+    for _ in range(reloads):
+        await _async_reload(hass, config_entry)
+    gc.collect()
+    after = tracemalloc.take_snapshot().filter_traces(filters)
+    tracemalloc.stop()
+    growth = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    growth /= reloads
+
+    assert growth < 10 * 1024, f"{growth / 1024:.1f} KiB retained per reload"
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+
+IMPORT_SCRIPT = """
+import json
+import sys
+import time
+import homeassistant.config_entries, homeassistant.helpers.update_coordinator
+start = time.perf_counter()
+import custom_components.ev_load_balancing
+for module in sys.argv[1:]:
+    __import__(module)
+elapsed = time.perf_counter() - start
+loaded = [m for m in sys.modules if m.startswith("custom_components.")]
+json.dump({"elapsed": elapsed, "loaded": loaded}, sys.stdout)
+"""
+
+PACKAGE = "custom_components.ev_load_balancing"
+BACKEND_MODULES = [
+    f"{PACKAGE}.{module}"
+    for module, _ in (*CHARGER_BACKENDS.values(), *MAINS_BACKENDS.values())
+]
+
+
+def measure_import(*modules: str, runs: int = 1) -> tuple[float, list[str]]:
+    """Import integration in a fresh interpreter, get best time and modules."""
+    results = []
+    for _ in range(runs):
+        output = json.loads(
+            subprocess.run(
+                [sys.executable, "-c", IMPORT_SCRIPT, *modules],
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout
+        )
+        results.append((output["elapsed"], output["loaded"]))
+    return min(results)
+
+
+def test_import_leaves_backends_unimported() -> None:
+    """Test that importing the integration does not import backends."""
+    _, loaded = measure_import()
+    assert not set(loaded) & {*BACKEND_MODULES, f"{PACKAGE}.config_flow"}
+
+
+@pytest.mark.benchmark
+def test_import_time_benchmark() -> None:
+    """Benchmark importing the integration against importing all backends."""
+    lazy, _ = measure_import(runs=3)
+    eager, _ = measure_import(f"{PACKAGE}.config_flow", *BACKEND_MODULES, runs=3)
+    assert lazy < eager, (
+        f"import: lazy {lazy * 1e3:.1f} ms, with all backends {eager * 1e3:.1f} ms"
+    )
+
+
+async def test_setup_imports_backends(hass: HomeAssistant) -> None:
+    """Test that setup imports the configured backends and rejects unknown ones."""
+    config_entry = create_template_entry(hass)
+    await async_load_backends(hass, config_entry.data)
+    assert await async_get_mains_class(hass, NAME_TEMPLATE) is MainsTemplate
+    with pytest.raises(ConfigEntryError):
+        await async_get_charger_class(hass, "unknown")
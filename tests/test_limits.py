@@ -0,0 +1,88 @@
+"""limits tests."""
+
+import logging
+import time
+
+from custom_components.ev_load_balancing.limits import calculate_limits
+import pytest
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def per_pair_limits(
+    mains_actual, mains_stddev, mains_limit, set_limits, charger_limits
+) -> list[float]:
+    """Calculate limits like the previous loop over one pair per phase."""
+    phases = len(mains_actual)
+    new_limits = []
+    for i, charger_set_limit in enumerate(set_limits):
+        spare = mains_limit - mains_actual[i % phases]
+        charger_new_limit = min(
+            charger_set_limit + spare - mains_stddev[i % phases],
+            charger_limits[i // phases],
+            mains_limit,
+        )
+        _LOGGER.debug(
+            "Calculated new circuit limit %f (actual: %f, old limit: %f)",
+            charger_new_limit,
+            mains_actual[i % phases],
+            charger_set_limit,
+        )
+        new_limits.append(charger_new_limit)
+    return new_limits
+
+
+def test_calculate_limits() -> None:
+    """Test limits and budget for one and several chargers."""
+    budget, limits = calculate_limits(
+        [10.0, 12.0, 30.0], [1.0, 0.0, 0.5], 25, [10.0, 10.0, 10.0], [16]
+    )
+    assert budget == [24.0, 23.0, 4.5]
+    assert limits == [16, 16, 4.5]
+
+    budget, limits = calculate_limits(
+        [10.0, 12.0, 30.0], [0.0, 0.0, 0.0], 25, [6.0] * 3 + [8.0] * 3, [16, 10]
+    )
+    assert budget == [29.0, 27.0, 9.0]
+    assert limits == [16, 16, 1.0, 10, 10, 3.0]
+
+
+def _benchmark_args(chargers: int) -> tuple:
+    """Arguments for limits of `chargers` on one mains."""
+    return (
+        [10.0, 12.0, 14.0],
+        [1.0, 0.5, 0.0],
+        25,
+        [6.0 + i % 5 for i in range(3 * chargers)],
+        [16] * chargers,
+    )
+
+
+def test_calculate_limits_matches_per_pair() -> None:
+    """Test that the kernel calculates the same limits as per pair."""
+    for chargers in (1, 20):
+        args = _benchmark_args(chargers)
+        assert calculate_limits(*args)[1] == per_pair_limits(*args)
+
+
+@pytest.mark.benchmark
+def test_calculate_limits_benchmark() -> None:
+    """Benchmark the kernel against the per pair calculation."""
+    iterations = 2000
+    for chargers in (1, 20):
+        args = _benchmark_args(chargers)
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            per_pair_limits(*args)
+        per_pair = (time.perf_counter() - start) / iterations
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            calculate_limits(*args)
+        kernel = (time.perf_counter() - start) / iterations
+
+        assert kernel < per_pair * 3, (
+            f"{chargers} chargers: per pair {per_pair * 1e6:.1f} us, "
+            f"kernel {kernel * 1e6:.1f} us"
+        )
@@ -0,0 +1,385 @@
+"""mains tests."""
+
+import asyncio
+import gc
+from pathlib import Path
+import statistics
+import time
+import tracemalloc
+from unittest import mock
+
+from custom_components.ev_load_balancing.const import (
+    CONF_DEVICE_ID,
+    CONF_MAINS_HOST,
+    CONF_MAINS_LIMIT,
+    CONF_MAINS_METER,
+    CONF_MAINS_PHASE1,
+    CONF_MAINS_PHASE2,
+    CONF_MAINS_PHASE3,
+    CONF_MAINS_POLL_INTERVAL,
+    CONF_MAINS_PORT,
+    CONF_MAINS_UNIT,
+    Phases,
+)
+from custom_components.ev_load_balancing.helpers.dsmr import TelegramParser, crc16
+from custom_components.ev_load_balancing.helpers.entity_value import get_state_value
+from custom_components.ev_load_balancing.helpers.modbus import (
+    DATA_MODBUS_CLIENTS,
+    ModbusError,
+    decode_float32,
+    decode_int32_swapped,
+    get_modbus_client,
+    split_address,
+)
+from custom_components.ev_load_balancing.mains import RollingStatistics
+from custom_components.ev_load_balancing.mains.dsmr import MainsDsmr
+from custom_components.ev_load_balancing.mains.modbus import MainsModbus
+from custom_components.ev_load_balancing.mains.slimmelezer import (
+    MainsPhaseSlimmelezer,
+    MainsSlimmelezer,
+)
+from custom_components.ev_load_balancing.mains.template import MainsTemplate
+import pytest
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.util import dt as dt_util
+
+from .common import ModbusServerStandIn, create_slimmelezer
+
+
+def test_rolling_statistics_matches_pstdev() -> None:
+    """Test that incremental statistics match a full recalculation."""
+    stats = RollingStatistics(capacity=50, min_count=10, max_age=120.0)
+    values = [10.0 + (i * 7919 % 13) / 3 for i in range(500)]
+
+    for i, value in enumerate(values):
+        stats.add(value, timestamp=float(i))
+        window = values[max(0, i - 49) : i + 1]
+        assert len(stats) == len(window)
+        assert abs(stats.mean - statistics.fmean(window)) < 1e-9
+        assert abs(stats.stddev - statistics.pstdev(window)) < 1e-9
+
+
+def test_rolling_statistics_evicts_by_age() -> None:
+    """Test that old samples are dropped but the minimum count is kept."""
+    stats = RollingStatistics(capacity=100, min_count=3, max_age=10.0)
+    for i in range(20):
+        stats.add(float(i), timestamp=float(i))
+    assert len(stats) == 11
+
+    stats.add(5.0, timestamp=1000.0)
+    assert len(stats) == 3
+    assert stats.mean == statistics.fmean([18.0, 19.0, 5.0])
+
+
+def test_rolling_statistics_restore() -> None:
+    """Test that restored samples are merged before newer ones, if not too old."""
+    saved = RollingStatistics(capacity=10, min_count=3, max_age=60.0)
+    for i in range(8):
+        saved.add(float(i), timestamp=100.0 + i * 10)
+    samples = saved.samples(now=180.0)
+    assert samples[0] == (70.0, 1.0)
+    assert samples[-1] == (10.0, 7.0)
+
+    stats = RollingStatistics(capacity=10, min_count=3, max_age=60.0)
+    stats.add(20.0, timestamp=1000.0)
+    stats.restore([(age + 5, value) for age, value in samples], now=1001.0)
+    assert [value for _, value in stats.samples(1001.0)] == [3, 4, 5, 6, 7, 20]
+    assert stats.mean == statistics.fmean([3, 4, 5, 6, 7, 20])
+
+    stats.restore([(age + 500, value) for age, value in samples], now=1001.0)
+    assert len(stats) == 6
+
+
+@pytest.mark.benchmark
+def test_rolling_statistics_benchmark() -> None:
+    """Benchmark that cost per sample is independent of window size."""
+    samples = 20000
+
+    def per_sample_cost(window: int) -> float:
+        stats = RollingStatistics(capacity=window, min_count=10, max_age=1e9)
+        start = time.perf_counter()
+        for i in range(samples):
+            stats.add(float(i % 17), timestamp=float(i))
+        return (time.perf_counter() - start) / samples
+
+    small = min(per_sample_cost(100) for _ in range(3))
+    large = min(per_sample_cost(10000) for _ in range(3))
+    assert large < small * 3, (
+        f"per sample: window 100 {small * 1e9:.0f} ns, window 10000 {large * 1e9:.0f} ns"
+    )
+
+
+def test_phase_history_slots(hass: HomeAssistant) -> None:
+    """Test that phases keep no instance dict."""
+    phase = MainsPhaseSlimmelezer(hass, "sensor.current_1")
+    assert not hasattr(phase, "__dict__")
+
+
+@pytest.mark.benchmark
+def test_phase_history_memory_benchmark(hass: HomeAssistant) -> None:
+    """Benchmark memory of phase history with full windows."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    phases = [MainsPhaseSlimmelezer(hass, f"sensor.current_{i}") for i in (1, 2, 3)]
+    for phase in phases:
+        for i in range(MainsPhaseSlimmelezer._stddev_max_num):
+            phase.history.add(10.0 + i % 17 / 3, timestamp=i * 0.1)
+    per_entry = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    samples = sum(len(phase.history) for phase in phases)
+
+    assert per_entry / samples < 24, (
+        f"{per_entry / samples:.1f} bytes per sample, "
+        f"{per_entry / 1024:.1f} KiB per entry of {samples} samples"
+    )
+
+
+async def test_template_mains_tracks_referenced_entities(hass: HomeAssistant) -> None:
+    """Test that template phases only update when referenced entities change."""
+    hass.states.async_set("sensor.l1", "10.0")
+    hass.states.async_set("sensor.l2", "11.0")
+    hass.states.async_set("sensor.l3", "12.0")
+    hass.states.async_set("sensor.other", "1.0")
+    calls = 0
+
+    async def update_callback():
+        nonlocal calls
+        calls += 1
+
+    mains = MainsTemplate(
+        hass,
+        update_callback,
+        {
+            CONF_MAINS_PHASE1: "{{ states('sensor.l1') | float }}",
+            CONF_MAINS_PHASE2: "{{ states('sensor.l2') | float }}",
+            CONF_MAINS_PHASE3: "{{ states('sensor.l3') | float }}",
+            CONF_MAINS_LIMIT: 20,
+        },
+    )
+    await hass.async_block_till_done()
+    assert mains.get_phase(Phases.PHASE2).actual_current() == 11.0
+    calls = 0
+
+    hass.states.async_set("sensor.other", "2.0")
+    await hass.async_block_till_done()
+    assert calls == 0
+
+    hass.states.async_set("sensor.l2", "15.5")
+    await hass.async_block_till_done()
+    assert calls == 1
+    mains.update()
+    assert mains.get_phase(Phases.PHASE2).actual_current() == 15.5
+    assert mains.get_phase(Phases.PHASE1).actual_current() == 10.0
+
+
+async def test_template_mains_shared_template(hass: HomeAssistant) -> None:
+    """Test that phases with the same template all get its result."""
+    hass.states.async_set("sensor.current", "10.0")
+
+    async def update_callback():
+        pass
+
+    template = "{{ states('sensor.current') | float }}"
+    mains = MainsTemplate(
+        hass,
+        update_callback,
+        {
+            CONF_MAINS_PHASE1: template,
+            CONF_MAINS_PHASE2: template,
+            CONF_MAINS_PHASE3: template,
+            CONF_MAINS_LIMIT: 20,
+        },
+    )
+    await hass.async_block_till_done()
+    hass.states.async_set("sensor.current", "16.0")
+    await hass.async_block_till_done()
+    assert [mains.get_phase(phase).actual_current() for phase in Phases] == [16.0] * 3
+    mains.cleanup()
+
+
+async def test_slimmelezer_pushes_changed_phase(hass: HomeAssistant) -> None:
+    """Test that a state change only parses the changed phase."""
+    device_id = create_slimmelezer(hass)
+    for i in (1, 2, 3):
+        hass.states.async_set(f"sensor.slimmelezer_current_phase_{i}", f"{i}.0")
+    calls = 0
+
+    async def update_callback():
+        nonlocal calls
+        calls += 1
+
+    mains = MainsSlimmelezer(
+        hass, update_callback, {CONF_DEVICE_ID: device_id, CONF_MAINS_LIMIT: 20}
+    )
+    mains.update()
+
+    with mock.patch(
+        "custom_components.ev_load_balancing.mains.slimmelezer.get_state_value",
+        wraps=get_state_value,
+    ) as parse:
+        hass.states.async_set("sensor.slimmelezer_current_phase_3", "7.5")
+        await hass.async_block_till_done()
+
+    assert calls == 1
+    assert parse.call_count == 1
+    assert mains.get_phase(Phases.PHASE3).actual_current() == 7.5
+    assert mains.get_phase(Phases.PHASE1).actual_current() == 1.0
+    mains.cleanup()
+
+
+DSMR_TRACE = Path(__file__).parent / "traces" / "dsmr.txt"
+DSMR_CURRENTS = [(5, 3, 2), (6, 3, 2), (9, 3, 2), (12, 4, 2), (12, 4, 10), (7, 4, 10)]
+
+
+def test_dsmr_parser() -> None:
+    """Test that telegrams are parsed from any chunking and bad CRCs dropped."""
+    assert crc16(b"123456789") == 0xBB3D
+    stream = DSMR_TRACE.read_bytes()
+
+    parser = TelegramParser()
+    # Start reading mid-telegram, in small chunks
+    telegrams = [
+        telegram
+        for i in range(100, len(stream), 7)
+        for telegram in parser.feed(stream[i : i + 7])
+    ]
+    assert [t.currents for t in telegrams] == DSMR_CURRENTS[1:]
+    assert telegrams[0].timestamp == "240315120001W"
+
+    corrupt = stream.replace(b"1-0:31.7.0(009*A)", b"1-0:31.7.0(019*A)")
+    parser = TelegramParser()
+    telegrams = parser.feed(corrupt[: len(corrupt) // 2]) + parser.feed(
+        corrupt[len(corrupt) // 2 :]
+    )
+    assert len(telegrams) == len(DSMR_CURRENTS) - 1
+    assert parser.crc_errors == 1
+
+
+async def test_dsmr_mains_reads_tcp_stream(
+    hass: HomeAssistant, socket_enabled: None
+) -> None:
+    """Test that each telegram from a TCP stand-in is one sample of all phases."""
+    stream = DSMR_TRACE.read_bytes()
+
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        for i in range(0, len(stream), 300):
+            writer.write(stream[i : i + 300])
+            await writer.drain()
+            await asyncio.sleep(0)
+        writer.close()
+
+    server = await asyncio.start_server(serve, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    samples = []
+    received = asyncio.Event()
+
+    async def update_callback():
+        samples.append(tuple(mains.get_phase(p).actual_current() for p in Phases))
+        if len(samples) == len(DSMR_CURRENTS):
+            received.set()
+
+    options = {CONF_MAINS_PORT: f"127.0.0.1:{port}", CONF_MAINS_LIMIT: 20}
+    assert MainsDsmr.validate_user_input(hass, options)
+    mains = MainsDsmr(hass, update_callback, options)
+    async with asyncio.timeout(5):
+        await received.wait()
+    mains.cleanup()
+    server.close()
+    await server.wait_closed()
+    await hass.async_block_till_done()
+
+    assert samples == DSMR_CURRENTS
+    assert mains.telegrams == len(DSMR_CURRENTS)
+    assert mains.device_id == options[CONF_DEVICE_ID]
+    assert len(mains.get_phase(Phases.PHASE1).history) == len(DSMR_CURRENTS)
+
+
+async def test_dsmr_mains_serial_not_ready(hass: HomeAssistant) -> None:
+    """Test that a serial port without pyserial-asyncio-fast is not ready."""
+
+    async def update_callback():
+        pass
+
+    options = {CONF_MAINS_PORT: "/dev/ttyUSB0", CONF_MAINS_LIMIT: 20}
+    assert MainsDsmr.validate_user_input(hass, options)
+    with mock.patch(
+        "custom_components.ev_load_balancing.mains.dsmr.serial_asyncio_fast", None
+    ):
+        # Config flow does not read the port
+        MainsDsmr(hass, None, options)
+        with pytest.raises(ConfigEntryNotReady):
+            MainsDsmr(hass, update_callback, options)
+
+
+async def test_modbus_mains_polls_all_phases_in_one_read(
+    hass: HomeAssistant, socket_enabled: None
+) -> None:
+    """Test that each poll is one register read over a shared connection."""
+    server = ModbusServerStandIn()
+    server.set_float32(0x0006, [5.5, 3.25, 2.0])
+    port = await server.async_start()
+    updates = 0
+
+    async def update_callback():
+        nonlocal updates
+        updates += 1
+
+    options = {
+        CONF_MAINS_HOST: f"127.0.0.1:{port}",
+        CONF_MAINS_UNIT: 1,
+        CONF_MAINS_METER: "sdm630",
+        CONF_MAINS_POLL_INTERVAL: 2,
+        CONF_MAINS_LIMIT: 20,
+    }
+    assert MainsModbus.validate_user_input(hass, options)
+    meters = [MainsModbus(hass, update_callback, options) for _ in range(2)]
+    for i in range(3):
+        server.set_float32(0x0006, [5.5 + i, 3.25, 2.0])
+        # Poll directly, firing timers in the future also expires socket timeouts
+        for meter in meters:
+            await meter._async_poll(dt_util.utcnow())
+
+    assert updates == 6
+    assert server.requests == [(1, 0x0006, 6)] * 6
+    assert server.connections == 1
+    mains = meters[0]
+    assert [mains.get_phase(p).actual_current() for p in Phases] == [7.5, 3.25, 2.0]
+    assert len(mains.get_phase(Phases.PHASE1).history) == 3
+    assert mains.device_id == options[CONF_DEVICE_ID]
+
+    for meter in meters:
+        meter.cleanup()
+    assert DATA_MODBUS_CLIENTS not in hass.data or not hass.data[DATA_MODBUS_CLIENTS]
+    await server.async_stop()
+
+
+async def test_modbus_client_rejects_malformed_length(
+    hass: HomeAssistant, socket_enabled: None
+) -> None:
+    """Test that a response length out of MBAP bounds reconnects."""
+    server = ModbusServerStandIn()
+    server.set_float32(0x0006, [5.5])
+    port = await server.async_start()
+    client = get_modbus_client(hass, "127.0.0.1", port)
+
+    for length in (0, 1, 255):
+        server.response_length = length
+        with pytest.raises(ModbusError):
+            await client.async_read_input_registers(1, 0x0006, 2)
+    server.response_length = None
+    assert await client.async_read_input_registers(1, 0x0006, 2) == [0x40B0, 0]
+    assert server.connections == 4
+
+    client.release()
+    await server.async_stop()
+
+
+def test_modbus_decoders() -> None:
+    """Test decoding of meter register formats."""
+    assert decode_float32([0x40B0, 0x0000, 0xC000, 0x0000]) == [5.5, -2.0]
+    assert decode_int32_swapped([0x1388, 0x0000, 0xFC18, 0xFFFF]) == [5000, -1000]
+    assert split_address("meter.local") == ("meter.local", 502)
+    assert split_address("10.0.0.2:5020") == ("10.0.0.2", 5020)
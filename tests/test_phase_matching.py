@@ -0,0 +1,77 @@
+"""phase matching tests."""
+
+import time
+from unittest import mock
+
+from custom_components.ev_load_balancing.const import (
+    CONF_DEVICE_ID,
+    CONF_MAINS_LIMIT,
+    Phases,
+)
+from custom_components.ev_load_balancing.mains.slimmelezer import MainsSlimmelezer
+from custom_components.ev_load_balancing.phase_matching import (
+    PhaseCommandFailed,
+    PhaseLearningFailed,
+    PhaseMatcher,
+)
+import pytest
+
+from homeassistant.core import HomeAssistant
+
+from .common import SimulatedCharger, create_slimmelezer
+
+MAINS_ENTITIES = [f"sensor.slimmelezer_current_phase_{i}" for i in (1, 2, 3)]
+
+
+async def match_phases(
+    hass: HomeAssistant, charger: SimulatedCharger, **kwargs
+) -> dict[Phases, Phases]:
+    """Run phase matching against a simulated Slimmelezer and charger."""
+    device_id = create_slimmelezer(hass)
+    matcher = PhaseMatcher(charger, **kwargs)
+    mains = MainsSlimmelezer(
+        hass,
+        matcher.async_mains_changed,
+        {CONF_DEVICE_ID: device_id, CONF_MAINS_LIMIT: 25},
+    )
+    charger.start()
+    try:
+        return await matcher.async_match(mains)
+    finally:
+        await charger.stop()
+        mains.cleanup()
+
+
+async def test_phase_matching(hass: HomeAssistant) -> None:
+    """Test that crossed wiring is found from step responses within seconds."""
+    wiring = {
+        Phases.PHASE1: Phases.PHASE3,
+        Phases.PHASE2: Phases.PHASE1,
+        Phases.PHASE3: Phases.PHASE2,
+    }
+    charger = SimulatedCharger(hass, MAINS_ENTITIES, wiring)
+
+    start = time.perf_counter()
+    matches = await match_phases(hass, charger, timeout=5.0)
+    elapsed = time.perf_counter() - start
+
+    assert matches == wiring
+    assert len(charger.commands) == 4
+    assert elapsed < 5
+
+
+async def test_phase_matching_no_response(hass: HomeAssistant) -> None:
+    """Test that matching fails when the car does not draw current."""
+    charger = SimulatedCharger(hass, MAINS_ENTITIES, {})
+
+    with pytest.raises(PhaseLearningFailed):
+        await match_phases(hass, charger, timeout=0.5)
+
+
+async def test_phase_matching_command_failed(hass: HomeAssistant) -> None:
+    """Test that matching aborts right away when the charger refuses limits."""
+    charger = SimulatedCharger(hass, MAINS_ENTITIES, {})
+    charger.async_set_limits = mock.AsyncMock(return_value=False)
+
+    with pytest.raises(PhaseCommandFailed):
+        await match_phases(hass, charger, timeout=60.0)
@@ -0,0 +1,76 @@
+"""replay harness tests."""
+
+from pathlib import Path
+
+from freezegun.api import FrozenDateTimeFactory
+
+from homeassistant.core import HomeAssistant
+
+from .replay import TRACES, ReplayHarness, load_trace
+
+# Seconds of the household trace the mains may be overloaded, 24 s measured
+MAX_OVERLOAD_SECONDS = 30
+
+
+def test_load_trace_csv(tmp_path: Path) -> None:
+    """Test that CSV traces load like JSONL traces, sorted by time."""
+    path = tmp_path / "trace.csv"
+    path.write_text(
+        "t,entity_id,state\n"
+        "1.5,sensor.mains_l2,4.2\n"
+        "0.0,sensor.easee_status,charging\n",
+        encoding="utf-8",
+    )
+    trace = load_trace(path)
+    assert [event.t for event in trace] == [0.0, 1.5]
+    assert trace[1].entity_id == "sensor.mains_l2"
+    assert trace[1].state == "4.2"
+    assert trace[1].attributes == {}
+
+
+async def test_replay_household(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """Benchmark the controller on a recorded household load."""
+    harness = ReplayHarness(hass, freezer)
+    await harness.async_setup()
+    report = await harness.async_replay(load_trace(TRACES / "household.jsonl"))
+    await harness.async_shutdown()
+
+    assert report.commands > 0, str(report)
+    assert report.service_calls > 0, str(report)
+    assert report.latency_mean < 15, str(report)
+    assert report.overload_seconds < MAX_OVERLOAD_SECONDS, str(report)
+
+
+async def test_replay_household_forecast(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """Benchmark load forecasting against reacting on actual load."""
+    trace = load_trace(TRACES / "household.jsonl")
+    # Compare controllers on every update, and on what the rate limit lets through
+    for command_rate in (100, None):
+        reports = {}
+        for forecast in (False, True):
+            harness = ReplayHarness(
+                hass,
+                freezer,
+                options={
+                    "charger": {
+                        "charger_forecast": forecast,
+                        "charger_response_time": 2,
+                    }
+                },
+                command_rate=command_rate,
+            )
+            await harness.async_setup()
+            reports[forecast] = await harness.async_replay(trace)
+            await harness.async_shutdown()
+            hass.services.async_remove("easee", "set_circuit_dynamic_limit")
+
+        summary = f"actual: {reports[False]}, forecast: {reports[True]}"
+        assert reports[True].overshoot_ah < reports[False].overshoot_ah, summary
+        assert reports[True].overload_seconds <= reports[False].overload_seconds, (
+            summary
+        )
+        assert reports[True].delivered_ah > 0.9 * reports[False].delivered_ah, summary
@@ -0,0 +1,148 @@
+"""simulation tests."""
+
+from datetime import timedelta
+import time
+
+from custom_components.ev_load_balancing import EvLoadBalancingCoordinator
+from custom_components.ev_load_balancing.chargers import ChargingState
+from custom_components.ev_load_balancing.const import DOMAIN
+from custom_components.ev_load_balancing.helpers.simulation import (
+    DAY,
+    DATA_SIMULATIONS,
+    HouseholdProfile,
+    Simulation,
+    get_simulation,
+)
+from freezegun.api import FrozenDateTimeFactory
+import pytest
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from homeassistant.const import ATTR_NAME
+from homeassistant.core import HomeAssistant
+
+# Simulated seconds per CPU second, as the test clock is frozen
+MIN_SPEEDUP = 1000
+
+
+async def _async_tick(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory, seconds: float
+) -> None:
+    """Advance virtual clock, firing due timers."""
+    freezer.tick(timedelta(seconds=seconds))
+    async_fire_time_changed(hass)
+    await hass.async_block_till_done()
+
+
+def test_household_profile() -> None:
+    """Test that the household profile repeats daily and has evening peak."""
+    profile = HouseholdProfile()
+    assert profile.currents(3 * 3600) == profile.currents(DAY + 3 * 3600)
+    assert max(profile.currents(18.5 * 3600)) > 15
+    assert HouseholdProfile().loads == profile.loads
+
+
+async def test_simulation_charger_response(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test that charger follows limits after response delay and ramp."""
+    simulation = get_simulation(hass, "test")
+    simulation.vehicle.arrival = 0
+    simulation.set_limits([10, 10, 10])
+    await _async_tick(hass, freezer, 1)
+    simulation.advance()
+    assert simulation.limits == [16, 16, 16]
+    assert simulation.charging_state == ChargingState.CHARGING
+    await _async_tick(hass, freezer, 10)
+    simulation.advance()
+    assert simulation.draw == [10, 10, 10]
+    household = simulation.household.currents(simulation.time)
+    assert simulation.mains_currents() == [load + 10 for load in household]
+
+    # Below the minimum charging current the car pauses
+    simulation.set_limits([0, 0, 0])
+    await _async_tick(hass, freezer, 10)
+    simulation.advance()
+    assert simulation.draw == [0, 0, 0]
+    assert simulation.charging_state == ChargingState.PENDING
+
+    simulation.release()
+    assert hass.data[DATA_SIMULATIONS] == {}
+
+
+async def _async_simulate_day(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> tuple[Simulation, float]:
+    """Balance a simulated day, return simulation and CPU seconds it took."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            ATTR_NAME: "Simulation",
+            "mains_type": "virtual",
+            "charger_type": "virtual",
+            "developer_mode": True,
+        },
+        options={
+            "mains": {
+                "device_id": "day",
+                "mains_limit": 25,
+                "mains_poll_interval": 10,
+            },
+            "charger": {
+                "device_id": "day",
+                "charger_rated_current": 16,
+                "phase_auto_matching": False,
+            },
+            "phases": {
+                "mains_phase1": "PHASE1",
+                "mains_phase2": "PHASE2",
+                "mains_phase3": "PHASE3",
+                "charger_phase1": "PHASE1",
+                "charger_phase2": "PHASE2",
+                "charger_phase3": "PHASE3",
+            },
+        },
+    )
+    config_entry.add_to_hass(hass)
+    coordinator = EvLoadBalancingCoordinator(hass, config_entry)
+    await coordinator._async_setup_method()
+    simulation = hass.data[DATA_SIMULATIONS]["day"]
+
+    start = time.process_time()
+    for _ in range(int(DAY / 10)):
+        await _async_tick(hass, freezer, 10)
+    elapsed = time.process_time() - start
+    await coordinator.async_shutdown()
+    await _async_tick(hass, freezer, 60)
+    return simulation, elapsed
+
+
+async def test_simulation_day(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """Test that a simulated day charges the car without overloading mains."""
+    simulation, _ = await _async_simulate_day(hass, freezer)
+
+    assert simulation.time >= DAY
+    assert simulation.vehicle.soc >= simulation.vehicle.target_soc
+    assert simulation.overload_seconds < 0.01 * DAY
+    assert DATA_SIMULATIONS not in hass.data or "day" not in hass.data[DATA_SIMULATIONS]
+
+
+@pytest.mark.benchmark
+async def test_simulation_day_benchmark(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """Benchmark balancing a simulated day, run at least 1000x real time."""
+    simulation, elapsed = await _async_simulate_day(hass, freezer)
+
+    speedup = simulation.time / elapsed
+    assert speedup > MIN_SPEEDUP, (
+        f"{simulation.time:.0f} s simulated at {speedup:.0f}x: "
+        f"delivered {simulation.delivered_kwh:.1f} kWh, "
+        f"soc {simulation.vehicle.soc:.2f}, "
+        f"peak {simulation.peak_current:.1f} A, "
+        f"overload {simulation.overload_seconds:.0f} s"
+    )